@@ -1,18 +1,247 @@
 import os
 import json
-import google.generativeai as genai
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-# NOTE: Configuration is now done in app.py and the 'model' object is passed in.
+from llm_cache import LLMCache
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from singleflight import SingleFlight, BoundedExecutor
+from batching import MicroBatcher, MalformedBatchError
+from metrics import registry as metrics, span
+from structured_log import get_logger
 
-def get_ai_analysis(model, score, breakdown, data):
+# NOTE: The model is configured lazily by llm_client.get_model() and passed in.
+
+log = get_logger('ai_agents')
+
+# --- Response cache (see llm_cache.py) ---
+# AI_CACHE_DIR enables the on-disk tier so warm entries survive a restart.
+ai_cache = LLMCache(
+    max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', 1024)),
+    ttl_seconds=float(os.getenv('AI_CACHE_TTL_SECONDS', 3600)),
+    disk_dir=os.getenv('AI_CACHE_DIR') or None,
+    disk_max_entries=int(os.getenv('AI_CACHE_DISK_MAX_ENTRIES', 10000)),
+    sweep_seconds=float(os.getenv('AI_CACHE_SWEEP_SECONDS', 300)),
+)
+
+# --- Circuit breaker (see circuit_breaker.py) ---
+# Shared by every helper so one slow/erroring Gemini trips all of them.
+gemini_breaker = CircuitBreaker(
+    'gemini',
+    window_size=int(os.getenv('AI_BREAKER_WINDOW', 20)),
+    min_calls=int(os.getenv('AI_BREAKER_MIN_CALLS', 5)),
+    error_rate_threshold=float(os.getenv('AI_BREAKER_ERROR_RATE', 0.5)),
+    slow_call_seconds=float(os.getenv('AI_BREAKER_SLOW_SECONDS', 10)),
+    slow_rate_threshold=float(os.getenv('AI_BREAKER_SLOW_RATE', 0.5)),
+    open_seconds=float(os.getenv('AI_BREAKER_OPEN_SECONDS', 30)),
+    half_open_probes=int(os.getenv('AI_BREAKER_HALF_OPEN_PROBES', 2)),
+)
+
+# Calls with a latency budget run here so the request thread can stop waiting.
+# A call that overruns its budget keeps going and still fills the cache; one
+# still queued when all its callers have given up is dropped. Past
+# AI_BUDGET_QUEUE waiting calls new ones fail at once (ExecutorFull) and the
+# caller uses its fallback. Workers default to AI_MAX_CONCURRENCY, the same
+# per-process LLM concurrency the async path allows.
+AI_BUDGET_WORKERS = int(os.getenv('AI_BUDGET_WORKERS', os.getenv('AI_MAX_CONCURRENCY', 32)))
+AI_BUDGET_QUEUE = int(os.getenv('AI_BUDGET_QUEUE', AI_BUDGET_WORKERS))
+budget_executor = BoundedExecutor(AI_BUDGET_WORKERS, AI_BUDGET_QUEUE, thread_name_prefix='ai-budget')
+
+# --- Request coalescing (see singleflight.py) ---
+# Concurrent calls with the same cache key share one upstream request.
+ai_flights = SingleFlight(budget_executor)
+
+
+class LatencyBudgetExceeded(Exception):
+    """Raised when the model does not answer within the caller's budget."""
+
+
+def generate_json(model, kind, inputs, prompt, budget=None, batcher=None):
+    """
+    Sends `prompt` to the model and returns the parsed JSON answer, serving
+    repeat calls with the same `inputs` from ai_cache and sharing one upstream
+    call among concurrent identical requests (ai_flights). Only responses that
+    parse as JSON are cached. Raises on API or parse errors, CircuitOpenError
+    while gemini_breaker is open, LatencyBudgetExceeded if `budget`
+    seconds pass without an answer and ExecutorFull if budget_executor has
+    no room for the call. With an enabled `batcher`, the upstream
+    call is merged with other requests arriving in the same window.
+    """
+    key = get_cache_key(model, kind, inputs)
+    cached = get_cached_json(key, kind)
+    if cached is not None:
+        return cached
+
+    if batcher is not None and batcher.enabled:
+        call = lambda: batcher.submit(model, (key, inputs)).result()
+    else:
+        call = lambda: _call_model(model, kind, prompt, key)
+    try:
+        with span('llm'):
+            text = ai_flights.do(key, call, timeout=budget)
+    except FutureTimeoutError:
+        raise LatencyBudgetExceeded(f"No {kind} answer within {budget:g}s budget")
+    return json.loads(text)
+
+
+def _call_model(model, kind, prompt, key):
+    """One breaker-tracked model call; returns the answer text once cached."""
+    if not gemini_breaker.allow_request():
+        raise CircuitOpenError(f"Gemini circuit is open; skipping {kind} call")
+    start = time.monotonic()
+    try:
+        response = model.generate_content(prompt)
+    except Exception:
+        gemini_breaker.record_failure()
+        raise
+    gemini_breaker.record_success(time.monotonic() - start)
+    return store_text(key, response.text)
+
+
+def _health_insights_batch_call(model, payloads):
+    """One prompt for several health-insight requests; returns one text each."""
+    if not gemini_breaker.allow_request():
+        raise CircuitOpenError("Gemini circuit is open; skipping health_insights batch")
+    prompt = build_health_insights_batch_prompt([health_data for _, health_data in payloads])
+    start = time.monotonic()
+    try:
+        response = model.generate_content(prompt)
+    except Exception:
+        gemini_breaker.record_failure()
+        raise
+    gemini_breaker.record_success(time.monotonic() - start)
+
+    try:
+        answers = json.loads(response.text)
+    except ValueError as e:
+        raise MalformedBatchError(f"batched answer is not JSON: {e}")
+    if not isinstance(answers, list) or len(answers) != len(payloads):
+        raise MalformedBatchError("batched answer is not a JSON array with one item per profile")
+    texts = []
+    for answer in answers:
+        if not isinstance(answer, dict) or not isinstance(answer.get('insights'), list):
+            raise MalformedBatchError("batched answer item has no 'insights' list")
+        texts.append(json.dumps(answer, ensure_ascii=False))
+    for (key, _), text in zip(payloads, texts):
+        ai_cache.set(key, text)
+    return texts
+
+
+def _health_insights_single_call(model, payload):
+    key, health_data = payload
+    return _call_model(model, 'health_insights', build_health_insights_prompt(health_data), key)
+
+
+# --- Micro-batching (see batching.py) ---
+# Health-insight prompts are short, so per-call overhead dominates; requests
+# arriving within AI_BATCH_WINDOW_MS share one prompt. 0 disables batching.
+health_insights_batcher = MicroBatcher(
+    _health_insights_batch_call,
+    _health_insights_single_call,
+    window_seconds=float(os.getenv('AI_BATCH_WINDOW_MS', 0)) / 1000,
+    max_items=int(os.getenv('AI_BATCH_MAX_ITEMS', 16)),
+    name='health-insights-batch',
+)
+
+
+def use_fallback(kind, error, fallback, *args):
+    """Logs and counts a failed `kind` call and returns fallback(*args), timed as the 'fallback' span."""
+    log.warning("ai call failed; using fallback", kind=kind, error=f"{type(error).__name__}: {error}")
+    metrics.inc('ai_errors_total', (('kind', kind), ('error', type(error).__name__)),
+                help="Failed AI calls by kind and exception (each was answered by its fallback).")
+    with span('fallback'):
+        return fallback(*args)
+
+
+def get_cache_key(model, kind, inputs):
+    return ai_cache.make_key(kind, getattr(model, 'model_name', None), inputs)
+
+
+def get_cached_json(key, kind):
+    """Returns the parsed cached answer for `key`, or None on a miss."""
+    cached = ai_cache.get(key)
+    if cached is None:
+        return None
+    log.debug("ai cache hit", kind=kind)
+    return json.loads(cached)
+
+
+def store_text(key, text):
+    """Caches a model answer if it is valid JSON (raises otherwise) and returns it."""
+    json.loads(text)
+    ai_cache.set(key, text)
+    return text
+
+
+def get_ai_analysis(model, score, breakdown, data, budget=None):
     """
     Calls Google Gemini (if available) to get analysis and recommendations.
-    Accepts the configured 'model' object.
+    Accepts the configured 'model' object. `budget` caps the wait in seconds.
     """
     if not model:
-        print("--- Gemini model not available in get_ai_analysis. Returning dummy data. ---")
+        log.info("ai model not available; returning dummy data", kind='analysis')
         return get_dummy_ai_data() # Fallback if model failed to init in app.py
 
+    prompt = build_analysis_prompt(score, breakdown, data)
+
+    try:
+        ai_response_json = generate_json(model, 'analysis', (score, breakdown, data), prompt, budget)
+        log.debug("ai call succeeded", kind='analysis')
+        return ai_response_json
+
+    except Exception as e:
+        return use_fallback('analysis', e, get_dummy_ai_data) # Consistent fallback
+
+def get_loan_suggestion(model, score, data, budget=None):
+    """
+    Calls Google Gemini (if available) to suggest a loan amount and terms.
+    Accepts the configured 'model' object. `budget` caps the wait in seconds.
+    """
+    if not model:
+        log.info("ai model not available; returning error suggestion", kind='loan_suggestion')
+        return {"error": "AI Agent offline"} # Fallback if model failed to init
+
+    loan_prompt = build_loan_prompt(score, data)
+
+    try:
+        loan_suggestion = generate_json(model, 'loan_suggestion', get_loan_inputs(score, data), loan_prompt, budget)
+        log.debug("ai call succeeded", kind='loan_suggestion')
+        return loan_suggestion
+
+    except Exception as e:
+        return use_fallback('loan_suggestion', e, lambda: {"error": "Could not determine loan suggestion"}) # Consistent error structure
+
+def get_health_insights(model, health_data, budget=None):
+    """Gets AI-powered health insights. Falls back to dummy data if model unavailable."""
+    if not model:
+        return get_offline_health_insights()
+    
+    try:
+        prompt = build_health_insights_prompt(health_data)
+        return generate_json(model, 'health_insights', health_data, prompt, budget,
+                             batcher=health_insights_batcher)
+        
+    except Exception as e:
+        return use_fallback('health_insights', e, get_fallback_health_insights, health_data)
+
+
+def get_personalized_finance_insight(model, user_data, budget=None):
+    """Uses Gemini to generate personalized financial insights"""
+    if not model:
+        return get_fallback_finance_insight()
+    
+    try:
+        prompt = build_finance_insight_prompt(user_data)
+        return generate_json(model, 'finance_insight', get_finance_insight_inputs(user_data), prompt, budget)
+    
+    except Exception as e:
+        return use_fallback('finance_insight', e, get_fallback_finance_insight)
+
+
+# ===== PROMPT BUILDERS =====
+# Shared by the blocking helpers above and the asyncio layer in async_agents.py.
+
+def build_analysis_prompt(score, breakdown, data):
     # Create profile summary (Keep as is)
     profile_summary = f"""
     - User's Final Score: {score}
@@ -60,28 +289,16 @@ def get_ai_analysis(model, score, breakdown, data):
 
     Analyze this financial profile and provide the required JSON output:
     """ + profile_summary
+    return prompt
 
-    try:
-        print("--- Calling Gemini for AI Analysis...")
-        response = model.generate_content(prompt)
-        print("--- Gemini AI Analysis call successful.")
-        ai_response_json = json.loads(response.text)
-        return ai_response_json
 
-    except Exception as e:
-        print(f"--- ERROR calling Gemini API for Analysis: {e}")
-        print("--- Falling back to dummy AI data.")
-        return get_dummy_ai_data() # Consistent fallback
+def get_loan_inputs(score, data):
+    """The values the loan prompt depends on; used as its cache key."""
+    return (score, [data.get(field, 'N/A') for field in
+                    ('monthlyIncome', 'rentAmount', 'avgBalance', 'employmentStability')])
 
-def get_loan_suggestion(model, score, data):
-    """
-    Calls Google Gemini (if available) to suggest a loan amount and terms.
-    Accepts the configured 'model' object.
-    """
-    if not model:
-        print("--- Gemini model not available in get_loan_suggestion. Returning error suggestion. ---")
-        return {"error": "AI Agent offline"} # Fallback if model failed to init
 
+def build_loan_prompt(score, data):
     # Create profile summary (Keep as is)
     profile_summary = f"""
     - User's ArthNiti Score: {score}
@@ -105,22 +322,87 @@ def get_loan_suggestion(model, score, data):
     Analyze this profile for a loan suggestion:
     {profile_summary}
     """
+    return loan_prompt
 
-    try:
-        print("--- Calling Gemini for Loan Suggestion...")
-        response = model.generate_content(loan_prompt)
-        print("--- Gemini Loan Suggestion call successful.")
-        loan_suggestion = json.loads(response.text)
-        return loan_suggestion
 
-    except Exception as e:
-        print(f"--- ERROR calling Gemini API for Loan Suggestion: {e}")
-        return {"error": "Could not determine loan suggestion"} # Consistent error structure
+def build_health_insights_prompt(health_data):
+    prompt = f"""
+    You are a financial health advisor. Based on this health data:
+    - Health Grade: {health_data['grade']}
+    - Risk Level: {health_data['risk_level']}
+    - Current Score: {health_data['current_score']}
+    - Trend: {health_data['trend']}
+    
+    Provide 3 short, actionable health insights in JSON format:
+    {{
+      "insights": [
+        "First insight about their current status",
+        "Second insight about what to watch out for",
+        "Third insight with a quick win suggestion"
+      ]
+    }}
+    """
+    return prompt
+
+
+def build_health_insights_batch_prompt(health_datas):
+    profiles = "\n".join(
+        f"""    Profile {i}:
+    - Health Grade: {health_data['grade']}
+    - Risk Level: {health_data['risk_level']}
+    - Current Score: {health_data['current_score']}
+    - Trend: {health_data['trend']}"""
+        for i, health_data in enumerate(health_datas, start=1)
+    )
+    prompt = f"""
+    You are a financial health advisor. For EACH of the {len(health_datas)} profiles below,
+    provide 3 short, actionable health insights.
+
+{profiles}
+
+    Return a JSON array with exactly {len(health_datas)} objects, in the same order as the profiles:
+    [
+      {{
+        "insights": [
+          "First insight about their current status",
+          "Second insight about what to watch out for",
+          "Third insight with a quick win suggestion"
+        ]
+      }}
+    ]
+    """
+    return prompt
+
+
+def get_finance_insight_inputs(user_data):
+    """The values the finance insight prompt depends on; used as its cache key."""
+    return [user_data.get(field) for field in
+            ('monthly_income', 'current_balance', 'upcoming_bills', 'streak', 'budget_usage')]
+
+
+def build_finance_insight_prompt(user_data):
+    prompt = f"""
+    Based on this user's financial data:
+    - Monthly Income: ₹{user_data.get('monthly_income', 30000)}
+    - Current Balance: ₹{user_data.get('current_balance', 2500)}
+    - Upcoming Bills: ₹{user_data.get('upcoming_bills', 13449)}
+    - Payment Streak: {user_data.get('streak', 47)} days
+    - Budget Usage: {user_data.get('budget_usage', 68)}%
+    
+    Generate a short, actionable financial insight in both English and Hindi.
+    Format as JSON:
+    {{
+      "insight_en": "English insight here",
+      "insight_hi": "Hindi insight here"
+    }}
+    """
+    return prompt
+
 
 # Centralized Dummy Data Function
 def get_dummy_ai_data():
     """ Returns placeholder data if the API fails or is not configured. """
-    print("--- Providing Dummy AI Data ---") # Log when dummy data is used
+    log.debug("providing dummy ai data") # Log when dummy data is used
     return {
       "insights": [
         "Insight generation requires a valid API key.",
@@ -147,4 +429,34 @@ def get_dummy_ai_data():
           "difficulty": "Low"
         }
       ]
-    }
\ No newline at end of file
+    }
+
+
+def get_offline_health_insights():
+    """Health insights shown when no AI model is configured."""
+    return {
+        "insights": [
+            "Your credit health is being monitored",
+            "Continue good financial habits",
+            "Check back regularly for updates"
+        ]
+    }
+
+
+def get_fallback_health_insights(health_data):
+    """Health insights built from the metrics alone when the AI call fails."""
+    return {
+        "insights": [
+            f"Your credit health grade is {health_data['grade']}",
+            f"Current risk level: {health_data['risk_level']}",
+            "Keep monitoring your financial habits for improvements"
+        ]
+    }
+
+
+def get_fallback_finance_insight():
+    """Finance insight used when the AI model is unavailable or fails."""
+    return {
+        "insight_en": "Keep tracking your bills to maintain good financial health.",
+        "insight_hi": "अच्छे वित्तीय स्वास्थ्य के लिए अपने बिलों पर नज़र रखें।"
+    }
@@ -0,0 +1,93 @@
+# ai_jobs.py - Background worker pool for slow AI calls
+#
+# Lets /api/score answer with the deterministic score straight away while the
+# Gemini analysis runs on a worker thread. Results are kept by job id for a
+# while so the client can poll for them (or an SSE stream can wait on them).
+#
+# NOTE: On serverless runtimes (Vercel) the process may be frozen once the
+# response is sent, so prefer the SSE mode there; polling needs a long-lived
+# server such as gunicorn.
+#
+# At most max_jobs are kept. Finished jobs are dropped once they expire, or
+# oldest first when room is needed; a running job is never dropped, so its
+# id keeps working until it finishes. When every slot holds a running job,
+# submit() raises JobStoreFull instead.
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobStoreFull(Exception):
+    """Every job slot is taken by a job that is still running."""
+
+
+class AIJobStore:
+    """Runs callables on a thread pool and keeps their results by job id."""
+
+    def __init__(self, max_workers=4, ttl_seconds=600, max_jobs=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-job')
+        self._jobs = OrderedDict()  # job_id -> (created_at, future)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def submit(self, func, *args, **kwargs):
+        """Schedules func(*args, **kwargs) and returns its job id. Raises JobStoreFull."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            if len(self._jobs) >= self.max_jobs:
+                self.rejected += 1
+                raise JobStoreFull(f"all {self.max_jobs} AI job slots are running")
+            self._jobs[job_id] = (time.time(), self._executor.submit(func, *args, **kwargs))
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns {"status": "pending"} while the job runs, {"status": "done",
+        "result": ...} or {"status": "error", "error": ...} once it finishes,
+        and None for unknown or expired ids.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job[1]
+        if not future.done():
+            return {"status": "pending"}
+        error = future.exception()
+        if error is not None:
+            return {"status": "error", "error": str(error)}
+        return {"status": "done", "result": future.result()}
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job finishes (or `timeout` passes) and returns get()."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            job[1].result(timeout=timeout)
+        except Exception:
+            pass  # Timeouts and job errors are reported by get()
+        return self.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for _, future in self._jobs.values() if not future.done())
+            return {"jobs": len(self._jobs), "pending": pending, "rejected": self.rejected}
+
+    def _prune(self):
+        """Drops expired finished jobs, then the oldest finished ones until a slot is free."""
+        # Caller holds self._lock. Jobs are in submission order, oldest first.
+        cutoff = time.time() - self.ttl_seconds
+        for job_id, (created_at, future) in list(self._jobs.items()):
+            full = len(self._jobs) >= self.max_jobs
+            if not full and created_at >= cutoff:
+                break  # Everything after this is newer, so unexpired too
+            if future.done():
+                del self._jobs[job_id]
@@ -1,37 +1,121 @@
 import os
 import json  # ✅ FIX: Global import
-from flask import Flask, request, jsonify
+import math
+import random
+import sqlite3
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
 from datetime import datetime, timedelta
-import requests
-
-# --- Local Imports ---
-from scoring_engine import calculate_credit_score
-from ai_agents import get_ai_analysis, get_loan_suggestion, get_dummy_ai_data
 
 # --- Single, Centralized Configuration Block ---
+# Loaded before the local imports below, which read their settings at import time.
+# The Gemini client itself is configured lazily by llm_client.get_model().
 load_dotenv()
-model = None
 
-try:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("--- WARNING: GOOGLE_API_KEY not found. AI features will use dummy data. ---")
-    else:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(
-            model_name='gemini-1.5-flash',  # ✅ FIX: Valid model name (update to 2.0 if available)
-            generation_config={"response_mime_type": "application/json"}
-        )
-        print("--- Gemini client configured successfully. ---")
-except Exception as e:
-    print(f"--- ERROR initializing Gemini client: {e}. AI features will use dummy data. ---")
-    model = None
+# --- Local Imports ---
+# NOTE: Keep heavy dependencies (google.generativeai, numpy) out of this list;
+# they are imported on first use so cold starts of non-AI routes stay fast.
+from scoring_engine import RATING_BANDS
+from score_table import calculate_credit_score_fast
+from goal_seek import find_cheapest_changes, apply_changes, describe_change, GoalSeekError
+from score_history import ScoreHistory, format_delta
+from bill_ledger import BillLedger, BillError, BillNotFoundError, BILL_UPCOMING_DAYS
+from reminder_scheduler import ReminderScheduler, bill_loader
+from streaks import StreakStore
+from budget_tracker import BudgetTracker, BudgetError, parse_month
+from cashflow import CashFlowForecaster, CashFlowError, FORECAST_DAYS, next_nightly_run
+from leaderboard import Leaderboard, PERIODS
+from stream_io import iter_records, iter_chunks
+from metrics import registry as metrics, span, start_request, finish_request
+import json_backend
+from compression import compress_response
+from http_cache import ResponseCache, static_version
+from structured_log import get_logger, dropped_records
+from ai_jobs import AIJobStore, JobStoreFull
+from llm_client import get_model, is_ai_available
+from ai_agents import (
+    get_ai_analysis, get_loan_suggestion, get_health_insights,
+    get_dummy_ai_data, ai_cache, gemini_breaker, ai_flights, budget_executor, health_insights_batcher,
+)
+
+BULK_SCORE_CHUNK_SIZE = int(os.getenv('BULK_SCORE_CHUNK_SIZE', 1000))
+
+# Worker pool that fills in AI analysis for /api/score?ai_mode=async|stream
+ai_jobs = AIJobStore(
+    max_workers=int(os.getenv('AI_JOB_WORKERS', 4)),
+    ttl_seconds=float(os.getenv('AI_JOB_TTL_SECONDS', 600)),
+)
+AI_STREAM_TIMEOUT_SECONDS = float(os.getenv('AI_STREAM_TIMEOUT_SECONDS', 30))
+
+# Per-user score history (trend, month-over-month delta, rolling averages)
+score_history = ScoreHistory()
+
+# Per-user bills with a due-date index (/api/finance/bills, /api/finance/mark-paid)
+bill_ledger = BillLedger()
+RECENT_PAID_BILLS = int(os.getenv('RECENT_PAID_BILLS', 5))
+
+# Bill reminders: pending ones in a time-ordered heap, delivered ones in per-user inboxes.
+# The worker thread starts on the first finance request and loads the open bills first.
+reminder_scheduler = ReminderScheduler(loader=bill_loader(bill_ledger))
+
+# Payment streaks and achievements, updated once per payment (python streaks.py replay rebuilds them)
+payment_streaks = StreakStore()
+
+# Running per-user, per-month, per-category spending totals (/api/finance/budget, /api/finance/transactions)
+budget_tracker = BudgetTracker()
+
+# Day-by-day balance forecast for the emergency shield (python cashflow.py nightly runs it for every user)
+cash_forecaster = CashFlowForecaster()
+
+# Credit Clash leaderboards (daily, weekly, all-time), snapshotted to disk by a background thread
+leaderboard = Leaderboard()
+GAME_MAX_SCORE = int(os.getenv('GAME_MAX_SCORE', 1_000_000))
+
+# ETag/Last-Modified revalidation for the polled finance and game GET endpoints (see http_cache.py)
+response_cache = ResponseCache()
+
+# Default time an endpoint waits for Gemini before using its fallback (0 = no limit)
+AI_LATENCY_BUDGET_MS = float(os.getenv('AI_LATENCY_BUDGET_MS', 10000))
+
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON handling on json_backend (orjson when installed), with
+    request parsing and response serialization timed as spans. numpy arrays
+    and scalars can be returned from routes as they are.
+    """
+
+    def loads(self, s, **kwargs):
+        with span('parse'):
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return json_backend.loads(s)
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            if set(kwargs) - {'indent', 'separators'}:  # Custom encoder options: only the stdlib has them
+                return super().dumps(obj, **kwargs)
+            return json_backend.dumps(obj, default=self.default, indent=bool(kwargs.get('indent')))
+
+    def response(self, *args, **kwargs):
+        """jsonify(): encodes straight to bytes, skipping the str round trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        with span('serialize'):
+            body = json_backend.dumps_bytes(obj, default=self.default, indent=indent)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+# Structured, queued logging (see structured_log.py); request and AI payloads are sampled
+log = get_logger('app')
+LOG_ACCESS_SAMPLE_RATE = float(os.getenv('LOG_ACCESS_SAMPLE_RATE', 1.0))
 
 # --- Flask App Initialization ---
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-change-in-prod')
 
 # ✅ FIX: CORS for Vercel (add * for prod domains; restrict later)
@@ -42,10 +126,69 @@ CORS(app,
      expose_headers=['Set-Cookie'],
      methods=['GET', 'POST', 'OPTIONS'])
 
+
+# --- Request timing (see metrics.py) ---
+# Every request gets a latency histogram by route and status, and a
+# Server-Timing header with the spans (parse, scoring, llm, ...) it ran.
+# Requests are access-logged: failures always, the rest at LOG_ACCESS_SAMPLE_RATE.
+
+@app.before_request
+def start_request_timing():
+    start_request(request.endpoint or 'unmatched')
+
+
+@app.after_request
+def finish_request_timing(response):
+    seconds, server_timing = finish_request(response.status_code)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    if response.status_code >= 500 or random.random() < LOG_ACCESS_SAMPLE_RATE:
+        log_request = log.error if response.status_code >= 500 else log.info
+        log_request("request", method=request.method, path=request.path, status=response.status_code,
+                    ms=round(seconds * 1000, 3) if seconds is not None else None)
+    return response
+
+
+# Large JSON and text responses are gzip/brotli compressed when the client
+# accepts it (see compression.py). Registered after the timing hook, so it runs
+# first and its span lands in Server-Timing.
+@app.after_request
+def compress_large_response(response):
+    return compress_response(response, request.accept_encodings)
+
+
+# Scraped from the shared services' own stats on every /api/metrics request
+metrics.register_stats('ai_cache', ai_cache.stats, skip=('max_entries', 'ttl_seconds', 'disk_max_entries'),
+                       counters=('hits', 'disk_hits', 'misses', 'evictions', 'disk_evictions', 'disk_expired'))
+metrics.register_stats('ai_circuit_breaker', gemini_breaker.snapshot, skip=('name', 'config'), counters=(
+    'rejected_calls', 'transitions_closed_to_open', 'transitions_open_to_half_open',
+    'transitions_half_open_to_closed', 'transitions_half_open_to_open'))
+metrics.register_stats('ai_single_flight', ai_flights.stats, counters=('leader_calls', 'shared_calls', 'dropped_calls'))
+metrics.register_stats('ai_budget_pool', budget_executor.stats, skip=('workers', 'max_queue'),
+                       counters=('admitted', 'rejected'))
+metrics.register_stats('ai_batching', health_insights_batcher.stats, skip=('window_ms', 'max_items'),
+                       counters=('batches', 'batched_items', 'fallback_batches', 'failed_batches', 'single_calls'))
+metrics.register_stats('ai_jobs', ai_jobs.stats, counters=('rejected',))
+metrics.register_stats('score_history', score_history.stats, skip=('max_users',), counters=('evictions',))
+metrics.register_stats('reminders', reminder_scheduler.stats, counters=(
+    'scheduled', 'deduplicated', 'delivered', 'snoozed', 'cancelled', 'loaded'))
+metrics.register_stats('leaderboard', leaderboard.stats, skip=('boards',), counters=('submissions', 'snapshots'))
+metrics.register_stats('response_cache', response_cache.stats, skip=('max_entries',),
+                       counters=('hits', 'not_modified', 'misses', 'evictions', 'version_errors'))
+metrics.add_collector(lambda: [('log_records_dropped_total', 'counter',
+                                "Log records dropped because the log queue was full.", [((), dropped_records())])])
+
 # ===== HELPER FUNCTIONS FOR HEALTH MONITOR =====
 
-def calculate_health_metrics(user_data, current_score):
-    """Calculates various health indicators."""
+# Used for roadmap phases the score plan leaves empty
+ROADMAP_MAINTENANCE_ACTIONS = (
+    "Maintain payment streak",
+    "Keep overdrafts at zero",
+    "Review budget allocations"
+)
+
+def calculate_health_metrics(user_data, current_score, history=None):
+    """Calculates various health indicators. `history` is a score_history summary."""
     if current_score >= 800:
         grade = "A+"
     elif current_score >= 740:
@@ -67,7 +210,10 @@ def calculate_health_metrics(user_data, current_score):
     else:
         risk = "HIGH"
     
-    trend = "+15"
+    if history:
+        trend = format_delta(history['mom_delta'] if history['mom_delta'] is not None else history['previous_delta'])
+    else:
+        trend = format_delta(None)
     
     return {
         "grade": grade,
@@ -77,8 +223,12 @@ def calculate_health_metrics(user_data, current_score):
     }
 
 
-def generate_90day_roadmap(current_score, health_data):
-    """Generates personalized 90-day improvement plan."""
+def generate_90day_roadmap(current_score, health_data, plan=None):
+    """
+    Generates personalized 90-day improvement plan. With a goal_seek plan the
+    phases carry its changes, cheapest first, and each target_gain is the
+    score gained once that phase's changes are applied.
+    """
     roadmap = {
         "phase1": {
             "title": "Days 1-30: Build Foundation",
@@ -96,6 +246,22 @@ def generate_90day_roadmap(current_score, health_data):
             "target_gain": 20
         }
     }
+
+    if plan is not None:
+        changes = plan['changes']
+        profile = plan['profile']
+        score = plan['current_score']
+        applied = []
+        for i, phase in enumerate(("phase1", "phase2", "phase3")):
+            # Front-load: earlier phases get the cheaper changes and any remainder
+            phase_changes = changes[math.ceil(len(changes) * i / 3):math.ceil(len(changes) * (i + 1) / 3)]
+            applied += phase_changes
+            new_score = calculate_credit_score_fast(apply_changes(profile, applied))['total_score'] if phase_changes else score
+            roadmap[phase]['actions'] = ([describe_change(change) for change in phase_changes]
+                                         or list(ROADMAP_MAINTENANCE_ACTIONS))
+            roadmap[phase]['target_gain'] = new_score - score
+            score = new_score
+        return roadmap
     
     if health_data['risk_level'] == "HIGH":
         roadmap['phase1']['actions'] = [
@@ -125,6 +291,27 @@ def generate_90day_roadmap(current_score, health_data):
     return roadmap
 
 
+def get_default_target_score(score):
+    """Next rating band above `score` (or `score` itself at the top band)."""
+    for min_score, _ in reversed(RATING_BANDS):
+        if min_score > score:
+            return min_score
+    return score
+
+
+def get_score_plan(user_data, target_score=None, change_costs=None):
+    """Runs the goal-seek solver for the health monitor; None if the profile can't be used."""
+    try:
+        current = calculate_credit_score_fast(user_data)['total_score']
+        target = int(target_score) if target_score is not None else get_default_target_score(current)
+        plan = find_cheapest_changes(user_data, target, change_costs)
+    except (GoalSeekError, TypeError, ValueError, AttributeError) as e:
+        log.info("score plan unavailable", error=str(e))
+        return None
+    plan['profile'] = user_data
+    return plan
+
+
 def generate_change_recommendation(predicted_score):
     """Generates recommendation based on score change."""
     score = predicted_score['total_score']
@@ -149,99 +336,115 @@ def generate_change_recommendation(predicted_score):
         }
 
 
-def get_health_insights(model, health_data):
-    """Gets AI-powered health insights. Falls back to dummy data if model unavailable."""
-    if not model:
-        return {
-            "insights": [
-                "Your credit health is being monitored",
-                "Continue good financial habits",
-                "Check back regularly for updates"
-            ]
-        }
-    
+def get_request_user_id(data=None, default='demo_user'):
+    """User id from ?user_id= or the JSON body, else `default` (the frontend sends none)."""
+    user_id = request.args.get('user_id')
+    if not user_id and isinstance(data, dict):
+        user_id = data.get('user_id')
+    return str(user_id) if user_id else default
+
+
+def record_score_history(user_id, score_data):
+    """
+    Appends a computed score to the user's history; returns its summary, or
+    None. Anonymous scores (no user id) are not recorded: they would all
+    land in one shared history and give everyone the same trend.
+    """
+    if user_id is None or score_data['rating'] == "Error":
+        return None
     try:
-        prompt = f"""
-        You are a financial health advisor. Based on this health data:
-        - Health Grade: {health_data['grade']}
-        - Risk Level: {health_data['risk_level']}
-        - Current Score: {health_data['current_score']}
-        - Trend: {health_data['trend']}
-        
-        Provide 3 short, actionable health insights in JSON format:
-        {{
-          "insights": [
-            "First insight about their current status",
-            "Second insight about what to watch out for",
-            "Third insight with a quick win suggestion"
-          ]
-        }}
-        """
-        
-        response = model.generate_content(prompt)
-        return json.loads(response.text)  # ✅ FIX: Use global json
-        
-    except Exception as e:
-        print(f"Error getting health insights: {e}")
-        return {
-            "insights": [
-                f"Your credit health grade is {health_data['grade']}",
-                f"Current risk level: {health_data['risk_level']}",
-                "Keep monitoring your financial habits for improvements"
-            ]
-        }
+        return score_history.append(user_id, score_data)
+    except OSError as e:
+        log.warning("could not record score history", error=str(e))
+        return None
 
 
-def get_personalized_finance_insight(model, user_data):
-    """Uses Gemini to generate personalized financial insights"""
-    if not model:
-        return {
-            "insight_en": "Keep tracking your bills to maintain good financial health.",
-            "insight_hi": "अच्छे वित्तीय स्वास्थ्य के लिए अपने बिलों पर नज़र रखें।"
-        }
-    
+def get_score_history_summary(user_id):
+    if user_id is None:
+        return None
     try:
-        prompt = f"""
-        Based on this user's financial data:
-        - Monthly Income: ₹{user_data.get('monthly_income', 30000)}
-        - Current Balance: ₹{user_data.get('current_balance', 2500)}
-        - Upcoming Bills: ₹{user_data.get('upcoming_bills', 13449)}
-        - Payment Streak: {user_data.get('streak', 47)} days
-        - Budget Usage: {user_data.get('budget_usage', 68)}%
-        
-        Generate a short, actionable financial insight in both English and Hindi.
-        Format as JSON:
-        {{
-          "insight_en": "English insight here",
-          "insight_hi": "Hindi insight here"
-        }}
-        """
-        
-        response = model.generate_content(prompt)
-        return json.loads(response.text)  # ✅ FIX: Use global json
-    
-    except Exception as e:
-        print(f"Error generating personalized insight: {e}")
-        return {
-            "insight_en": "Keep tracking your bills to maintain good financial health.",
-            "insight_hi": "अच्छे वित्तीय स्वास्थ्य के लिए अपने बिलों पर नज़र रखें।"
-        }
+        return score_history.summary(user_id)
+    except OSError as e:
+        log.warning("could not read score history", error=str(e))
+        return None
+
+
+def get_latency_budget():
+    """
+    Seconds this request may wait on the LLM, from ?latency_budget_ms= or the
+    X-Latency-Budget-Ms header, else AI_LATENCY_BUDGET_MS. None means no limit.
+    """
+    raw = request.args.get('latency_budget_ms') or request.headers.get('X-Latency-Budget-Ms')
+    try:
+        budget_ms = float(raw) if raw else AI_LATENCY_BUDGET_MS
+    except ValueError:
+        budget_ms = AI_LATENCY_BUDGET_MS
+    return budget_ms / 1000 if budget_ms > 0 else None
 
 
 # ===== MAIN API ROUTES =====
 
+def sse_event(event, payload):
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json_backend.dumps(payload)}\n\n"
+
+
 @app.route('/api/score', methods=['POST'])
 def get_score_route():
-    """Main score calculation endpoint."""
+    """
+    Main score calculation endpoint.
+    ?ai_mode=sync (default) waits for the AI analysis. ?ai_mode=async returns
+    the score at once with a job id to poll at /api/score/analysis/<job_id>.
+    ?ai_mode=stream (or Accept: text/event-stream) sends the score and then
+    the AI analysis as two server-sent events on the same connection.
+    In sync mode ?latency_budget_ms= caps the wait for the AI analysis.
+    """
     try:
         data = request.get_json()
-        print("Data received for /api/score:", data)
+        log.payload("score request", data=data)
+
+        ai_mode = request.args.get('ai_mode')
+        if not ai_mode:
+            ai_mode = 'stream' if request.accept_mimetypes.best == 'text/event-stream' else 'sync'
 
-        score_data = calculate_credit_score(data)
-        print("Calculated Score:", score_data)
+        with span('scoring'):
+            score_data = calculate_credit_score_fast(data)
+        history = record_score_history(get_request_user_id(data, default=None), score_data)
+        if history:
+            score_data['trend'] = history['trend']
+            score_data['history'] = history
+        log.info("score calculated", score=score_data['total_score'], rating=score_data['rating'], ai_mode=ai_mode)
 
-        ai_data = get_ai_analysis(model, score_data['total_score'], score_data['breakdown'], data)
-        print("AI Analysis Result:", ai_data)
+        if ai_mode in ('async', 'stream'):
+            try:
+                job_id = ai_jobs.submit(get_ai_analysis, get_model(), score_data['total_score'],
+                                        score_data['breakdown'], data)
+                ai_job = {"id": job_id, "status_url": f"/api/score/analysis/{job_id}"}
+            except JobStoreFull as e:
+                # Every slot is still running: answer with the dummy analysis rather than queue more
+                log.warning("ai job refused; sending dummy data", error=str(e))
+                job_id = ai_job = None
+
+            if ai_mode == 'async':
+                return jsonify({"score": score_data, "ai_analysis": None if ai_job else get_dummy_ai_data(),
+                                "ai_job": ai_job})
+
+            def generate():
+                yield sse_event("score", {"score": score_data, "ai_job": ai_job})
+                job = ai_jobs.wait(job_id, timeout=AI_STREAM_TIMEOUT_SECONDS) if job_id else None
+                if job and job["status"] == "done":
+                    ai_data = job["result"]
+                else:
+                    log.warning("ai analysis not ready in time; sending dummy data", job_id=job_id)
+                    ai_data = get_dummy_ai_data()
+                yield sse_event("ai_analysis", {"ai_analysis": ai_data})
+
+            return Response(generate(), mimetype='text/event-stream',
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        ai_data = get_ai_analysis(get_model(), score_data['total_score'], score_data['breakdown'], data,
+                                  budget=get_latency_budget())
+        log.payload("ai analysis", ai_analysis=ai_data)
 
         full_response = {
             "score": score_data,
@@ -249,8 +452,8 @@ def get_score_route():
         }
         return jsonify(full_response)
 
-    except Exception as e:
-        print(f"--- FATAL ERROR in /api/score route: {e}")
+    except Exception:
+        log.exception("score request failed")
         return jsonify({
             "error": "Failed to process score request on the server.",
             "score": None,
@@ -258,6 +461,89 @@ def get_score_route():
         }), 500
 
 
+@app.route('/api/score/history', methods=['GET'])
+def get_score_history_route():
+    """A user's last ?n= scores (default 12, oldest first) and their trend summary."""
+    user_id = get_request_user_id(default=None)
+    if user_id is None:
+        return jsonify({"error": "user_id is required"}), 400
+    try:
+        n = max(1, min(int(request.args.get('n', 12)), 1000))
+    except ValueError:
+        return jsonify({"error": "n must be an integer"}), 400
+    try:
+        return jsonify({
+            "user_id": user_id,
+            "summary": score_history.summary(user_id),
+            "points": score_history.last(user_id, n),
+        })
+    except OSError as e:
+        log.error("score history unavailable", error=str(e))
+        return jsonify({"error": "Score history unavailable"}), 503
+
+
+@app.route('/api/score/analysis/<job_id>', methods=['GET'])
+def get_score_analysis_route(job_id):
+    """Returns the AI analysis for a job started by /api/score?ai_mode=async."""
+    job = ai_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "unknown", "error": "Unknown or expired job id"}), 404
+    if job["status"] == "pending":
+        return jsonify({"status": "pending", "ai_analysis": None}), 202
+    if job["status"] == "error":
+        log.error("ai job failed", job_id=job_id, error=str(job['error']))
+        return jsonify({"status": "error", "ai_analysis": get_dummy_ai_data()})
+    return jsonify({"status": "done", "ai_analysis": job["result"]})
+
+
+def score_bulk_records(records):
+    """
+    Scores (record, error) pairs chunk by chunk and yields one NDJSON line per
+    input row. Rows that failed to parse or score carry an "error" field
+    instead of a "score", so one bad row never aborts the stream.
+    """
+    from batch_scoring import profiles_to_columns, score_columns, results_from_scores  # Deferred: imports numpy
+
+    row = 0
+    for chunk in iter_chunks(records, BULK_SCORE_CHUNK_SIZE):
+        profiles = [record for record, _ in chunk if record is not None]
+        columns, errors = profiles_to_columns(profiles)
+        results = iter(zip(results_from_scores(score_columns(columns), errors), errors))
+
+        lines = []
+        for record, parse_error in chunk:
+            row += 1
+            output = {"row": row}
+            if record is not None and 'id' in record:
+                output["id"] = record['id']
+            if parse_error is None:
+                score_data, parse_error = next(results)
+            if parse_error is None:
+                output["score"] = score_data
+            else:
+                output["error"] = parse_error
+            lines.append(json_backend.dumps(output))
+        yield "\n".join(lines) + "\n"
+
+
+@app.route('/api/score/bulk', methods=['POST'])
+def bulk_score_route():
+    """
+    Bulk scoring endpoint. Accepts NDJSON (default) or CSV (Content-Type:
+    text/csv or ?format=csv) profiles in a streamed body and streams NDJSON
+    results back as each chunk is scored.
+    """
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": f"Unsupported format '{fmt}'. Use 'ndjson' or 'csv'."}), 400
+
+    log.info("bulk scoring requested", format=fmt, chunk_size=BULK_SCORE_CHUNK_SIZE)
+    records = iter_records(request.stream, fmt)
+    return Response(stream_with_context(score_bulk_records(records)), mimetype='application/x-ndjson')
+
+
 @app.route('/api/suggest_loan', methods=['POST'])
 def suggest_loan_route():
     """Loan suggestion endpoint."""
@@ -267,20 +553,20 @@ def suggest_loan_route():
         user_data = request_data.get('userData')
 
         if not score or not user_data:
-            print("--- ERROR: Missing score or userData in /api/suggest_loan request.")
+            log.warning("loan suggestion request without score or userData")
             return jsonify({"suggestion": {"error": "Missing required data from frontend."}}), 400
 
-        print(f"Loan suggestion requested for score: {score}")
+        log.info("loan suggestion requested", score=score)
 
-        loan_suggestion = get_loan_suggestion(model, score, user_data)
-        print("Loan Suggestion Result:", loan_suggestion)
+        loan_suggestion = get_loan_suggestion(get_model(), score, user_data, budget=get_latency_budget())
+        log.payload("loan suggestion", suggestion=loan_suggestion)
 
         return jsonify({
             "suggestion": loan_suggestion
         })
 
-    except Exception as e:
-        print(f"--- FATAL ERROR in /api/suggest_loan route: {e}")
+    except Exception:
+        log.exception("loan suggestion request failed")
         return jsonify({"suggestion": {"error": "Server error while generating loan suggestion."}}), 500
 
 
@@ -292,20 +578,27 @@ def health_monitor_route():
         user_data = request_data.get('userData')
         current_score = request_data.get('currentScore', 720)
         
-        print(f"Health monitor requested for score: {current_score}")
+        log.info("health monitor requested", score=current_score)
         
-        health_data = calculate_health_metrics(user_data, current_score)
-        ai_insights = get_health_insights(model, health_data)
-        roadmap = generate_90day_roadmap(current_score, health_data)
+        history = get_score_history_summary(get_request_user_id(request_data, default=None))
+        with span('scoring'):
+            health_data = calculate_health_metrics(user_data, current_score, history)
+        ai_insights = get_health_insights(get_model(), health_data, budget=get_latency_budget())
+        with span('scoring'):
+            plan = get_score_plan(user_data, request_data.get('targetScore'), request_data.get('changeCosts'))
+            roadmap = generate_90day_roadmap(current_score, health_data, plan)
+        if plan is not None:
+            del plan['profile']
         
         return jsonify({
             "health_metrics": health_data,
             "ai_insights": ai_insights,
-            "roadmap": roadmap
+            "roadmap": roadmap,
+            "score_plan": plan
         })
         
-    except Exception as e:
-        print(f"--- ERROR in /api/health-monitor: {e}")
+    except Exception:
+        log.exception("health monitor request failed")
         return jsonify({"error": "Failed to generate health data"}), 500
 
 
@@ -314,9 +607,10 @@ def predict_score_route():
     """Predicts score based on what-if scenarios."""
     try:
         simulation_data = request.get_json()
-        print("Simulation data received:", simulation_data)
+        log.payload("score simulation request", data=simulation_data)
         
-        predicted_score = calculate_credit_score(simulation_data)
+        with span('scoring'):
+            predicted_score = calculate_credit_score_fast(simulation_data)
         recommendation = generate_change_recommendation(predicted_score)
         
         return jsonify({
@@ -325,226 +619,314 @@ def predict_score_route():
             "recommendation": recommendation
         })
         
-    except Exception as e:
-        print(f"--- ERROR in /api/predict-score: {e}")
+    except Exception:
+        log.exception("score prediction failed")
         return jsonify({"error": "Prediction failed"}), 500
 
 
+@app.route('/api/predict-score/grid', methods=['POST'])
+def predict_score_grid_route():
+    """
+    What-if score surface: a base profile plus ranges for one or two inputs,
+    e.g. {"base": {...}, "axes": [{"field": "savingsRate", "start": 0,
+    "stop": 0.4, "steps": 100}, {"field": "rentAmount", "values": [...]}]}.
+    Every grid point matches what /api/predict-score returns for it, so the
+    client can move sliders without a round trip per move.
+    """
+    from whatif import score_grid, recommendation_surface, GridError, COMPONENT_NAMES  # Deferred: imports numpy
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('base', {}), dict):
+        return jsonify({"error": "Expected a JSON object with a 'base' profile object and 'axes'"}), 400
+    try:
+        with span('scoring'):
+            grid = score_grid(payload.get('base', {}), payload.get('axes'))
+            recommendations, recommendation_index = recommendation_surface(
+                grid['total_score'], generate_change_recommendation
+            )
+        return jsonify({
+            "axes": grid['axes'],
+            "total_score": grid['total_score'],  # numpy arrays; the JSON provider encodes them directly
+            "rating_labels": grid['rating_labels'],
+            "rating": grid['rating_code'],
+            "breakdown": {name: grid[name] for name in COMPONENT_NAMES},
+            "recommendations": recommendations,
+            "recommendation": recommendation_index,
+        })
+    except GridError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        log.exception("score prediction grid failed")
+        return jsonify({"error": "Prediction grid failed"}), 500
+
+
 # ===== FINANCE ROUTES =====
 
+# Versions of the data behind the cached GET routes: (version, epoch seconds of the last change)
+
+def reminders_version():
+    reminder_scheduler.start()  # A 304 skips the view, which would otherwise start the worker
+    return reminder_scheduler.inbox_version(get_request_user_id())
+
+
+def streak_version():
+    return payment_streaks.version(get_request_user_id())
+
+
+def budget_version():
+    version, changed_at = budget_tracker.version(get_request_user_id())
+    # The current month's projection and days left move with the date, without any write
+    midnight = datetime.combine(datetime.now().date(), datetime.min.time())
+    return (version, midnight.toordinal()), max(changed_at or 0.0, midnight.timestamp())
+
+
+def schedule_bill_reminders(user_id, bill_id, name, amount, due_date):
+    """Schedules a saved bill's reminders; a failure is logged, never fails the request."""
+    try:
+        reminder_scheduler.schedule_bill(user_id, bill_id, name, amount, due_date)
+    except ValueError as e:
+        log.warning("bill reminder not scheduled", bill_id=bill_id, error=str(e))
+
+
 @app.route('/api/finance/bills', methods=['GET', 'POST'])
 def manage_bills():
-    """GET: Retrieve user's bills, POST: Add new bill"""
+    """GET: Overdue, upcoming (?days=) and recently paid bills, POST: Add new bill"""
     if request.method == 'GET':
-        sample_bills = [
-            {
-                "id": "bill_1",
-                "name": "Rent Payment",
-                "name_hi": "किराया",
-                "amount": 12000,
-                "due_date": "2025-10-25",
-                "status": "pending",
-                "category": "rent",
-                "recurring": True
-            },
-            {
-                "id": "bill_2",
-                "name": "Electricity",
-                "name_hi": "बिजली",
-                "amount": 850,
-                "due_date": "2025-10-15",
-                "status": "paid",
-                "category": "utilities",
-                "recurring": True
-            },
-            {
-                "id": "bill_3",
-                "name": "Internet",
-                "name_hi": "इंटरनेट",
-                "amount": 599,
-                "due_date": "2025-10-10",
-                "status": "overdue",
-                "category": "services",
-                "recurring": True
-            }
-        ]
-        return jsonify({"bills": sample_bills})
+        user_id = get_request_user_id()
+        try:
+            days = max(0, min(int(request.args.get('days', BILL_UPCOMING_DAYS)), 366))
+        except ValueError:
+            return jsonify({"error": "days must be an integer"}), 400
+        try:
+            agenda = bill_ledger.agenda(user_id, days)
+            paid = bill_ledger.recent_payments(user_id, RECENT_PAID_BILLS)
+        except sqlite3.Error as e:
+            log.error("bill ledger unavailable", error=str(e))
+            return jsonify({"error": "Bill ledger unavailable"}), 503
+        return jsonify({
+            "bills": agenda['overdue'] + agenda['upcoming'] + paid,
+            "overdue_count": agenda['overdue_count'],
+            "upcoming_total": round(sum(bill['amount'] for bill in agenda['upcoming']), 2),
+            "days": days,
+        })
     
     elif request.method == 'POST':
-        bill_data = request.get_json()
+        bill_data = request.get_json(silent=True) or {}
+        try:
+            bill = bill_ledger.add_bill(
+                get_request_user_id(bill_data),
+                bill_data.get('name'),
+                bill_data.get('amount'),
+                bill_data.get('due_date'),
+                category=bill_data.get('category') or 'other',
+                recurrence=bill_data.get('recurrence'),
+                occurrences=bill_data.get('occurrences'),
+            )
+        except BillError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except sqlite3.Error as e:
+            log.error("bill ledger unavailable", error=str(e))
+            return jsonify({"success": False, "error": "Bill ledger unavailable"}), 503
+        schedule_bill_reminders(bill['user_id'], bill['id'], bill['name'], bill['amount'], bill['next_due'])
+        reminder_scheduler.start()
         return jsonify({
             "success": True,
             "message": "Bill added successfully",
-            "bill_id": "bill_new_123"
+            "bill_id": bill['id'],
+            "bill": bill
         })
 
 
 @app.route('/api/finance/reminders', methods=['GET'])
+@response_cache.cached(reminders_version)
 def get_smart_reminders():
-    """Returns AI-generated smart reminders based on payment patterns"""
+    """Returns the user's due bill reminders, as delivered by the reminder worker"""
     try:
-        user_id = request.args.get('user_id', 'demo_user')
-        
-        reminders = [
-            {
-                "id": "rem_1",
-                "type": "upcoming",
-                "priority": "medium",
-                "message_en": "Rent due in 6 days. Your usual payment day is approaching.",
-                "message_hi": "किराया 6 दिन में देय है।",
-                "icon": "💸",
-                "action": "snooze"
-            },
-            {
-                "id": "rem_2",
-                "type": "overdue",
-                "priority": "high",
-                "message_en": "Internet bill overdue! Pay now to maintain streak.",
-                "message_hi": "इंटरनेट बिल अतिदेय!",
-                "icon": "🚨",
-                "action": "pay_now"
-            },
-            {
-                "id": "rem_3",
-                "type": "ai_tip",
-                "priority": "low",
-                "message_en": "AI Tip: Pay electricity before Oct 22 to avoid late fee",
-                "message_hi": "सुझाव: बिजली बिल 22 अक्टूबर से पहले दें",
-                "icon": "💡",
-                "action": "got_it"
-            }
-        ]
+        user_id = get_request_user_id()
+        reminder_scheduler.start()
         
-        return jsonify({"reminders": reminders})
+        return jsonify({"reminders": reminder_scheduler.reminders(user_id)})
     
     except Exception as e:
+        log.exception("request failed", path=request.path)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/finance/snooze-reminder', methods=['POST'])
+def snooze_reminder():
+    """Hides a reminder and delivers it again after ?minutes= (default REMINDER_SNOOZE_MINUTES)"""
+    data = request.get_json(silent=True) or {}
+    reminder_id = data.get('reminder_id')
+    if not reminder_id:
+        return jsonify({"success": False, "error": "reminder_id is required"}), 400
+    minutes = data.get('minutes')
+    if minutes is not None:
+        try:
+            minutes = int(minutes)
+        except (TypeError, ValueError):
+            minutes = 0
+        if not 1 <= minutes <= 30 * 24 * 60:
+            return jsonify({"success": False, "error": "minutes must be between 1 and 43200"}), 400
+    remind_at = reminder_scheduler.snooze(reminder_id, get_request_user_id(data), minutes)
+    if remind_at is None:
+        return jsonify({"success": False, "error": "Reminder not found"}), 404
+    return jsonify({
+        "success": True,
+        "message": "Reminder snoozed",
+        "remind_at": datetime.fromtimestamp(remind_at).isoformat(timespec='minutes')
+    })
+
+
 @app.route('/api/finance/streak', methods=['GET'])
+@response_cache.cached(streak_version)
 def get_payment_streak():
     """Returns current payment streak and achievements"""
     try:
-        streak_data = {
-            "current_streak": 47,
-            "best_streak": 89,
-            "total_on_time_payments": 156,
-            "achievements": [
-                {
-                    "id": "ach_1",
-                    "name": "7 Day Hero",
-                    "name_hi": "7 दिन का हीरो",
-                    "icon": "🏆",
-                    "unlocked": True,
-                    "unlocked_date": "2025-09-01"
-                },
-                {
-                    "id": "ach_2",
-                    "name": "30 Day Master",
-                    "name_hi": "30 दिन का मास्टर",
-                    "icon": "⭐",
-                    "unlocked": True,
-                    "unlocked_date": "2025-09-24"
-                },
-                {
-                    "id": "ach_3",
-                    "name": "100 Day Legend",
-                    "name_hi": "100 दिन का लीजेंड",
-                    "icon": "💎",
-                    "unlocked": False,
-                    "progress": 47
-                },
-                {
-                    "id": "ach_4",
-                    "name": "365 Day King",
-                    "name_hi": "365 दिन का राजा",
-                    "icon": "👑",
-                    "unlocked": False,
-                    "progress": 47
-                }
-            ]
-        }
+        streak_data = payment_streaks.get(get_request_user_id()).to_dict()
         
         return jsonify(streak_data)
     
     except Exception as e:
+        log.exception("request failed", path=request.path)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/finance/budget', methods=['GET', 'POST'])
+@response_cache.cached(budget_version)
 def manage_budget():
-    """GET: Get current budget status, POST: Update budget"""
-    if request.method == 'GET':
-        budget_data = {
-            "total_budget": 30000,
-            "spent": 20400,
-            "remaining": 9600,
-            "percentage_used": 68,
-            "categories": {
-                "rent": {"spent": 12000, "budget": 15000},
-                "utilities": {"spent": 1449, "budget": 2000},
-                "food": {"spent": 4500, "budget": 6000},
-                "entertainment": {"spent": 2451, "budget": 3000}
-            },
-            "ai_insight_en": "You're on track! At this rate, you'll save ₹5,000 this month.",
-            "ai_insight_hi": "आप सही दिशा में हैं! इस गति से आप ₹5,000 बचाएंगे।",
-            "projection": {
-                "expected_savings": 5000,
-                "days_until_next_paycheck": 6
-            }
-        }
-        
-        return jsonify(budget_data)
-    
-    elif request.method == 'POST':
-        budget_updates = request.get_json()
+    """GET: Budget status for ?month=YYYY-MM (default this month), POST: Update budgets"""
+    try:
+        if request.method == 'GET':
+            month = request.args.get('month')
+            budget_data = budget_tracker.summary(get_request_user_id(), parse_month(month) if month else None)
+            return jsonify(budget_data)
+
+        budget_updates = request.get_json(silent=True) or {}
+        if not isinstance(budget_updates, dict):
+            raise BudgetError("Expected a JSON object with total_budget and/or categories")
+        user_id = get_request_user_id(budget_updates)
+        budget_tracker.set_budget(user_id, budget_updates.get('total_budget'), budget_updates.get('categories'))
         return jsonify({
             "success": True,
-            "message": "Budget updated successfully"
+            "message": "Budget updated successfully",
+            "budget": budget_tracker.summary(user_id)
         })
 
+    except BudgetError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except sqlite3.Error as e:
+        log.error("budget store unavailable", error=str(e))
+        return jsonify({"success": False, "error": f"Budget store unavailable: {e}"}), 503
+
+
+@app.route('/api/finance/transactions', methods=['POST'])
+def add_transactions():
+    """
+    Records spending. Body: one transaction, a list of them, or
+    {"transactions": [...]}; each has amount, date, category and optional id.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        transactions = data.get('transactions', [data])
+    else:
+        transactions = data
+    if not isinstance(transactions, list) or not all(isinstance(t, dict) for t in transactions):
+        return jsonify({"success": False, "error": "Expected a transaction object or a list of them"}), 400
+    try:
+        report = budget_tracker.add_transactions(
+            get_request_user_id(data if isinstance(data, dict) else None), transactions)
+    except sqlite3.Error as e:
+        log.error("budget store unavailable", error=str(e))
+        return jsonify({"success": False, "error": f"Budget store unavailable: {e}"}), 503
+    status = 400 if report["rejected"] and not report["imported"] and not report["duplicates"] else 200
+    return jsonify({"success": status == 200, **report}), status
+
+
+@app.route('/api/finance/transactions/import', methods=['POST'])
+def import_transactions():
+    """
+    Bank statement import. Streams an NDJSON (default) or CSV (Content-Type:
+    text/csv or ?format=csv) body through the budget totals chunk by chunk.
+    """
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": f"Unsupported format '{fmt}'. Use 'ndjson' or 'csv'."}), 400
+
+    user_id = get_request_user_id()
+    log.info("transaction import requested", format=fmt, user_id=user_id)
+    try:
+        report = budget_tracker.ingest(user_id, iter_records(request.stream, fmt))
+    except sqlite3.Error as e:
+        log.error("budget store unavailable", error=str(e))
+        return jsonify({"success": False, "error": f"Budget store unavailable: {e}"}), 503
+    log.info("transactions imported", user_id=user_id, imported=report['imported'],
+             duplicates=report['duplicates'], rejected=report['rejected'])
+    return jsonify({"success": True, **report})
+
 
 @app.route('/api/finance/emergency-shield', methods=['GET'])
 def check_emergency_shield():
-    """Predicts overdraft risk using AI"""
+    """Predicts overdraft risk from a day-by-day forecast of the user's balance (?days=, default 30)"""
     try:
-        current_balance = 2500
-        upcoming_bills = 13449
-        
-        risk_ratio = current_balance / upcoming_bills
-        
-        if risk_ratio < 1.1:
-            status = "warning"
-            message_en = "Your account balance is low. Consider postponing non-essential expenses."
-            message_hi = "आपका खाता बैलेंस कम है। गैर-जरूरी खर्चों को टालें।"
-            risk_score = 85
-        elif risk_ratio < 1.5:
-            status = "caution"
-            message_en = "Monitor your balance closely. Some bills are approaching."
-            message_hi = "अपने बैलेंस पर नज़र रखें।"
-            risk_score = 45
-        else:
-            status = "safe"
-            message_en = "No overdraft risk detected in next 7 days"
-            message_hi = "अगले 7 दिनों में कोई जोखिम नहीं"
-            risk_score = 10
-        
-        return jsonify({
-            "status": status,
-            "risk_score": risk_score,
-            "current_balance": current_balance,
-            "upcoming_bills": upcoming_bills,
-            "message_en": message_en,
-            "message_hi": message_hi,
-            "next_check": "2025-10-20T09:00:00",
-            "alert_method": "SMS + App Notification"
-        })
-    
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        days = int(request.args.get('days', FORECAST_DAYS))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= 366:
+        return jsonify({"error": "days must be between 1 and 366"}), 400
+    try:
+        forecast = cash_forecaster.forecast(get_request_user_id(), days)
+    except sqlite3.Error as e:
+        log.error("forecast unavailable", error=str(e))
+        return jsonify({"error": f"Forecast unavailable: {e}"}), 503
+
+    if forecast['first_negative_date']:
+        short = f"{-forecast['min_balance']:,.0f}"
+        message_en = (f"Your balance may go negative on {forecast['first_negative_date']} (₹{short} short). "
+                      f"Consider postponing non-essential expenses.")
+        message_hi = (f"{forecast['first_negative_date']} को आपका बैलेंस माइनस में जा सकता है (₹{short} कम)। "
+                      f"गैर-जरूरी खर्चों को टालें।")
+    elif forecast['status'] == "warning":
+        message_en = "Your account balance is low. Consider postponing non-essential expenses."
+        message_hi = "आपका खाता बैलेंस कम है। गैर-जरूरी खर्चों को टालें।"
+    elif forecast['status'] == "caution":
+        message_en = "Monitor your balance closely. Some bills are approaching."
+        message_hi = "अपने बैलेंस पर नज़र रखें।"
+    else:
+        message_en = f"No overdraft risk detected in next {days} days"
+        message_hi = f"अगले {days} दिनों में कोई जोखिम नहीं"
+
+    return jsonify({
+        **forecast,
+        "message_en": message_en,
+        "message_hi": message_hi,
+        "next_check": next_nightly_run().isoformat(timespec='minutes'),
+        "alert_method": "SMS + App Notification"
+    })
+
+
+@app.route('/api/finance/cash-profile', methods=['GET', 'POST'])
+def manage_cash_profile():
+    """GET/POST the balance and income the emergency shield forecasts from"""
+    data = request.get_json(silent=True) or {}
+    user_id = get_request_user_id(data)
+    try:
+        if request.method == 'POST':
+            if data.get('balance') is None:
+                return jsonify({"success": False, "error": "balance is required"}), 400
+            cash_forecaster.set_profile(user_id, data['balance'], data.get('income', 0), data.get('income_next'),
+                                        data.get('income_recurrence', 'monthly'))
+        return jsonify({"success": True, "profile": cash_forecaster.profile(user_id)})
+    except CashFlowError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except sqlite3.Error as e:
+        log.error("forecast store unavailable", error=str(e))
+        return jsonify({"success": False, "error": f"Forecast store unavailable: {e}"}), 503
 
 
 @app.route('/api/finance/ai-learning-status', methods=['GET'])
+@response_cache.cached(static_version)
 def get_ai_learning_status():
     """Returns how much the AI has learned about user's patterns"""
     try:
@@ -561,30 +943,54 @@ def get_ai_learning_status():
         return jsonify(learning_status)
     
     except Exception as e:
+        log.exception("request failed", path=request.path)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/finance/mark-paid', methods=['POST'])
 def mark_bill_paid():
-    """Marks a bill as paid and updates streak"""
+    """Marks a bill's earliest unpaid occurrence as paid and updates streak"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         bill_id = data.get('bill_id')
+        if not bill_id:
+            return jsonify({"success": False, "error": "bill_id is required"}), 400
+        user_id = get_request_user_id(data)
+        # One transaction when the stores share BILL_DB_PATH (the default): a payment
+        # is never recorded without its streak and budget updates, or the reverse
+        with bill_ledger.batch():
+            payment = bill_ledger.mark_paid(user_id, bill_id)
+            streak, unlocked = payment_streaks.record_payment(user_id, payment['paid_on'], payment['on_time'])
+            budget_tracker.add_transactions(user_id, [{
+                "id": f"bill:{payment['bill_id']}:{payment['due_date']}", "amount": payment['amount'],
+                "category": payment['category'], "date": payment['paid_on'],
+            }])
+        reminder_scheduler.cancel_bill(user_id, payment['bill_id'])
+        if payment['next_due']:
+            schedule_bill_reminders(user_id, payment['bill_id'], payment['name'], payment['amount'],
+                                    payment['next_due'])
         
         return jsonify({
             "success": True,
             "message": "Bill marked as paid",
-            "new_streak": 48,
-            "achievement_unlocked": None
+            "payment": payment,
+            "new_streak": streak.current,
+            "achievement_unlocked": unlocked[-1] if unlocked else None
         })
     
+    except BillNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except BillError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
     except Exception as e:
+        log.exception("request failed", path=request.path)
         return jsonify({"error": str(e)}), 500
 
 
 # ===== GAME ROUTES =====
 
 @app.route('/api/game/challenges', methods=['GET'])
+@response_cache.cached(static_version)
 def get_game_challenges():
     """Returns game challenges for Credit Clash."""
     try:
@@ -632,8 +1038,8 @@ def get_game_challenges():
             "level": "Beginner" if int(real_score) < 600 else "Intermediate" if int(real_score) < 750 else "Expert"
         })
     
-    except Exception as e:
-        print(f"--- ERROR in /api/game/challenges: {e}")
+    except Exception:
+        log.exception("game challenges failed")
         return jsonify({"error": "Failed to load challenges"}), 500
 
 
@@ -641,13 +1047,18 @@ def get_game_challenges():
 def submit_game_score():
     """Submits game score and calculates real score impact."""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         game_score = data.get('gameScore', 0)
         real_score = data.get('realScore', 720)
         user_data = data.get('userData', {})
+        if not isinstance(game_score, int) or isinstance(game_score, bool) or not 0 <= game_score <= GAME_MAX_SCORE:
+            return jsonify({"error": f"gameScore must be a whole number between 0 and {GAME_MAX_SCORE}"}), 400
         
         score_boost = min(game_score // 10, 50)
         new_real_score = min(real_score + score_boost, 850)
+
+        leaderboard.start()
+        standings = leaderboard.submit(get_request_user_id(data), game_score)
         
         return jsonify({
             "success": True,
@@ -655,14 +1066,49 @@ def submit_game_score():
             "score_boost": score_boost,
             "new_real_score": new_real_score,
             "message": f"Great game! You've earned a {score_boost} point boost to your real score.",
-            "achievement": "Game Master" if game_score > 800 else None
+            "achievement": "Game Master" if game_score > 800 else None,
+            "leaderboard": standings
         })
     
-    except Exception as e:
-        print(f"--- ERROR in /api/game/submit-score: {e}")
+    except Exception:
+        log.exception("game score submission failed")
         return jsonify({"error": "Failed to submit score"}), 500
 
 
+@app.route('/api/game/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """
+    Top players for ?period=daily|weekly|alltime (default alltime), ?limit=
+    of them, plus the requesting user's rank and the ?window= players
+    around it.
+    """
+    period = request.args.get('period', 'alltime')
+    if period not in PERIODS:
+        return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        window = min(max(int(request.args.get('window', 5)), 0), 50)
+    except ValueError:
+        return jsonify({"error": "limit and window must be whole numbers"}), 400
+
+    user_id = get_request_user_id()
+    leaderboard.start()
+    return jsonify({
+        "period": period,
+        "top": leaderboard.top(limit, period),
+        "me": {"user_id": user_id, **leaderboard.rank(user_id, period)},
+        "around_me": leaderboard.around(user_id, window, period)
+    })
+
+
+# ===== METRICS ENDPOINT =====
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_route():
+    """Latency histograms, error counters and service stats in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 # ===== HEALTH CHECK ENDPOINT =====
 
 @app.route('/api/health', methods=['GET'])
@@ -670,21 +1116,38 @@ def health_check():
     """Simple health check endpoint to verify server is running."""
     return jsonify({
         "status": "healthy",
-        "ai_available": model is not None,
+        "ai_available": is_ai_available(),
+        "ai_cache": ai_cache.stats(),
+        "ai_circuit_breaker": gemini_breaker.snapshot(),
+        "ai_single_flight": ai_flights.stats(),
+        "ai_budget_pool": budget_executor.stats(),
+        "ai_batching": health_insights_batcher.stats(),
+        "reminders": reminder_scheduler.stats(),
+        "leaderboard": leaderboard.stats(),
         "endpoints": [
             "/api/score",
+            "/api/score/bulk",
+            "/api/score/history",
+            "/api/score/analysis/<job_id>",
             "/api/suggest_loan",
             "/api/health-monitor",
             "/api/predict-score",
+            "/api/predict-score/grid",
             "/api/finance/bills",
             "/api/finance/reminders",
+            "/api/finance/snooze-reminder",
             "/api/finance/streak",
             "/api/finance/budget",
+            "/api/finance/transactions",
+            "/api/finance/transactions/import",
             "/api/finance/emergency-shield",
+            "/api/finance/cash-profile",
             "/api/finance/ai-learning-status",
             "/api/finance/mark-paid",
             "/api/game/challenges",
-            "/api/game/submit-score"
+            "/api/game/submit-score",
+            "/api/game/leaderboard",
+            "/api/metrics"
         ]
     })
 
@@ -699,16 +1162,24 @@ if __name__ == '__main__':
     print("\n" + "="*50)
     print("🚀 ArthNiti Backend Server Starting...")
     print("="*50)
-    print(f"✅ AI Model Status: {'Active' if model else 'Offline (using dummy data)'}")
+    print(f"✅ AI Model Status: {'Active' if get_model() else 'Offline (using dummy data)'}")
     print(f"📡 Frontend URL: http://localhost:5500")
     print(f"📡 Backend URL: http://localhost:5000")
     print("\n📡 Available endpoints:")
-    print("   ├─ POST /api/score")
+    print("   ├─ POST /api/score (?ai_mode=sync|async|stream)")
+    print("   ├─ GET  /api/score/analysis/<job_id>")
+    print("   ├─ POST /api/score/bulk (NDJSON/CSV stream)")
+    print("   ├─ GET  /api/score/history")
     print("   ├─ POST /api/suggest_loan")
     print("   ├─ POST /api/health-monitor")
     print("   ├─ POST /api/predict-score")
-    print("   ├─ GET  /api/finance/* (bills, reminders, streak, etc.)")
-    print("   └─ GET  /api/game/* (challenges, submit-score)")
+    print("   ├─ POST /api/predict-score/grid (what-if surface)")
+    print("   ├─ GET/POST /api/finance/bills, POST /api/finance/mark-paid")
+    print("   ├─ POST /api/finance/snooze-reminder")
+    print("   ├─ GET/POST /api/finance/budget, POST /api/finance/transactions[/import] (NDJSON/CSV stream)")
+    print("   ├─ GET  /api/finance/emergency-shield (?days=), GET/POST /api/finance/cash-profile")
+    print("   ├─ GET  /api/finance/* (reminders, streak, etc.)")
+    print("   └─ GET  /api/game/* (challenges, leaderboard), POST /api/game/submit-score")
     print("="*50 + "\n")
     
     app.run()
\ No newline at end of file
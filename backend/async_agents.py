@@ -0,0 +1,134 @@
+# async_agents.py - asyncio versions of the LLM helpers in ai_agents.py
+#
+# The blocking helpers pin a worker thread for the whole Gemini round trip.
+# These coroutines share the same prompts, cache and fallbacks, but many calls
+# can be in flight in one process. A per-event-loop semaphore caps how many
+# hit the model at once and every call has a timeout (queueing included).
+# Cancelling the awaiting task cancels the model call too.
+
+import asyncio
+import json
+import os
+import time
+import weakref
+
+from singleflight import AsyncSingleFlight
+from metrics import span
+from structured_log import get_logger
+from ai_agents import (
+    gemini_breaker, CircuitOpenError, get_cache_key, get_cached_json, store_text, get_dummy_ai_data, use_fallback,
+    build_analysis_prompt, build_loan_prompt, get_loan_inputs,
+    build_health_insights_prompt, get_offline_health_insights, get_fallback_health_insights,
+    build_finance_insight_prompt, get_finance_insight_inputs, get_fallback_finance_insight,
+)
+
+log = get_logger('async_agents')
+
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 32))
+AI_CALL_TIMEOUT_SECONDS = float(os.getenv('AI_CALL_TIMEOUT_SECONDS', 20))
+
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+# Concurrent awaiters with the same cache key share one upstream call
+ai_async_flights = AsyncSingleFlight()
+
+
+def get_semaphore():
+    """The process-wide LLM concurrency limit for the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+    return semaphore
+
+
+async def call_model(model, prompt):
+    """Uses the SDK's native async call when there is one, else a worker thread."""
+    generate_async = getattr(model, 'generate_content_async', None)
+    if generate_async is not None:
+        return await generate_async(prompt)
+    return await asyncio.to_thread(model.generate_content, prompt)
+
+
+async def generate_json_async(model, kind, inputs, prompt, timeout=None):
+    """
+    Async counterpart of ai_agents.generate_json, including the coalescing of
+    identical in-flight calls. Raises asyncio.TimeoutError if the answer
+    (including time spent waiting for a slot) takes longer than `timeout`
+    seconds (AI_CALL_TIMEOUT_SECONDS by default), and CircuitOpenError while
+    the shared Gemini circuit breaker is open.
+    """
+    key = get_cache_key(model, kind, inputs)
+    cached = get_cached_json(key, kind)
+    if cached is not None:
+        return cached
+
+    async def limited_call():
+        async with get_semaphore():
+            if not gemini_breaker.allow_request():
+                raise CircuitOpenError(f"Gemini circuit is open; skipping {kind} call")
+            start = time.monotonic()
+            try:
+                response = await call_model(model, prompt)
+            except asyncio.CancelledError:
+                gemini_breaker.record_abandoned(time.monotonic() - start)
+                raise
+            except Exception:
+                gemini_breaker.record_failure()
+                raise
+            gemini_breaker.record_success(time.monotonic() - start)
+            return store_text(key, response.text)
+
+    with span('llm'):
+        text = await ai_async_flights.do(key, limited_call, timeout or AI_CALL_TIMEOUT_SECONDS)
+    return json.loads(text)
+
+
+async def get_ai_analysis_async(model, score, breakdown, data, timeout=None):
+    """Async version of ai_agents.get_ai_analysis."""
+    if not model:
+        log.info("ai model not available; returning dummy data", kind='analysis')
+        return get_dummy_ai_data()
+
+    try:
+        prompt = build_analysis_prompt(score, breakdown, data)
+        return await generate_json_async(model, 'analysis', (score, breakdown, data), prompt, timeout)
+    except Exception as e:
+        return use_fallback('analysis', e, get_dummy_ai_data)
+
+
+async def get_loan_suggestion_async(model, score, data, timeout=None):
+    """Async version of ai_agents.get_loan_suggestion."""
+    if not model:
+        return {"error": "AI Agent offline"}
+
+    try:
+        prompt = build_loan_prompt(score, data)
+        return await generate_json_async(model, 'loan_suggestion', get_loan_inputs(score, data), prompt, timeout)
+    except Exception as e:
+        return use_fallback('loan_suggestion', e, lambda: {"error": "Could not determine loan suggestion"})
+
+
+async def get_health_insights_async(model, health_data, timeout=None):
+    """Async version of ai_agents.get_health_insights."""
+    if not model:
+        return get_offline_health_insights()
+
+    try:
+        prompt = build_health_insights_prompt(health_data)
+        return await generate_json_async(model, 'health_insights', health_data, prompt, timeout)
+    except Exception as e:
+        return use_fallback('health_insights', e, get_fallback_health_insights, health_data)
+
+
+async def get_personalized_finance_insight_async(model, user_data, timeout=None):
+    """Async version of ai_agents.get_personalized_finance_insight."""
+    if not model:
+        return get_fallback_finance_insight()
+
+    try:
+        prompt = build_finance_insight_prompt(user_data)
+        inputs = get_finance_insight_inputs(user_data)
+        return await generate_json_async(model, 'finance_insight', inputs, prompt, timeout)
+    except Exception as e:
+        return use_fallback('finance_insight', e, get_fallback_finance_insight)
@@ -0,0 +1,135 @@
+# batching.py - Micro-batching of short LLM prompts
+#
+# For short prompts the fixed cost of a generate_content call dominates. The
+# MicroBatcher collects requests for a few milliseconds (or until max_items
+# arrive), sends them as one prompt, and hands each caller its own answer.
+# If the batched answer is malformed (not splittable into one answer per
+# item), every item is retried on its own. Any other failure (API error,
+# timeout, open circuit) is passed to every caller as is: retrying N calls
+# against a failing upstream would only multiply the load on it.
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from structured_log import get_logger
+
+log = get_logger('batching')
+
+
+class MalformedBatchError(ValueError):
+    """The model answered, but its reply cannot be split into one answer per payload."""
+
+
+class MicroBatcher:
+    """
+    batch_call(model, payloads) must return one answer per payload, in order,
+    and raise MalformedBatchError if the model's reply cannot be split that way.
+    single_call(model, payload) answers one payload (the fallback path).
+    """
+
+    def __init__(self, batch_call, single_call, window_seconds=0.005, max_items=16,
+                 max_workers=4, name='batch'):
+        self.batch_call = batch_call
+        self.single_call = single_call
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{name}-dispatch')
+        self._cond = threading.Condition()
+        self._pending = []  # (model, payload, future, arrived_at)
+        self._collector = None
+        self.batches = 0
+        self.batched_items = 0
+        self.fallback_batches = 0
+        self.failed_batches = 0
+        self.single_calls = 0
+
+    @property
+    def enabled(self):
+        return self.window_seconds > 0 and self.max_items > 1
+
+    def submit(self, model, payload):
+        """Queues one payload and returns a Future for its answer."""
+        future = Future()
+        with self._cond:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, name=f'{self.name}-collector', daemon=True)
+                self._collector.start()
+            self._pending.append((model, payload, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        with self._cond:
+            return {
+                "window_ms": self.window_seconds * 1000,
+                "max_items": self.max_items,
+                "batches": self.batches,
+                "batched_items": self.batched_items,
+                "fallback_batches": self.fallback_batches,
+                "failed_batches": self.failed_batches,
+                "single_calls": self.single_calls,
+                "pending": len(self._pending),
+            }
+
+    # --- Internals ---
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0][3] + self.window_seconds
+                while len(self._pending) < self.max_items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_items]
+                del self._pending[:self.max_items]
+
+            # Items for different model objects cannot share a prompt
+            groups = {}
+            for model, payload, future, _ in batch:
+                groups.setdefault(id(model), (model, []))[1].append((payload, future))
+            for model, entries in groups.values():
+                self._executor.submit(self._dispatch, model, entries)
+
+    def _dispatch(self, model, entries):
+        if len(entries) == 1:
+            self._resolve_single(model, entries[0])
+            return
+        try:
+            answers = self.batch_call(model, [payload for payload, _ in entries])
+            if len(answers) != len(entries):
+                raise MalformedBatchError(f"expected {len(entries)} answers, got {len(answers)}")
+        except MalformedBatchError as e:
+            log.warning("malformed batched answer; retrying items individually", batcher=self.name,
+                        items=len(entries), error=str(e))
+            with self._cond:
+                self.fallback_batches += 1
+            for entry in entries:
+                self._executor.submit(self._resolve_single, model, entry)
+            return
+        except Exception as e:
+            with self._cond:
+                self.failed_batches += 1
+            for _, future in entries:
+                future.set_exception(e)
+            return
+
+        with self._cond:
+            self.batches += 1
+            self.batched_items += len(entries)
+        for (_, future), answer in zip(entries, answers):
+            future.set_result(answer)
+
+    def _resolve_single(self, model, entry):
+        payload, future = entry
+        with self._cond:
+            self.single_calls += 1
+        try:
+            future.set_result(self.single_call(model, payload))
+        except Exception as e:
+            future.set_exception(e)
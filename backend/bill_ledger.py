@@ -0,0 +1,345 @@
+# bill_ledger.py - Per-user bill ledger with a due-date index
+#
+# A bill is one row however long it recurs: it stores its first due date,
+# its recurrence and how many occurrences have been paid, plus `next_due`,
+# the earliest unpaid occurrence. The index on (user_id, status, next_due)
+# turns "overdue" and "due in the next N days" into one B-tree range scan,
+# and paying a bill advances next_due in place, so each is O(log n) plus
+# the rows returned. Occurrences are computed from the occurrence number
+# when a query needs them; nothing is materialized ahead of time.
+#
+# BILL_DB_PATH (default backend/bills.db, or the temp directory where
+# backend/ is read-only; see sqlite_store.default_path) also holds the
+# streak, budget, cash-flow and data_versions tables.
+
+import calendar
+import os
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlite_store import SQLiteStore, default_path
+
+BILL_DB_PATH = os.getenv('BILL_DB_PATH') or default_path('bills.db')
+BILL_DB_BUSY_TIMEOUT_MS = int(os.getenv('BILL_DB_BUSY_TIMEOUT_MS', 5000))
+BILL_UPCOMING_DAYS = int(os.getenv('BILL_UPCOMING_DAYS', 30))
+
+# Most occurrences of one bill listed by a query (a weekly bill unpaid for
+# years still counts every occurrence in overdue_count)
+MAX_LISTED_OCCURRENCES = 12
+
+# recurrence -> (months, days) between occurrences
+RECURRENCES = {
+    "weekly": (0, 7),
+    "biweekly": (0, 14),
+    "monthly": (1, 0),
+    "quarterly": (3, 0),
+    "yearly": (12, 0),
+}
+# Due dates outside this range cannot be scheduled as reminders (epoch-second heap keys)
+MIN_DUE_DATE = date(1970, 1, 2)
+MAX_DUE_DATE = date(2999, 12, 31)
+BILL_CATEGORIES = ("rent", "utilities", "services", "loan", "insurance", "subscription", "other")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    first_due TEXT NOT NULL,
+    recurrence TEXT,
+    occurrences INTEGER,
+    paid_count INTEGER NOT NULL DEFAULT 0,
+    next_due TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bills_user_due ON bills(user_id, status, next_due);
+CREATE INDEX IF NOT EXISTS idx_bills_due ON bills(status, next_due);
+CREATE TABLE IF NOT EXISTS bill_payments (
+    bill_id TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    paid_on TEXT NOT NULL,
+    on_time INTEGER NOT NULL,
+    PRIMARY KEY (bill_id, due_date)
+);  -- rowid: the order payments were recorded in, which streaks.py replays
+CREATE INDEX IF NOT EXISTS idx_bill_payments_user ON bill_payments(user_id, paid_on);
+"""
+
+_INSERT_SQL = (
+    "INSERT INTO bills (id, user_id, name, amount, category, first_due, recurrence, occurrences, "
+    "paid_count, next_due, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, 'open', ?)"
+)
+
+
+class BillError(ValueError):
+    """Raised for invalid bills and payments."""
+
+
+class BillNotFoundError(BillError):
+    """Raised when a bill does not exist or belongs to another user."""
+
+
+class BillLedger(SQLiteStore):
+    SCHEMA = SCHEMA
+
+    def __init__(self, path=BILL_DB_PATH, busy_timeout_ms=BILL_DB_BUSY_TIMEOUT_MS):
+        super().__init__(path, busy_timeout_ms)
+
+    # --- Writes ---
+
+    def add_bill(self, user_id, name, amount, due_date, category='other', recurrence=None,
+                 occurrences=None):
+        """Adds a bill (recurring if `recurrence` is set) and returns it."""
+        return self.add_bills([{
+            "user_id": user_id, "name": name, "amount": amount, "due_date": due_date,
+            "category": category, "recurrence": recurrence, "occurrences": occurrences,
+        }])[0]
+
+    def add_bills(self, bills):
+        """Adds many bill dicts (user_id, name, amount, due_date, ...) in one transaction."""
+        rows = [_bill_to_row(bill) for bill in bills]
+        with self.batch() as conn:
+            conn.executemany(_INSERT_SQL, rows)
+        return [self._row_dict(row) for row in rows]
+
+    def mark_paid(self, user_id, bill_id, paid_on=None):
+        """
+        Pays the bill's earliest unpaid occurrence. `bill_id` may also be an
+        occurrence id ("<bill id>:<due date>"), which must then be that
+        occurrence. Returns the payment with the bill's new next_due.
+        """
+        bill_id, _, due = str(bill_id).partition(':')
+        paid_on = _parse_date(paid_on) if paid_on else date.today()
+        with self.batch() as conn:
+            row = conn.execute("SELECT * FROM bills WHERE id = ?", (bill_id,)).fetchone()
+            if row is None or row["user_id"] != str(user_id):
+                raise BillNotFoundError(f"bill {bill_id!r} not found")
+            if row["status"] != 'open':
+                raise BillError(f"bill {bill_id!r} is already paid")
+            if due and due != row["next_due"]:
+                raise BillError(f"pay the occurrence due {row['next_due']} first")
+            paid_count = row["paid_count"] + 1
+            next_due = _occurrence(row, paid_count)
+            status = 'open' if next_due else 'settled'
+            conn.execute(
+                "UPDATE bills SET paid_count = ?, next_due = ?, status = ? WHERE id = ?",
+                (paid_count, next_due and next_due.isoformat(), status, bill_id),
+            )
+            on_time = paid_on.isoformat() <= row["next_due"]
+            conn.execute(
+                "INSERT INTO bill_payments (bill_id, due_date, user_id, amount, paid_on, on_time) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (bill_id, row["next_due"], row["user_id"], row["amount"], paid_on.isoformat(), int(on_time)),
+            )
+        return {
+            "bill_id": bill_id, "name": row["name"], "amount": row["amount"], "category": row["category"],
+            "due_date": row["next_due"], "paid_on": paid_on.isoformat(), "on_time": on_time,
+            "next_due": next_due and next_due.isoformat(), "status": status,
+        }
+
+    def delete_bill(self, user_id, bill_id):
+        with self.batch() as conn:
+            cursor = conn.execute("DELETE FROM bills WHERE id = ? AND user_id = ?", (bill_id, str(user_id)))
+        return cursor.rowcount == 1
+
+    # --- Reads ---
+
+    def get_bill(self, bill_id):
+        row = self.connection().execute("SELECT * FROM bills WHERE id = ?", (bill_id,)).fetchone()
+        return self._row_dict(row) if row else None
+
+    def agenda(self, user_id, days=BILL_UPCOMING_DAYS, today=None):
+        """
+        Unpaid occurrences due before today (overdue) and in the next `days`
+        days (upcoming), each sorted by due date, from one index range scan.
+        """
+        today = _parse_date(today) if today else date.today()
+        horizon = today + timedelta(days=days)
+        overdue, upcoming, overdue_count = [], [], 0
+        for row in self._open_rows(user_id, horizon):
+            first_upcoming = max(row["paid_count"], _first_on_or_after(row, today))
+            overdue_count += first_upcoming - row["paid_count"]
+            overdue.extend(self._expand(row, row["paid_count"], first_upcoming, today, 'overdue'))
+            upcoming.extend(self._expand(row, first_upcoming, None, horizon, 'pending'))
+        overdue.sort(key=lambda occurrence: occurrence["due_date"])
+        upcoming.sort(key=lambda occurrence: occurrence["due_date"])
+        return {"overdue": overdue, "upcoming": upcoming, "overdue_count": overdue_count}
+
+    def upcoming(self, user_id, days=BILL_UPCOMING_DAYS, today=None):
+        """Unpaid occurrences due in [today, today + days], by due date."""
+        return self.agenda(user_id, days, today)["upcoming"]
+
+    def overdue(self, user_id, today=None):
+        """Unpaid occurrences due before today, by due date."""
+        today = _parse_date(today) if today else date.today()
+        overdue = []
+        for row in self._open_rows(user_id, today - timedelta(days=1)):
+            overdue.extend(self._expand(row, row["paid_count"], _first_on_or_after(row, today), today, 'overdue'))
+        overdue.sort(key=lambda occurrence: occurrence["due_date"])
+        return overdue
+
+    def iter_open_bills(self, chunk_size=10000):
+        """
+        Every open bill with its earliest unpaid occurrence, soonest first
+        (for the reminder scheduler). Reads in keyset-paginated chunks.
+        """
+        conn = self.connection()
+        last = ('', '')
+        while True:
+            rows = conn.execute(
+                "SELECT id, user_id, name, amount, next_due FROM bills "
+                "WHERE status = 'open' AND (next_due, id) > (?, ?) ORDER BY next_due, id LIMIT ?",
+                (*last, chunk_size),
+            ).fetchall()
+            for row in rows:
+                yield {key: row[key] for key in ("id", "user_id", "name", "amount", "next_due")}
+            if len(rows) < chunk_size:
+                return
+            last = (rows[-1]["next_due"], rows[-1]["id"])
+
+    def recent_payments(self, user_id, limit=5):
+        """The user's latest payments, newest first."""
+        rows = self.connection().execute(
+            "SELECT p.*, b.name, b.category, b.recurrence FROM bill_payments p "
+            "LEFT JOIN bills b ON b.id = p.bill_id "
+            "WHERE p.user_id = ? ORDER BY p.paid_on DESC, p.due_date DESC LIMIT ?",
+            (str(user_id), limit),
+        ).fetchall()
+        return [{
+            "id": f"{row['bill_id']}:{row['due_date']}", "bill_id": row["bill_id"], "name": row["name"],
+            "amount": row["amount"], "category": row["category"], "due_date": row["due_date"],
+            "paid_on": row["paid_on"], "on_time": bool(row["on_time"]), "status": "paid",
+            "recurring": row["recurrence"] is not None,
+        } for row in rows]
+
+    # --- Internals ---
+
+    def _open_rows(self, user_id, until):
+        """Open bills whose earliest unpaid occurrence is due on or before `until` (index range)."""
+        return self.connection().execute(
+            "SELECT * FROM bills WHERE user_id = ? AND status = 'open' AND next_due <= ? ORDER BY next_due",
+            (str(user_id), until.isoformat()),
+        ).fetchall()
+
+    @staticmethod
+    def _expand(row, start, stop, until, status):
+        """Occurrences start..stop-1 (stop=None: until the due date passes `until`)."""
+        occurrences = []
+        n = start
+        while len(occurrences) < MAX_LISTED_OCCURRENCES and (stop is None or n < stop):
+            due = _occurrence(row, n)
+            if due is None or (stop is None and due > until):
+                break
+            occurrences.append({
+                "id": f"{row['id']}:{due.isoformat()}", "bill_id": row["id"], "name": row["name"],
+                "amount": row["amount"], "category": row["category"], "due_date": due.isoformat(),
+                "status": status, "recurring": row["recurrence"] is not None,
+                "recurrence": row["recurrence"],
+            })
+            n += 1
+        return occurrences
+
+    @staticmethod
+    def _row_dict(row):
+        keys = ("id", "user_id", "name", "amount", "category", "first_due", "recurrence",
+                "occurrences", "next_due", "created_at")
+        bill = dict(zip(keys, row)) if isinstance(row, tuple) else {key: row[key] for key in keys}
+        bill["recurring"] = bill["recurrence"] is not None
+        return bill
+
+
+# --- Occurrence arithmetic ---
+
+def _occurrence(row, n):
+    """Due date of occurrence `n` (0-based), or None past the bill's last occurrence."""
+    if n >= _occurrence_count(row):
+        return None
+    return _nth_due(_parse_date(row["first_due"]), row["recurrence"], n)
+
+
+def _occurrence_count(row):
+    """Number of occurrences the bill has (inf if it recurs without end)."""
+    if row["recurrence"] is None:
+        return 1
+    return float('inf') if row["occurrences"] is None else row["occurrences"]
+
+
+def _nth_due(first, recurrence, n):
+    if recurrence is None:
+        return first
+    months, days = RECURRENCES[recurrence]
+    if days:
+        return first + timedelta(days=days * n)
+    # Keep the original day of month; clamp in shorter months (Jan 31 -> Feb 28 -> Mar 31)
+    month_index = first.month - 1 + months * n
+    year, month = first.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(first.day, calendar.monthrange(year, month)[1]))
+
+
+def _first_on_or_after(row, day):
+    """
+    Smallest occurrence number due on or after `day`, capped at the number
+    of occurrences. O(1): computed from the date, not by stepping through.
+    """
+    first = _parse_date(row["first_due"])
+    recurrence = row["recurrence"]
+    if day <= first:
+        return 0
+    if recurrence is None:
+        return 1
+    months, days = RECURRENCES[recurrence]
+    if days:
+        n = -(-(day - first).days // days)
+    else:
+        n = ((day.year - first.year) * 12 + day.month - first.month) // months
+        # The estimate is short by at most one because of the day-of-month clamp
+        if _nth_due(first, recurrence, n) < day:
+            n += 1
+    return min(n, _occurrence_count(row))
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise BillError(f"invalid date {value!r} (expected YYYY-MM-DD)")
+
+
+def _bill_to_row(bill):
+    """Validates a bill dict and returns its insert parameters."""
+    name = str(bill.get("name") or "").strip()
+    if not name:
+        raise BillError("bill name is required")
+    try:
+        amount = float(bill.get("amount"))
+    except (TypeError, ValueError):
+        raise BillError("amount must be a number")
+    if not 0 < amount < float('inf'):
+        raise BillError("amount must be greater than 0")
+    category = bill.get("category") or 'other'
+    if category not in BILL_CATEGORIES:
+        raise BillError(f"unknown category {category!r}")
+    recurrence = bill.get("recurrence") or None
+    if recurrence is not None and recurrence not in RECURRENCES:
+        raise BillError(f"recurrence must be one of {', '.join(RECURRENCES)}")
+    occurrences = bill.get("occurrences")
+    if occurrences is not None:
+        try:
+            occurrences = int(occurrences)
+        except (TypeError, ValueError):
+            raise BillError("occurrences must be a whole number")
+        if occurrences < 1:
+            raise BillError("occurrences must be at least 1")
+    first_due = _parse_date(bill.get("due_date"))
+    if not MIN_DUE_DATE <= first_due <= MAX_DUE_DATE:
+        raise BillError(f"due_date must be between {MIN_DUE_DATE} and {MAX_DUE_DATE}")
+    first_due = first_due.isoformat()
+    return (bill.get("id") or f"bill_{uuid.uuid4().hex[:16]}", str(bill["user_id"]), name, amount, category,
+            first_due, recurrence, occurrences if recurrence else None, first_due,
+            datetime.now().isoformat(timespec='seconds'))
@@ -0,0 +1,334 @@
+# budget_tracker.py - Monthly budgets with running per-category totals
+#
+# Every transaction is folded into a running (user, month, category) total
+# as it is ingested; nothing is recomputed from the transaction history. A
+# budget read is two primary-key range scans bounded by the number of
+# categories, so it costs the same after ten transactions or ten million.
+# Bank statements (CSV/NDJSON) stream through the same path in chunks, one
+# SQLite transaction per chunk, so memory stays flat whatever the file size.
+#
+# Amounts are kept as integer paise so totals never drift. Positive amounts
+# (and debits) are spending; credits and negative amounts are refunds.
+
+import calendar
+import os
+import re
+from datetime import date, datetime
+
+import data_versions
+from sqlite_store import SQLiteStore
+from bill_ledger import BILL_DB_PATH, BILL_DB_BUSY_TIMEOUT_MS
+from stream_io import iter_chunks
+
+BUDGET_INGEST_CHUNK_SIZE = int(os.getenv('BUDGET_INGEST_CHUNK_SIZE', 1000))
+MAX_REPORTED_ERRORS = 100
+
+BUDGET_CATEGORIES = (
+    "rent", "utilities", "food", "transport", "shopping", "entertainment", "health",
+    "education", "services", "loan", "insurance", "subscription", "other",
+)
+# Common bank statement labels; anything else unknown is counted as "other"
+CATEGORY_ALIASES = {
+    "groceries": "food", "grocery": "food", "dining": "food", "restaurant": "food", "restaurants": "food",
+    "fuel": "transport", "travel": "transport", "taxi": "transport",
+    "electricity": "utilities", "water": "utilities", "gas": "utilities", "internet": "utilities",
+    "mobile": "utilities", "medical": "health", "pharmacy": "health", "emi": "loan",
+    "movies": "entertainment", "ott": "subscription",
+}
+# Paid once a month, so not extrapolated when projecting the month's spending
+FIXED_CATEGORIES = frozenset(("rent", "loan", "insurance", "subscription"))
+TOTAL = "total"  # budget_limits row holding the overall monthly budget
+
+# Used until a user sets their own budget
+DEFAULT_BUDGETS = {
+    TOTAL: float(os.getenv('BUDGET_DEFAULT_TOTAL', 30000)),
+    "rent": 15000, "utilities": 2000, "food": 6000, "entertainment": 3000,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS budget_limits (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (user_id, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS budget_totals (
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    spent INTEGER NOT NULL,
+    transactions INTEGER NOT NULL,
+    PRIMARY KEY (user_id, month, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS budget_seen (
+    user_id TEXT NOT NULL,
+    txn_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, txn_id)
+) WITHOUT ROWID;
+"""
+
+_ADD_SQL = (
+    "INSERT INTO budget_totals (user_id, month, category, spent, transactions) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, month, category) DO UPDATE SET "
+    "spent = spent + excluded.spent, transactions = transactions + excluded.transactions"
+)
+
+# ISO dates (a time part is ignored) or Indian bank style DD/MM/YYYY, DD-MM-YYYY, DD/MM/YY
+_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:$|[T ])")
+_DMY_DATE = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{4}|\d{2})$")
+
+
+class BudgetError(ValueError):
+    pass
+
+
+class BudgetTracker(SQLiteStore):
+    """Budgets and running totals, stored in the bill ledger's database by default."""
+    SCHEMA = SCHEMA + data_versions.SCHEMA
+
+    def __init__(self, path=BILL_DB_PATH, busy_timeout_ms=BILL_DB_BUSY_TIMEOUT_MS):
+        super().__init__(path, busy_timeout_ms)
+
+    # --- Ingest ---
+
+    def ingest(self, user_id, records, chunk_size=BUDGET_INGEST_CHUNK_SIZE):
+        """
+        Folds transactions into the user's running totals. `records` yields
+        (record, error) pairs as stream_io.iter_records() does. Records with an
+        `id` already seen for this user are skipped, so re-importing a
+        statement is harmless. Returns counts plus the first rejected rows.
+        """
+        user_id = str(user_id)
+        report = {"imported": 0, "duplicates": 0, "rejected": 0, "errors": []}
+        row = 0
+        for chunk in iter_chunks(records, chunk_size):
+            deltas = {}
+            with self.batch() as conn:
+                for record, error in chunk:
+                    row += 1
+                    if error is None:
+                        try:
+                            month, category, paise, txn_id = parse_transaction(record)
+                        except BudgetError as e:
+                            error = str(e)
+                    if error is not None:
+                        report["rejected"] += 1
+                        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                            report["errors"].append({"row": row, "error": error})
+                        continue
+                    if txn_id is not None and not conn.execute(
+                            "INSERT OR IGNORE INTO budget_seen (user_id, txn_id) VALUES (?, ?)",
+                            (user_id, txn_id)).rowcount:
+                        report["duplicates"] += 1
+                        continue
+                    total = deltas.get((month, category))
+                    if total is None:
+                        deltas[(month, category)] = [paise, 1]
+                    else:
+                        total[0] += paise
+                        total[1] += 1
+                    report["imported"] += 1
+                conn.executemany(_ADD_SQL, [
+                    (user_id, month, category, spent, count)
+                    for (month, category), (spent, count) in deltas.items()
+                ])
+                if deltas:
+                    data_versions.bump(conn, 'budget', user_id)
+        return report
+
+    def add_transactions(self, user_id, transactions):
+        """ingest() for a list of transaction dicts."""
+        return self.ingest(user_id, ((transaction, None) for transaction in transactions))
+
+    # --- Budgets ---
+
+    def set_budget(self, user_id, total=None, categories=None):
+        """Sets the overall and/or per-category monthly budgets (rupees)."""
+        if categories is not None and not isinstance(categories, dict):
+            raise BudgetError(f"categories must map category names to amounts, got {type(categories).__name__}")
+        limits = {}
+        if total is not None:
+            limits[TOTAL] = _to_paise(total, "total_budget")
+        for name, amount in (categories or {}).items():
+            category = CATEGORY_ALIASES.get(str(name).strip().lower(), str(name).strip().lower())
+            if category not in BUDGET_CATEGORIES:
+                raise BudgetError(f"unknown category {name!r}; use one of {', '.join(BUDGET_CATEGORIES)}")
+            if isinstance(amount, dict):
+                amount = amount.get("budget")
+            limits[category] = _to_paise(amount, f"budget for {name}")
+        if any(paise < 0 for paise in limits.values()):
+            raise BudgetError("budgets cannot be negative")
+        with self.batch() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO budget_limits (user_id, category, amount) VALUES (?, ?, ?)",
+                [(str(user_id), category, paise) for category, paise in limits.items()],
+            )
+            data_versions.bump(conn, 'budget', user_id)
+
+    def limits(self, user_id):
+        """{category: paise}, with TOTAL set; the defaults if the user has none."""
+        rows = self.connection().execute(
+            "SELECT category, amount FROM budget_limits WHERE user_id = ?", (str(user_id),)).fetchall()
+        if not rows:
+            return {category: round(amount * 100) for category, amount in DEFAULT_BUDGETS.items()}
+        limits = {row["category"]: row["amount"] for row in rows}
+        if TOTAL not in limits:
+            limits[TOTAL] = sum(limits.values())
+        return limits
+
+    def totals(self, user_id, month):
+        """{category: (spent paise, transactions)} for one 'YYYY-MM' month."""
+        rows = self.connection().execute(
+            "SELECT category, spent, transactions FROM budget_totals WHERE user_id = ? AND month = ?",
+            (str(user_id), month)).fetchall()
+        return {row["category"]: (row["spent"], row["transactions"]) for row in rows}
+
+    def version(self, user_id):
+        """(version, last change) of the user's budgets and totals; see data_versions.read()."""
+        return data_versions.read(self.connection(), 'budget', user_id)
+
+    def summary(self, user_id, month=None, today=None):
+        """The /api/finance/budget payload for `month` (default: this month)."""
+        today = today or date.today()
+        month = month or today.strftime("%Y-%m")
+        limits = self.limits(user_id)
+        totals = self.totals(user_id, month)
+        return build_summary(month, limits, totals, today)
+
+
+def build_summary(month, limits, totals, today):
+    """Budget status from {category: paise} limits and {category: (paise, count)} totals."""
+    total_budget = limits[TOTAL]
+    spent = sum(paise for paise, _ in totals.values())
+
+    categories = {}
+    for category in BUDGET_CATEGORIES:
+        budget = limits.get(category)
+        category_spent, count = totals.get(category, (0, 0))
+        if budget is None and not count:
+            continue
+        categories[category] = {
+            "spent": _rupees(category_spent),
+            "budget": _rupees(budget) if budget is not None else None,
+            "remaining": _rupees(budget - category_spent) if budget is not None else None,
+            "percentage_used": _percentage(category_spent, budget),
+            "transactions": count,
+        }
+
+    # Straight-line projection of this month's variable spending; past months are final
+    year, month_number = map(int, month.split("-"))
+    days_in_month = calendar.monthrange(year, month_number)[1]
+    if (year, month_number) == (today.year, today.month):
+        fixed = sum(paise for category, (paise, _) in totals.items() if category in FIXED_CATEGORIES)
+        projected = fixed + (spent - fixed) * days_in_month // today.day
+        days_left = days_in_month - today.day
+    else:
+        projected = spent
+        days_left = days_in_month if (year, month_number) > (today.year, today.month) else 0
+    expected_savings = total_budget - projected
+
+    if expected_savings >= 0:
+        insight_en = f"You're on track! At this rate, you'll save ₹{expected_savings / 100:,.0f} this month."
+        insight_hi = f"आप सही दिशा में हैं! इस गति से आप ₹{expected_savings / 100:,.0f} बचाएंगे।"
+    else:
+        top = max(categories, key=lambda name: categories[name]["spent"])
+        insight_en = (f"At this rate you'll go ₹{-expected_savings / 100:,.0f} over budget this month. "
+                      f"Your biggest spend is {top}.")
+        insight_hi = (f"इस गति से आप इस महीने बजट से ₹{-expected_savings / 100:,.0f} ज़्यादा खर्च करेंगे। "
+                      f"सबसे बड़ा खर्च: {top}।")
+
+    return {
+        "month": month,
+        "total_budget": _rupees(total_budget),
+        "spent": _rupees(spent),
+        "remaining": _rupees(total_budget - spent),
+        "percentage_used": _percentage(spent, total_budget),
+        "categories": categories,
+        "ai_insight_en": insight_en,
+        "ai_insight_hi": insight_hi,
+        "projection": {
+            "expected_savings": _rupees(expected_savings),
+            "projected_spending": _rupees(projected),
+            "days_left_in_month": days_left,
+        },
+    }
+
+
+def parse_transaction(record):
+    """
+    (month, category, paise, txn_id) from a transaction record. Takes
+    `amount` (or bank-style `debit`/`credit` columns), a `date` (ISO or
+    DD/MM/YYYY), an optional `category`, `type` ("debit"/"credit") and `id`.
+    """
+    if "amount" in record:
+        paise = _to_paise(record["amount"], "amount")
+        if str(record.get("type", "")).strip().lower() in ("credit", "cr", "refund"):
+            paise = -abs(paise)
+    elif "debit" in record or "credit" in record:
+        paise = (_to_paise(record.get("debit") or 0, "debit")
+                 - _to_paise(record.get("credit") or 0, "credit"))
+    else:
+        raise BudgetError("amount is required")
+    txn_id = record.get("id", record.get("transaction_id"))
+    if txn_id is not None:
+        txn_id = str(txn_id).strip()[:128] or None
+    return _month(record.get("date")), _category(record.get("category")), paise, txn_id
+
+
+def _to_paise(value, field):
+    if isinstance(value, str):
+        value = value.replace(",", "").replace("₹", "").replace("INR", "").strip()
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise BudgetError(f"{field} must be a number, got {value!r}") from None
+    if amount != amount or abs(amount) > 1e13:
+        raise BudgetError(f"{field} is out of range")
+    return round(amount * 100)
+
+
+def _month(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m")
+    if not value:
+        raise BudgetError("date is required")
+    text = str(value).strip()
+    match = _ISO_DATE.match(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _DMY_DATE.match(text)
+        if not match:
+            raise BudgetError(f"date must be YYYY-MM-DD or DD/MM/YYYY, got {text!r}")
+        day, month, year = match.groups()
+        if len(year) == 2:
+            year = "20" + year
+    try:
+        date(int(year), int(month), int(day))
+    except ValueError:
+        raise BudgetError(f"{text!r} is not a valid date") from None
+    return f"{year}-{int(month):02d}"
+
+
+def parse_month(value):
+    """Validates a 'YYYY-MM' month (e.g. from ?month=)."""
+    try:
+        return datetime.strptime(str(value), "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise BudgetError(f"month must be YYYY-MM, got {value!r}") from None
+
+
+def _category(value):
+    name = str(value or "other").strip().lower()
+    name = CATEGORY_ALIASES.get(name, name)
+    return name if name in BUDGET_CATEGORIES else "other"
+
+
+def _rupees(paise):
+    return round(paise / 100, 2)
+
+
+def _percentage(spent, budget):
+    if not budget:
+        return 0
+    return round(spent * 100 / budget)
@@ -0,0 +1,380 @@
+# cashflow.py - Day-by-day balance forecast behind the emergency shield
+#
+# Each user's balance is projected over the next N days from their cash
+# profile (balance, income and pay dates) and their open bills in the
+# ledger. Unpaid overdue occurrences land on day 0; recurring bills and
+# income repeat with the ledger's recurrences. The first day the balance
+# goes negative and the lowest balance reached give the risk score.
+#
+# One engine serves both paths: forecast_columns() takes the cash flows of
+# any number of users as parallel arrays (numpy, imported on first use), so
+# the on-demand call for one user and the nightly batch over every user
+# produce the same numbers. The batch streams the ledger in user order,
+# CASHFLOW_BATCH_USERS users at a time, and keeps one summary row per user
+# in cash_forecasts.
+#
+# Usage:
+#     python cashflow.py nightly [days]
+
+import os
+import sys
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+from sqlite_store import SQLiteStore
+import bill_ledger
+from bill_ledger import BILL_DB_PATH, BILL_DB_BUSY_TIMEOUT_MS, RECURRENCES, BillError, _parse_date
+
+FORECAST_DAYS = int(os.getenv('CASHFLOW_FORECAST_DAYS', 30))
+CASHFLOW_BATCH_USERS = int(os.getenv('CASHFLOW_BATCH_USERS', 50_000))
+CASHFLOW_NIGHTLY_HOUR = int(os.getenv('CASHFLOW_NIGHTLY_HOUR', 2))
+# Balance assumed for users who have not shared theirs yet
+CASHFLOW_DEFAULT_BALANCE = float(os.getenv('CASHFLOW_DEFAULT_BALANCE', 2500))
+
+# Risk score by headroom (lowest balance / bills due in the window) while the
+# balance stays positive. A balance that goes negative scores 85-100, higher
+# the sooner it happens.
+HEADROOM_POINTS = (0.0, 0.1, 0.5, 1.5)
+HEADROOM_RISK = (85, 70, 40, 10)
+STATUSES = ("safe", "caution", "warning")  # risk above CAUTION_RISK / WARNING_RISK
+CAUTION_RISK = 40
+WARNING_RISK = 70
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cash_profiles (
+    user_id TEXT PRIMARY KEY,
+    balance REAL NOT NULL,
+    income REAL NOT NULL DEFAULT 0,
+    income_next TEXT,
+    income_recurrence TEXT,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cash_forecasts (
+    user_id TEXT PRIMARY KEY,
+    computed_on TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    risk_score INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    first_negative TEXT,
+    min_balance REAL NOT NULL,
+    upcoming_bills REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Days since 1970-01-01 of an ISO date column, computed by SQLite
+_SQL_EPOCH_DAY = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+_UNLIMITED = 1 << 40
+# recurrence -> code in FlowColumns.recurrence (0 is a one-off) and its (months, days) step
+_RECURRENCE_CODES = {name: code for code, name in enumerate(RECURRENCES, start=1)}
+_RECURRENCE_STEPS = [(0, 0)] + list(RECURRENCES.values())
+
+_FORECAST_UPSERT_SQL = (
+    "INSERT OR REPLACE INTO cash_forecasts "
+    "(user_id, computed_on, days, risk_score, status, first_negative, min_balance, upcoming_bills) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class CashFlowError(ValueError):
+    pass
+
+
+class FlowColumns:
+    """
+    Cash flows of a group of users as parallel columns. add_user() starts a
+    user; the add_bill() and add_income() calls after it belong to that user.
+    Days are counted from 1970-01-01.
+    """
+    __slots__ = ("user_ids", "balance", "user", "amount", "first", "recurrence", "limit", "paid", "carry")
+
+    def __init__(self):
+        self.user_ids = []
+        self.balance = array('d')
+        self.user = array('q')
+        self.amount = array('d')
+        self.first = array('q')
+        self.recurrence = array('b')
+        self.limit = array('q')
+        self.paid = array('q')
+        self.carry = array('b')
+
+    def add_user(self, user_id, balance):
+        self.user_ids.append(user_id)
+        self.balance.append(balance)
+
+    def add_bill(self, amount, first_day, recurrence=None, occurrences=None, paid_count=0):
+        """An open bill; occurrences already due and unpaid are counted on day 0."""
+        self._add(-amount, first_day, recurrence, occurrences, paid_count, True)
+
+    def add_income(self, amount, next_day, recurrence=None):
+        """Income from `next_day` on. Pay dates already past are assumed to be in the balance."""
+        self._add(amount, next_day, recurrence, None, 0, False)
+
+    def _add(self, amount, first_day, recurrence, occurrences, paid_count, carry):
+        self.user.append(len(self.user_ids) - 1)
+        self.amount.append(amount)
+        self.first.append(first_day)
+        self.recurrence.append(_RECURRENCE_CODES[recurrence] if recurrence else 0)
+        if not recurrence:
+            occurrences = 1
+        self.limit.append(_UNLIMITED if occurrences is None else occurrences)
+        self.paid.append(paid_count)
+        self.carry.append(carry)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+
+def forecast_columns(flows, today, days=FORECAST_DAYS, keep_balances=False):
+    """
+    Projects every user in `flows` over `days` days starting `today`.
+    Returns per-user arrays: min_balance, first_negative (day offset, -1 if
+    the balance stays positive), upcoming_bills (bills due in the window,
+    overdue included), risk_score and status (index into STATUSES); plus the
+    (users, days) end-of-day `balances` if keep_balances.
+    """
+    import numpy as np
+
+    users = len(flows)
+    today = today.toordinal() - _EPOCH_ORDINAL
+    user = np.array(flows.user, dtype=np.int64)
+    amount = np.array(flows.amount, dtype=np.float64)
+    first = np.array(flows.first, dtype=np.int64)
+    limit = np.array(flows.limit, dtype=np.int64)
+    paid = np.array(flows.paid, dtype=np.int64)
+    carry = np.array(flows.carry, dtype=bool)
+    steps = np.array(_RECURRENCE_STEPS, dtype=np.int64)[np.array(flows.recurrence, dtype=np.int64)]
+    step_months, step_days = steps[:, 0], steps[:, 1]
+    first_month = first.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    first_dom = first - _month_start(np, first_month) + 1
+
+    def due(i, n):
+        """Due day of occurrence n of flows i: bill_ledger._nth_due on arrays."""
+        month = first_month[i] + n * step_months[i]
+        start = _month_start(np, month)
+        in_month = np.minimum(first_dom[i], _month_start(np, month + 1) - start)
+        return np.where(step_days[i] > 0, first[i] + n * step_days[i], start + in_month - 1)
+
+    # Occurrences before `start` are due before today; computed from the date, not by stepping
+    every = np.arange(len(amount))
+    today_month = np.datetime64(today, 'D').astype('datetime64[M]').astype(np.int64)
+    by_days = (today - 1 - first) // np.maximum(step_days, 1)
+    by_months = (today_month - first_month) // np.maximum(step_months, 1)
+    by_months -= due(every, by_months) >= today  # The estimate is past today by at most one
+    last = np.where(step_days > 0, by_days, np.where(step_months > 0, by_months, (first < today) - 1))
+    start = np.minimum(np.maximum(paid, last + 1), limit)
+
+    net = np.zeros(users * days)
+    overdue = np.where(carry, start - paid, 0)
+    net += np.bincount(user * days, weights=overdue * amount, minlength=users * days)
+    outflows = np.bincount(user, weights=np.where(amount < 0, overdue * -amount, 0), minlength=users)
+
+    # Occurrences inside the window: one vectorized step per occurrence number
+    idx, n = every, start
+    while len(idx):
+        day = due(idx, n)
+        inside = (day < today + days) & (n < limit[idx])
+        idx, n, day = idx[inside], n[inside], day[inside]
+        weights = amount[idx]
+        net += np.bincount(user[idx] * days + (day - today), weights=weights, minlength=users * days)
+        outflows += np.bincount(user[idx], weights=np.where(weights < 0, -weights, 0), minlength=users)
+        n = n + 1
+
+    balances = np.array(flows.balance, dtype=np.float64)[:, None] + np.cumsum(net.reshape(users, days), axis=1)
+    min_balance = balances.min(axis=1) if days else np.array(flows.balance, dtype=np.float64)
+    negative = balances < 0
+    first_negative = np.where(negative.any(axis=1), negative.argmax(axis=1), -1)
+
+    headroom = np.divide(min_balance, outflows, out=np.full(users, np.inf), where=outflows > 0)
+    risk = np.interp(headroom, HEADROOM_POINTS, HEADROOM_RISK)
+    risk = np.where(first_negative >= 0, 100 - 15 * first_negative / max(days, 1), risk).round().astype(np.int64)
+    status = (risk > CAUTION_RISK).astype(np.int64) + (risk > WARNING_RISK)
+
+    result = {
+        "min_balance": min_balance, "first_negative": first_negative, "upcoming_bills": outflows,
+        "risk_score": risk, "status": status,
+    }
+    if keep_balances:
+        result["balances"] = balances
+    return result
+
+
+def _month_start(np, months):
+    """Day (since 1970) of the first of each month (months since 1970-01)."""
+    return months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+
+class CashFlowForecaster(SQLiteStore):
+    """Cash profiles and nightly forecasts, stored in the bill ledger's database by default."""
+    SCHEMA = bill_ledger.SCHEMA + SCHEMA  # Reads the bills table
+
+    def __init__(self, path=BILL_DB_PATH, busy_timeout_ms=BILL_DB_BUSY_TIMEOUT_MS):
+        super().__init__(path, busy_timeout_ms)
+
+    def set_profile(self, user_id, balance, income=0, income_next=None, income_recurrence='monthly'):
+        """Saves the user's balance and income (amount per pay date, next pay date, recurrence)."""
+        try:
+            balance, income = float(balance), float(income or 0)
+        except (TypeError, ValueError):
+            raise CashFlowError("balance and income must be numbers") from None
+        if not (abs(balance) < 1e13 and 0 <= income < 1e13):
+            raise CashFlowError("balance or income is out of range")
+        if income_recurrence is not None and income_recurrence not in RECURRENCES:
+            raise CashFlowError(f"income_recurrence must be one of {', '.join(RECURRENCES)}")
+        if income and not income_next:
+            raise CashFlowError("income_next (the next pay date) is required with income")
+        try:
+            income_next = _parse_date(income_next).isoformat() if income_next else None
+        except BillError as e:
+            raise CashFlowError(str(e)) from None
+        with self.batch() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cash_profiles "
+                "(user_id, balance, income, income_next, income_recurrence, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(user_id), balance, income, income_next, income_recurrence,
+                 datetime.now().isoformat(timespec='seconds')),
+            )
+
+    def profile(self, user_id):
+        row = self.connection().execute(
+            "SELECT * FROM cash_profiles WHERE user_id = ?", (str(user_id),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def forecast(self, user_id, days=FORECAST_DAYS, today=None):
+        """On-demand forecast for one user, with the daily balance curve."""
+        today = today or date.today()
+        user_id = str(user_id)
+        conn = self.connection()
+        profile = self.profile(user_id)
+        bills = conn.execute(
+            f"SELECT amount, {_SQL_EPOCH_DAY.format('first_due')}, recurrence, occurrences, paid_count "
+            f"FROM bills WHERE user_id = ? AND status = 'open'", (user_id,)).fetchall()
+
+        flows = FlowColumns()
+        _add_profile(flows, user_id, profile)
+        for amount, first_day, recurrence, occurrences, paid_count in bills:
+            flows.add_bill(amount, first_day, recurrence, occurrences, paid_count)
+        result = forecast_columns(flows, today, days, keep_balances=True)
+
+        first_negative = int(result["first_negative"][0])
+        return {
+            "current_balance": round(flows.balance[0], 2),
+            "balance_source": "profile" if profile else "default",
+            "upcoming_bills": round(float(result["upcoming_bills"][0]), 2),
+            "min_balance": round(float(result["min_balance"][0]), 2),
+            "first_negative_date": (today + timedelta(days=first_negative)).isoformat()
+            if first_negative >= 0 else None,
+            "risk_score": int(result["risk_score"][0]),
+            "status": STATUSES[result["status"][0]],
+            "days": days,
+            "daily_balance": [round(float(value), 2) for value in result["balances"][0]],
+        }
+
+    def run_nightly(self, days=FORECAST_DAYS, today=None, batch_users=CASHFLOW_BATCH_USERS):
+        """
+        Forecasts every user with open bills or a cash profile and stores the
+        summaries in cash_forecasts. Returns {users, at_risk, seconds}.
+        """
+        today = today or date.today()
+        start = time.perf_counter()
+        stats = {"users": 0, "at_risk": 0}
+        for flows in self._iter_flow_batches(batch_users):
+            result = forecast_columns(flows, today, days)
+            first_negative = result["first_negative"].tolist()
+            rows = [
+                (user_id, today.isoformat(), days, risk, STATUSES[status],
+                 (today + timedelta(days=offset)).isoformat() if offset >= 0 else None,
+                 round(min_balance, 2), round(outflow, 2))
+                for user_id, risk, status, offset, min_balance, outflow in zip(
+                    flows.user_ids, result["risk_score"].tolist(), result["status"].tolist(), first_negative,
+                    result["min_balance"].tolist(), result["upcoming_bills"].tolist())
+            ]
+            with self.batch() as conn:
+                conn.executemany(_FORECAST_UPSERT_SQL, rows)
+            stats["users"] += len(flows)
+            stats["at_risk"] += sum(1 for offset in first_negative if offset >= 0)
+        stats["seconds"] = round(time.perf_counter() - start, 2)
+        return stats
+
+    def stored_forecast(self, user_id):
+        """The user's summary from the last nightly run, or None."""
+        row = self.connection().execute(
+            "SELECT * FROM cash_forecasts WHERE user_id = ?", (str(user_id),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def _iter_flow_batches(self, batch_users):
+        """FlowColumns of up to batch_users users each, in user order."""
+        conn = self.connection()
+        cursor = conn.execute(
+            f"SELECT b.user_id, b.amount, {_SQL_EPOCH_DAY.format('b.first_due')}, b.recurrence, b.occurrences, "
+            f"b.paid_count, p.balance, p.income, {_SQL_EPOCH_DAY.format('p.income_next')}, p.income_recurrence "
+            f"FROM bills b LEFT JOIN cash_profiles p ON p.user_id = b.user_id "
+            f"WHERE b.status = 'open' ORDER BY b.user_id"
+        )
+        flows, last_user = FlowColumns(), None
+        for (user_id, amount, first_day, recurrence, occurrences, paid_count,
+             balance, income, income_next, income_recurrence) in cursor:
+            if user_id != last_user:
+                if len(flows) >= batch_users:
+                    yield flows
+                    flows = FlowColumns()
+                last_user = user_id
+                flows.add_user(user_id, CASHFLOW_DEFAULT_BALANCE if balance is None else balance)
+                if income:
+                    flows.add_income(income, income_next, income_recurrence)
+            flows.add_bill(amount, first_day, recurrence, occurrences, paid_count)
+
+        # Users with a profile but no open bills
+        cursor = conn.execute(
+            f"SELECT user_id, balance, income, {_SQL_EPOCH_DAY.format('income_next')}, income_recurrence "
+            f"FROM cash_profiles p WHERE NOT EXISTS "
+            f"(SELECT 1 FROM bills b WHERE b.user_id = p.user_id AND b.status = 'open')"
+        )
+        for user_id, balance, income, income_next, income_recurrence in cursor:
+            if len(flows) >= batch_users:
+                yield flows
+                flows = FlowColumns()
+            flows.add_user(user_id, balance)
+            if income:
+                flows.add_income(income, income_next, income_recurrence)
+        if len(flows):
+            yield flows
+
+
+def _add_profile(flows, user_id, profile):
+    if profile is None:
+        flows.add_user(user_id, CASHFLOW_DEFAULT_BALANCE)
+        return
+    flows.add_user(user_id, profile["balance"])
+    if profile["income"]:
+        next_day = date.fromisoformat(profile["income_next"]).toordinal() - _EPOCH_ORDINAL
+        flows.add_income(profile["income"], next_day, profile["income_recurrence"])
+
+
+def next_nightly_run(now=None):
+    """When the nightly batch runs next (CASHFLOW_NIGHTLY_HOUR, local time)."""
+    now = now or datetime.now()
+    run = now.replace(hour=CASHFLOW_NIGHTLY_HOUR, minute=0, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+
+_default_forecaster = None
+
+
+def get_forecaster():
+    global _default_forecaster
+    if _default_forecaster is None:
+        _default_forecaster = CashFlowForecaster()
+    return _default_forecaster
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != 'nightly':
+        print("Usage: python cashflow.py nightly [days]")
+        sys.exit(2)
+    forecaster = get_forecaster()
+    stats = forecaster.run_nightly(int(sys.argv[2]) if len(sys.argv) == 3 else FORECAST_DAYS)
+    print(f"--- Cash-flow forecast: {stats['users']} users, {stats['at_risk']} projected to go negative "
+          f"({stats['seconds']:.2f} s)")
@@ -0,0 +1,153 @@
+# circuit_breaker.py - Fail fast when the Gemini API is slow or erroring
+#
+# CLOSED:    calls go through; outcomes are recorded in a sliding window.
+# OPEN:      the error rate or slow-call rate in the window crossed its
+#            threshold; calls are rejected at once so callers use fallbacks.
+# HALF_OPEN: after open_seconds a few probe calls are let through. If they
+#            succeed (and are fast) the circuit closes, otherwise it re-opens.
+
+import threading
+import time
+from collections import deque
+
+from structured_log import get_logger
+
+log = get_logger('circuit_breaker')
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, window_size=20, min_calls=5, error_rate_threshold=0.5,
+                 slow_call_seconds=10.0, slow_rate_threshold=0.5, open_seconds=30.0,
+                 half_open_probes=2):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._outcomes = deque(maxlen=window_size)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.transitions = {"closed_to_open": 0, "open_to_half_open": 0,
+                            "half_open_to_closed": 0, "half_open_to_open": 0}
+        self.rejected_calls = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self):
+        """True if a call may go to the model now. Every allowed call must be
+        followed by record_success(), record_failure() or record_abandoned()."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self, seconds):
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._transition(OPEN, "half_open_to_open")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED, "half_open_to_closed")
+                return
+            self._record(False, slow)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._transition(OPEN, "half_open_to_open")
+                return
+            self._record(True, False)
+
+    def record_abandoned(self, seconds):
+        """For calls the caller gave up on (cancelled or timed out): counts as
+        slow if it already ran past slow_call_seconds, otherwise is ignored."""
+        if seconds >= self.slow_call_seconds:
+            self.record_success(seconds)
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def snapshot(self):
+        with self._lock:
+            self._maybe_half_open()
+            calls = len(self._outcomes)
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+            return {
+                "name": self.name,
+                "state": self._state,
+                "window_calls": calls,
+                "error_rate": round(failures / calls, 4) if calls else 0.0,
+                "slow_call_rate": round(slow / calls, 4) if calls else 0.0,
+                "rejected_calls": self.rejected_calls,
+                "transitions": dict(self.transitions),
+                "config": {
+                    "window_size": self.window_size,
+                    "min_calls": self.min_calls,
+                    "error_rate_threshold": self.error_rate_threshold,
+                    "slow_call_seconds": self.slow_call_seconds,
+                    "slow_rate_threshold": self.slow_rate_threshold,
+                    "open_seconds": self.open_seconds,
+                    "half_open_probes": self.half_open_probes,
+                },
+            }
+
+    # --- Internals (caller holds self._lock) ---
+
+    def _record(self, failed, slow):
+        if self._state != CLOSED:
+            return  # Late results from calls started before the circuit opened
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        error_rate = sum(1 for f, _ in self._outcomes if f) / calls
+        slow_rate = sum(1 for _, s in self._outcomes if s) / calls
+        if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_rate_threshold:
+            self._transition(OPEN, "closed_to_open")
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN, "open_to_half_open")
+
+    def _transition(self, state, counter):
+        self._state = state
+        self.transitions[counter] += 1
+        self._outcomes.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            log.warning("circuit open; using fallbacks", circuit=self.name, open_seconds=self.open_seconds)
+        elif state == CLOSED:
+            log.info("circuit closed; traffic restored", circuit=self.name)
@@ -0,0 +1,86 @@
+# compression.py - gzip/brotli Content-Encoding for large API responses
+#
+# Grid surfaces, health-monitor plans and score histories run to tens or
+# hundreds of KB of repetitive JSON, which gzip shrinks 5-10x. A response is
+# compressed when the client accepts an encoding we have (br if the brotli
+# package is installed, else gzip), its mimetype is JSON or text, and its
+# body is at least COMPRESS_MIN_BYTES; below that the saving does not pay for
+# the CPU and the header bytes. Streamed responses (bulk NDJSON, SSE) are left
+# alone so each chunk still reaches the client as it is produced.
+#
+#     response = compress_response(response, request.accept_encodings)
+#
+# python benchmarks.py json-compress prints encode and compress times by
+# payload size, to pick COMPRESS_MIN_BYTES and the levels for a deployment.
+
+import gzip
+import os
+
+from metrics import registry as metrics, span
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))  # 4-5 is gzip -6 speed at a better ratio
+COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', '1') != '0'
+
+COMPRESSIBLE_TYPES = frozenset((
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/plain', 'text/html', 'text/csv', 'text/css',
+))
+
+# Preferred first when the client rates them equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding):
+    """`data` (bytes) compressed with `encoding` ('gzip' or 'br')."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, COMPRESS_GZIP_LEVEL, mtime=0)  # mtime=0 keeps the output (and ETags) stable
+
+
+def negotiate(accept_encodings):
+    """The encoding to use for a request's Accept-Encoding (werkzeug Accept), or None."""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(response, accept_encodings, min_bytes=None):
+    """Compresses a finished Flask response in place when worthwhile; returns it."""
+    if not COMPRESS_ENABLED or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.is_streamed or response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    encoding = negotiate(accept_encodings)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < (COMPRESS_MIN_BYTES if min_bytes is None else min_bytes):
+        return response
+    with span('compress'):
+        body = compress(data, encoding)
+    if len(body) >= len(data):
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    metrics.inc('compressed_responses_total', (('encoding', encoding),),
+                help="Responses sent with a Content-Encoding.")
+    metrics.inc('compression_input_bytes_total', help="Response bytes before compression.", amount=len(data))
+    metrics.inc('compression_output_bytes_total', help="Response bytes after compression.", amount=len(body))
+    return response
@@ -0,0 +1,50 @@
+# data_versions.py - Per-user change counters for HTTP caching
+#
+# A store that wants its reads cached bumps (scope, user) inside the same
+# transaction as the write, and http_cache.py builds ETags from the counter.
+# Because the counters live in the store's database, a write served by one
+# gunicorn worker invalidates the cached responses of every worker.
+#
+#     with self.batch() as conn:
+#         conn.execute(...)
+#         bump(conn, 'budget', user_id)
+#
+# ALL_USERS is bumped by bulk rewrites (streaks.py replay); read() returns it
+# together with the user's own counter.
+
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (scope, user_id)
+) WITHOUT ROWID;
+"""
+
+ALL_USERS = ""
+
+_BUMP_SQL = (
+    "INSERT INTO data_versions (scope, user_id, version, updated_at) VALUES (?, ?, 1, ?) "
+    "ON CONFLICT (scope, user_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at"
+)
+
+
+def bump(conn, scope, user_id=ALL_USERS):
+    """Marks the user's `scope` data (everyone's for ALL_USERS) as changed."""
+    conn.execute(_BUMP_SQL, (scope, str(user_id), time.time()))
+
+
+def read(conn, scope, user_id):
+    """
+    ((everyone's version, the user's version), last change as epoch seconds
+    or None if neither was ever bumped).
+    """
+    versions, updated_at = {}, None
+    for row in conn.execute("SELECT user_id, version, updated_at FROM data_versions "
+                            "WHERE scope = ? AND user_id IN (?, ?)", (scope, ALL_USERS, str(user_id))):
+        versions[row[0]] = row[1]
+        updated_at = max(updated_at or 0.0, row[2])
+    return (versions.get(ALL_USERS, 0), versions.get(str(user_id), 0)), updated_at
@@ -0,0 +1,72 @@
+# fake_model.py - Local stand-in for the Gemini GenerativeModel
+#
+# Sleeps for a configurable latency and answers with canned JSON, so the AI
+# paths can be benchmarked and exercised without an API key or network.
+
+import asyncio
+import json
+import threading
+import time
+
+# One object that satisfies every helper in ai_agents.py
+DEFAULT_FAKE_RESPONSE = {
+    "insights": [
+        "Your payment history is the biggest driver of your score.",
+        "Keeping overdrafts at zero is helping your stability.",
+        "A lower rent-to-income ratio would lift your score."
+    ],
+    "recommendations": [
+        {"title": "Boost Your Savings", "priority": "High", "impact": "High", "difficulty": "Medium"},
+        {"title": "Keep Paying Utilities On Time", "priority": "Medium", "impact": "Medium", "difficulty": "Low"},
+        {"title": "Document Employment Stability", "priority": "Low", "impact": "Low", "difficulty": "Low"}
+    ],
+    "suggested_amount_inr": 10000,
+    "suggested_term_months": 6,
+    "reasoning": "Fake model answer.",
+    "insight_en": "Fake model answer.",
+    "insight_hi": "नकली मॉडल उत्तर।"
+}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Mimics GenerativeModel.generate_content / generate_content_async.
+    `responder(prompt)` returns the response text; by default every call gets
+    DEFAULT_FAKE_RESPONSE. Set `fail=True` to make every call raise.
+    `max_concurrency` simulates a provider-side limit on parallel calls
+    (blocking path only).
+    """
+
+    def __init__(self, latency=0.5, responder=None, model_name='fake-gemini', fail=False,
+                 max_concurrency=None):
+        self.latency = latency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.responder = responder or (lambda prompt: json.dumps(DEFAULT_FAKE_RESPONSE, ensure_ascii=False))
+        self.model_name = model_name
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        with self._lock:
+            self.calls += 1
+        if self.fail:
+            raise RuntimeError("FakeModel configured to fail")
+        return FakeResponse(self.responder(prompt))
+
+    def generate_content(self, prompt):
+        if self._slots is None:
+            time.sleep(self.latency)
+            return self._answer(prompt)
+        with self._slots:
+            time.sleep(self.latency)
+            return self._answer(prompt)
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
@@ -0,0 +1,305 @@
+# goal_seek.py - Cheapest profile changes that reach a target credit score
+#
+# The score only moves when an input crosses into another score_table cell,
+# so the search space is per-field *band moves*, not raw values: "raise the
+# savings rate just past 10%", "bring rent under 30% of income", "improve rent
+# history by one level". Each field contributes a handful of candidate moves;
+# moves on different fields add up independently in the table's cell index,
+# so a candidate plan is scored with one list lookup. Moves are combined per
+# score component, keeping only the cheapest way to reach each component
+# value, which leaves a few hundred plans to compare at most.
+#
+# Amounts must be finite and within MAX_AMOUNT, so every band boundary is
+# computed in closed form and checked a bounded number of times.
+
+import itertools
+import math
+
+import scoring_engine
+from score_table import get_score_table
+
+# Cost of one CHANGE_STEPS unit of each field. Callers can override per
+# field; None forbids changing that field.
+DEFAULT_CHANGE_COSTS = {
+    "savingsRate": 1.0,            # per percentage point
+    "avgBalance": 1.0,             # per ₹1,000 of average balance
+    "overdrafts": 4.0,             # per overdraft avoided
+    "rentAmount": 3.0,             # per ₹1,000 less rent
+    "monthlyIncome": 6.0,          # per ₹1,000 more income
+    "rentHistory": 10.0,           # per history level
+    "utilityHistory": 6.0,         # per history level
+    "employmentStability": 15.0,   # per stability level
+}
+CHANGE_STEPS = {
+    "savingsRate": 0.01,
+    "avgBalance": 1000,
+    "overdrafts": 1,
+    "rentAmount": 1000,
+    "monthlyIncome": 1000,
+    "rentHistory": 1,
+    "utilityHistory": 1,
+    "employmentStability": 1,
+}
+
+# Largest accepted magnitude of a numeric field (₹ amounts, savings rate, overdrafts)
+MAX_AMOUNT = 1e12
+NUMERIC_FIELDS = ("monthlyIncome", "rentAmount", "avgBalance", "savingsRate", "overdrafts")
+# Rounding can leave a closed-form boundary one step short; never try more than this
+MAX_BOUNDARY_STEPS = 3
+
+
+class GoalSeekError(ValueError):
+    """Raised when the profile or the costs cannot be used for a search."""
+
+
+def find_cheapest_changes(profile, target_score, costs=None):
+    """
+    Returns the cheapest set of changes to `profile` whose score reaches
+    `target_score`. If the target is out of reach, returns the cheapest plan
+    for the best reachable score instead (reachable=False).
+
+    Result: {current_score, target_score, predicted_score, reachable,
+    total_cost, changes: [{field, from, to, cost}], explored (plans compared)}. Changes are
+    sorted by cost, cheapest first.
+    """
+    costs = _merge_costs(costs)
+    _check_amounts(profile)
+    table = get_score_table()
+    try:
+        base_cell = table.classify(profile)
+    except Exception as e:
+        raise GoalSeekError(f"profile cannot be scored: {e}")
+    entries = table.entries
+    current_score = entries[base_cell][0]
+
+    # One list of (cost, cell delta, changes) per group of fields, cheapest first;
+    # index 0 is always "no change"
+    axes = [axis for axis in _candidate_moves(profile, table, base_cell, costs) if len(axis) > 1]
+
+    # The score depends on the inputs only through the component scores, and
+    # each axis moves one component. Combine the axes of each component and
+    # keep the cheapest combination per component outcome, then try every
+    # combination of the (few) outcomes of the different components.
+    groups = {}
+    for axis in axes:
+        groups.setdefault(_moved_components(axis, entries, base_cell), []).append(axis)
+    group_options = [_combine(group_axes, entries, base_cell) for group_axes in groups.values()]
+
+    plans = []
+    for combination in itertools.product(*group_options):
+        cost = round(sum(option[0] for option in combination), 9)
+        cell = base_cell + sum(option[1] for option in combination)
+        plans.append((cost, entries[cell][0], combination))
+    explored = len(plans)
+    best_reachable = max((score for _, score, _ in plans), default=current_score)
+    goal = min(target_score, max(best_reachable, current_score))
+    # Cheapest plan that reaches the goal; equal cost prefers the higher score
+    _, _, combination = min(
+        (plan for plan in plans if plan[1] >= goal),
+        key=lambda plan: (plan[0], -plan[1]),
+    )
+
+    changes = sorted((change for option in combination for change in option[2]),
+                     key=lambda change: change["cost"])
+    predicted_cell = base_cell + sum(option[1] for option in combination)
+    return {
+        "current_score": current_score,
+        "target_score": target_score,
+        "predicted_score": entries[predicted_cell][0],
+        "reachable": best_reachable >= target_score,
+        "total_cost": round(sum(change["cost"] for change in changes), 4),
+        "changes": changes,
+        "explored": explored,
+    }
+
+
+def apply_changes(profile, changes):
+    """Returns a copy of `profile` with the solver's changes applied."""
+    updated = dict(profile)
+    for change in changes:
+        updated[change["field"]] = change["to"]
+    return updated
+
+
+def describe_change(change):
+    """Human-readable roadmap action for one change."""
+    field, old, new = change["field"], change["from"], change["to"]
+    if field == "savingsRate":
+        return f"Raise your savings rate from {old:.0%} to {new:.0%}"
+    if field == "avgBalance":
+        return f"Grow your average balance from ₹{old:,.0f} to ₹{new:,.0f}"
+    if field == "overdrafts":
+        return f"Cut overdrafts from {old} to {new}"
+    if field == "rentAmount":
+        return f"Bring rent down from ₹{old:,.0f} to ₹{new:,.0f}"
+    if field == "monthlyIncome":
+        return f"Increase monthly income from ₹{old:,.0f} to ₹{new:,.0f}"
+    if field == "rentHistory":
+        return f"Improve rent payment history from {old or 'unknown'} to {new}"
+    if field == "utilityHistory":
+        return f"Improve utility payment history from {old or 'unknown'} to {new}"
+    if field == "employmentStability":
+        return f"Document {new} employment stability (currently {old or 'unknown'})"
+    return f"Change {field} from {old} to {new}"
+
+
+# --- Internals ---
+
+def _check_amounts(profile):
+    for field in NUMERIC_FIELDS:
+        value = profile.get(field, 0)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise GoalSeekError(f"{field} must be a number")
+        if not abs(value) <= MAX_AMOUNT:
+            raise GoalSeekError(f"{field} must be a finite number within ±{MAX_AMOUNT:g}")
+
+
+def _merge_costs(costs):
+    merged = dict(DEFAULT_CHANGE_COSTS)
+    for field, cost in (costs or {}).items():
+        if field not in merged:
+            raise GoalSeekError(f"unknown cost field {field!r}")
+        if cost is not None:
+            try:
+                cost = float(cost)
+            except (TypeError, ValueError):
+                raise GoalSeekError(f"cost for {field} must be a number or null")
+            if not cost >= 0 or math.isinf(cost):
+                raise GoalSeekError(f"cost for {field} must be a finite number >= 0")
+        merged[field] = cost
+    return merged
+
+
+def _moved_components(axis, entries, base_cell):
+    """Indexes of the entry components (payment, stability, ...) an axis can change."""
+    base = entries[base_cell]
+    return tuple(sorted({i for _, delta, _ in axis
+                         for i, (new, old) in enumerate(zip(entries[base_cell + delta], base))
+                         if i >= 2 and new != old}))
+
+
+def _combine(axes, entries, base_cell):
+    """All option combinations of `axes`, keeping the cheapest per component outcome."""
+    cheapest = {}
+    for combination in itertools.product(*axes):
+        cost = sum(option[0] for option in combination)
+        delta = sum(option[1] for option in combination)
+        components = entries[base_cell + delta][2:]
+        if components not in cheapest or cost < cheapest[components][0]:
+            changes = [change for option in combination for change in option[2]]
+            cheapest[components] = (cost, delta, changes)
+    return list(cheapest.values())
+
+
+def _candidate_moves(profile, table, base_cell, costs):
+    """Yields one option list per independent group of fields."""
+    get = profile.get
+    income = float(get('monthlyIncome', 0))
+    rent = float(get('rentAmount', 0))
+    parsed = {
+        "monthlyIncome": income, "rentAmount": rent,
+        "avgBalance": float(get('avgBalance', 0)), "savingsRate": float(get('savingsRate', 0)),
+        "overdrafts": int(get('overdrafts', 0)),
+    }
+
+    def option(changes):
+        updated = apply_changes(profile, changes)
+        return sum(change["cost"] for change in changes), table.classify(updated) - base_cell, changes
+
+    def change(field, new_value, units):
+        return {"field": field, "from": parsed.get(field, get(field)), "to": new_value,
+                "cost": round(costs[field] * units, 4)}
+
+    # Categorical fields: every better level, priced by levels climbed
+    for field, level_map in (("rentHistory", scoring_engine.HISTORY_MAP),
+                             ("utilityHistory", scoring_engine.HISTORY_MAP),
+                             ("employmentStability", scoring_engine.STABILITY_MAP)):
+        options = [(0.0, 0, [])]
+        if costs[field] is not None:
+            levels = sorted(level_map, key=level_map.get)
+            current = get(field)
+            current_rank = levels.index(current) if current in level_map else -1
+            for rank in range(current_rank + 1, len(levels)):
+                options.append(option([change(field, levels[rank], rank - current_rank)]))
+        yield _prune(options, table, base_cell)
+
+    # Threshold fields: just past the threshold, on a CHANGE_STEPS boundary
+    for field, threshold in (("avgBalance", table.avg_balance_threshold),
+                             ("savingsRate", table.savings_rate_threshold)):
+        options = [(0.0, 0, [])]
+        current = parsed[field]
+        if costs[field] is not None and not current > threshold:
+            step = CHANGE_STEPS[field]
+            target = _next_multiple_above(threshold, step)
+            if target is not None:
+                options.append(option([change(field, target, (target - current) / step)]))
+        yield _prune(options, table, base_cell)
+
+    options = [(0.0, 0, [])]
+    overdrafts = parsed["overdrafts"]
+    if costs["overdrafts"] is not None and overdrafts != 0:
+        options.append(option([change("overdrafts", 0, abs(overdrafts))]))
+    yield _prune(options, table, base_cell)
+
+    # Rent-to-income bands: lower the rent or raise the income into each better band
+    options = [(0.0, 0, [])]
+    for upper_bound in table.band_bounds:
+        if not (upper_bound > 0 and math.isfinite(upper_bound)):
+            continue
+        if costs["rentAmount"] is not None and income > 0:
+            step = CHANGE_STEPS["rentAmount"]
+            new_rent = _last_multiple_below(upper_bound * income, step, lambda value: value / income < upper_bound)
+            if new_rent is not None and 0 <= new_rent < rent:
+                options.append(option([change("rentAmount", new_rent, (rent - new_rent) / step)]))
+        if costs["monthlyIncome"] is not None:
+            step = CHANGE_STEPS["monthlyIncome"]
+            new_income = _next_multiple_above(max(rent / upper_bound, 0), step,
+                                              lambda value: rent / value < upper_bound)
+            if new_income is not None and new_income > income:
+                options.append(option([change("monthlyIncome", new_income, (new_income - income) / step)]))
+    yield _prune(options, table, base_cell)
+
+
+def _prune(options, table, base_cell):
+    """
+    Keeps, for each distinct component outcome, only the cheapest option, and
+    drops options that do not raise any component. Returns them by cost.
+    """
+    entries = table.entries
+    base_components = entries[base_cell][2:]
+    cheapest = {}
+    for option in options:
+        components = entries[base_cell + option[1]][2:]
+        if option[2] and (components == base_components
+                          or any(new < old for new, old in zip(components, base_components))):
+            continue
+        if components not in cheapest or option[0] < cheapest[components][0]:
+            cheapest[components] = option
+    return sorted(cheapest.values(), key=lambda option: option[0])
+
+
+def _next_multiple_above(value, step, ok=None):
+    """
+    Smallest multiple of `step` strictly greater than `value` (and for which
+    ok(multiple) holds, if given), or None if rounding keeps it from being found.
+    """
+    multiple = math.floor(value / step) + 1
+    for _ in range(MAX_BOUNDARY_STEPS):
+        result = round(multiple * step, 10)
+        if result > value and (ok is None or ok(result)):
+            return result
+        multiple += 1
+    return None
+
+
+def _last_multiple_below(value, step, ok=None):
+    """Largest multiple of `step` strictly less than `value` (see _next_multiple_above)."""
+    multiple = math.ceil(value / step) - 1
+    for _ in range(MAX_BOUNDARY_STEPS):
+        result = round(multiple * step, 10)
+        if result < value and (ok is None or ok(result)):
+            return result
+        multiple -= 1
+    return None
@@ -0,0 +1,181 @@
+# http_cache.py - ETag/Last-Modified revalidation for polled GET endpoints
+#
+# finance-manager.html polls the streak, budget, reminder and game endpoints
+# on every page load, and they almost never change between polls. A cached
+# view declares how to read the version of the data behind it (a change
+# counter; see data_versions.py) instead of building the body:
+#
+#     @app.route('/api/finance/streak', methods=['GET'])
+#     @response_cache.cached(lambda: payment_streaks.version(get_request_user_id()))
+#     def get_payment_streak(): ...
+#
+# The ETag is a hash of the route, the query string (which carries the
+# user) and that version. A request whose If-None-Match (or
+# If-Modified-Since) still matches gets a 304 without the view running; an
+# unconditional one gets the body stored for the current ETag, or runs the
+# view and stores it. A write bumps the version, which changes the ETag, so
+# nothing has to be evicted explicitly.
+#
+# ETags are weak: the body may be sent gzip-compressed or not.
+# Last-Modified has one-second precision, so it is only sent (and
+# If-Modified-Since only honoured) once the second of the last change is
+# over; until then a second write in the same second would go unnoticed, and
+# clients revalidate with the ETag alone.
+# Cache-Control is "private, no-cache", so browsers keep the body but
+# revalidate on every poll, and shared proxies do not store it.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from functools import wraps
+
+from flask import current_app, request
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', '1') != '0'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+
+CACHE_CONTROL = "private, no-cache"
+
+# For views whose output only changes with the code. Every worker (and host)
+# running the same release must give the same ETag, so the version names the
+# deploy: APP_VERSION, or the commit Vercel built, or else a hash of the
+# backend's source files.
+APP_VERSION = os.getenv('APP_VERSION') or os.getenv('VERCEL_GIT_COMMIT_SHA')
+
+_code_version = None
+
+
+def code_version():
+    """(release id, epoch seconds of the newest source file or None), computed once."""
+    global _code_version
+    if _code_version is None:
+        if APP_VERSION:
+            _code_version = (APP_VERSION, None)
+        else:
+            backend_dir = os.path.dirname(os.path.abspath(__file__))
+            digest = hashlib.blake2b(digest_size=12)
+            newest = 0.0
+            for name in sorted(os.listdir(backend_dir)):
+                if name.endswith('.py'):
+                    path = os.path.join(backend_dir, name)
+                    with open(path, 'rb') as f:
+                        digest.update(name.encode() + b'\0' + f.read())
+                    newest = max(newest, os.path.getmtime(path))
+            _code_version = (digest.hexdigest(), int(newest) or None)
+    return _code_version
+
+
+def static_version():
+    """version() for views whose body depends on nothing but the query string and the code."""
+    return code_version()
+
+
+class ResponseCache:
+    """Bodies of cached GET views by (route, query string), least recently used evicted first."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, enabled=RESPONSE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        # (endpoint, query) -> (version, last change, validator headers, body or None, mimetype)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version_errors = 0
+
+    def cached(self, version):
+        """
+        Decorates a view. version() runs in the request and returns (any
+        hashable version, epoch seconds of the last change or None); it is
+        the only work a matching conditional request costs.
+        """
+        def decorate(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method not in ('GET', 'HEAD'):
+                    return view(*args, **kwargs)
+                try:
+                    tag, modified = version()
+                except Exception:  # The view reports the store failure itself
+                    with self._lock:
+                        self.version_errors += 1
+                    return view(*args, **kwargs)
+                key = (request.endpoint, request.query_string)
+                entry = self._entries.get(key)
+                if entry is None or entry[0] != tag or entry[1] != modified:
+                    entry = (tag, modified, _validators(key, tag, modified), None, None)
+                elif modified is not None and len(entry[2]) == 2 and _settled(modified):
+                    entry = (tag, modified, _validators(key, tag, modified), entry[3], entry[4])
+                headers = entry[2]
+                if _not_modified(headers, modified):
+                    with self._lock:
+                        self.not_modified += 1
+                    return current_app.response_class(status=304, headers=headers)
+                if entry[3] is not None:
+                    with self._lock:
+                        if key in self._entries:
+                            self._entries.move_to_end(key)
+                        self.hits += 1
+                    return current_app.response_class(entry[3], headers=headers, mimetype=entry[4])
+
+                with self._lock:
+                    self.misses += 1
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                response.headers.extend(headers)
+                with self._lock:
+                    self._entries[key] = (tag, modified, headers, response.get_data(), response.mimetype)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+                return response
+            return wrapper
+        return decorate
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "not_modified": self.not_modified, "misses": self.misses,
+                    "evictions": self.evictions, "version_errors": self.version_errors}
+
+
+def _validators(key, tag, modified):
+    """ETag, Last-Modified and Cache-Control headers for one version of a view's response."""
+    etag = hashlib.blake2b(repr((key, tag)).encode(), digest_size=12).hexdigest()
+    headers = [('ETag', f'W/"{etag}"'), ('Cache-Control', CACHE_CONTROL)]
+    if modified is not None and _settled(modified):
+        headers.append(('Last-Modified', formatdate(modified, usegmt=True)))
+    return headers
+
+
+def _settled(modified):
+    """True once the second `modified` falls in is over, so Last-Modified covers every change."""
+    return int(modified) < int(time.time())
+
+
+def _not_modified(headers, modified):
+    environ = request.environ
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # If-None-Match wins over If-Modified-Since (RFC 9110, 13.1.3). Clients
+        # echo the ETag back as is, so compare the raw header before parsing it.
+        etag = headers[0][1]
+        return if_none_match == etag or request.if_none_match.contains_weak(etag[3:-1])
+    if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+    if not if_modified_since or modified is None or not _settled(modified):
+        return False
+    if len(headers) > 2 and if_modified_since == headers[2][1]:
+        return True
+    since = request.if_modified_since
+    return since is not None and int(modified) <= since.timestamp()
@@ -0,0 +1,81 @@
+# json_backend.py - Pluggable JSON encoder/decoder for API responses
+#
+# Uses orjson when it is installed (several times faster than the stdlib for
+# the score, health-monitor and grid payloads, and it writes numpy arrays
+# directly) and the stdlib json module otherwise. JSON_BACKEND=stdlib forces
+# the fallback; JSON_BACKEND=orjson fails at import if orjson is missing.
+#
+# Both backends produce equivalent JSON. The stdlib one keeps Flask's
+# defaults (sorted keys, ASCII escapes); orjson writes keys in insertion
+# order and UTF-8 as is. Values orjson cannot encode (ints above 64 bits,
+# unknown types without a `default` conversion) are retried with the stdlib.
+
+import json
+import os
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto').lower()
+
+try:
+    if JSON_BACKEND == 'stdlib':
+        raise ImportError
+    import orjson
+except ImportError:
+    if JSON_BACKEND == 'orjson':
+        raise
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'stdlib'
+
+
+def to_builtin(obj):
+    """Converts numpy arrays and scalars (anything with tolist()) for encoders that do not know them."""
+    tolist = getattr(obj, 'tolist', None)
+    if tolist is not None:
+        return tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _chain(default):
+    """`default` with numpy conversion tried first."""
+    if default is None:
+        return to_builtin
+
+    def convert(obj):
+        tolist = getattr(obj, 'tolist', None)
+        return tolist() if tolist is not None else default(obj)
+    return convert
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps_bytes(obj, default=None, indent=False):
+        """UTF-8 encoded JSON. `default` converts unsupported objects (as for json.dumps)."""
+        options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _ORJSON_OPTIONS
+        try:
+            return orjson.dumps(obj, default=_chain(default), option=options)
+        except TypeError:
+            return _stdlib_dumps(obj, default, indent, sort_keys=False).encode('utf-8')
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj, default=None, indent=False):
+        """UTF-8 encoded JSON. `default` converts unsupported objects (as for json.dumps)."""
+        return _stdlib_dumps(obj, default, indent).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
+
+
+def dumps(obj, default=None, indent=False):
+    """JSON text; see dumps_bytes()."""
+    if orjson is None:
+        return _stdlib_dumps(obj, default, indent)
+    return dumps_bytes(obj, default, indent).decode('utf-8')
+
+
+def _stdlib_dumps(obj, default, indent, sort_keys=True):
+    if indent:
+        return json.dumps(obj, default=_chain(default), ensure_ascii=True, sort_keys=sort_keys, indent=2)
+    return json.dumps(obj, default=_chain(default), ensure_ascii=True, sort_keys=sort_keys, separators=(',', ':'))
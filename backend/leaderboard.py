@@ -0,0 +1,250 @@
+# leaderboard.py - Credit Clash leaderboards with an order-statistic index
+#
+# Each board keeps every player's best score in a SortedList (sortedcontainers)
+# of integer keys, (SCORE_LIMIT - score) << SEQ_BITS | seq, so the best score
+# sorts first and ties go to whoever reached it first (the lower seq).
+# Submitting a score and looking up a rank are O(log n), and top-K and
+# "around me" windows are slices of the list. Plain ints keep the index
+# small and its comparisons in C. There is one board per day, per ISO week
+# and one for all time; the oldest daily and weekly boards are dropped as
+# new ones open.
+#
+# Boards live in memory. A background thread writes them to a snapshot file
+# every LEADERBOARD_SNAPSHOT_SECONDS while they change (atomically, via a
+# temporary file), and the snapshot is loaded back at startup, so a restart
+# loses at most one interval of submissions.
+#
+# NOTE: Every process keeps its own boards. Serve the game routes from a
+# single worker process so all players share one leaderboard.
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import date
+
+from sortedcontainers import SortedList
+
+from structured_log import get_logger
+
+log = get_logger('leaderboard')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEADERBOARD_SNAPSHOT_PATH = os.getenv(
+    'LEADERBOARD_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'data', 'leaderboard.json'))
+LEADERBOARD_SNAPSHOT_SECONDS = float(os.getenv('LEADERBOARD_SNAPSHOT_SECONDS', 60))
+LEADERBOARD_KEEP_DAYS = int(os.getenv('LEADERBOARD_KEEP_DAYS', 7))
+LEADERBOARD_KEEP_WEEKS = int(os.getenv('LEADERBOARD_KEEP_WEEKS', 4))
+
+PERIODS = ("daily", "weekly", "alltime")
+SNAPSHOT_VERSION = 2
+
+SEQ_BITS = 40
+SCORE_LIMIT = 1 << 32  # Scores are 0 <= score < SCORE_LIMIT
+
+
+class Board:
+    """One period's ranking: each user's best score, ordered best first."""
+    __slots__ = ("keys", "best", "users")
+
+    def __init__(self, keys=(), user_ids=()):
+        # keys[i] belongs to user_ids[i]
+        self.keys = SortedList(keys)
+        self.best = dict(zip(user_ids, keys))
+        self.users = dict(zip(keys, user_ids))
+
+    def submit(self, user_id, score, seq):
+        """Records `score` if it beats the user's best. Returns True if it did."""
+        key = (SCORE_LIMIT - score) << SEQ_BITS | seq
+        current = self.best.get(user_id)
+        if current is not None:
+            if current >> SEQ_BITS <= SCORE_LIMIT - score:
+                return False
+            self.keys.remove(current)
+            del self.users[current]
+        self.best[user_id] = key
+        self.users[key] = user_id
+        self.keys.add(key)
+        return True
+
+    def score(self, user_id):
+        key = self.best.get(user_id)
+        return None if key is None else SCORE_LIMIT - (key >> SEQ_BITS)
+
+    def rank(self, user_id):
+        """1-based rank, or None if the user has no score on this board."""
+        key = self.best.get(user_id)
+        return None if key is None else self.keys.bisect_left(key) + 1
+
+    def window(self, start, stop):
+        """Ranked entries start..stop-1 (0-based positions)."""
+        start = max(start, 0)
+        users = self.users
+        return [
+            {"rank": start + i + 1, "user_id": users[key], "score": SCORE_LIMIT - (key >> SEQ_BITS)}
+            for i, key in enumerate(self.keys.islice(start, stop))
+        ]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Leaderboard:
+    """Daily, weekly and all-time boards with periodic snapshots to disk."""
+
+    def __init__(self, snapshot_path=LEADERBOARD_SNAPSHOT_PATH, snapshot_seconds=LEADERBOARD_SNAPSHOT_SECONDS,
+                 keep_days=LEADERBOARD_KEEP_DAYS, keep_weeks=LEADERBOARD_KEEP_WEEKS):
+        self.snapshot_path = snapshot_path
+        self.snapshot_seconds = snapshot_seconds
+        self.keep = {"daily": keep_days, "weekly": keep_weeks, "alltime": 1}
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._seq = 0
+        self._dirty = False
+        self._wake = threading.Event()
+        self._worker_pid = None
+        self.snapshots = 0
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    # --- Scores ---
+
+    def submit(self, user_id, score, today=None):
+        """
+        Records a game score on every period's board. Returns
+        {period: {"rank", "best", "improved"}} for the user.
+        """
+        if not 0 <= score < SCORE_LIMIT:
+            raise ValueError(f"score must be between 0 and {SCORE_LIMIT - 1}")
+        user_id = str(user_id)
+        keys = board_keys(today or date.today())
+        result = {}
+        with self._lock:
+            self._seq += 1
+            self._dirty = True
+            for period, key in keys.items():
+                board = self._board(period, key)
+                improved = board.submit(user_id, score, self._seq)
+                result[period] = {"rank": board.rank(user_id), "best": board.score(user_id),
+                                  "improved": improved}
+        return result
+
+    def rank(self, user_id, period='alltime', today=None):
+        """{"rank", "score", "total"}; rank and score are None for users without a score."""
+        user_id = str(user_id)
+        with self._lock:
+            board = self._existing_board(period, today)
+            if board is None or user_id not in board.best:
+                return {"rank": None, "score": None, "total": len(board) if board else 0}
+            return {"rank": board.rank(user_id), "score": board.score(user_id), "total": len(board)}
+
+    def top(self, k=10, period='alltime', today=None):
+        with self._lock:
+            board = self._existing_board(period, today)
+            return board.window(0, k) if board else []
+
+    def around(self, user_id, window=5, period='alltime', today=None):
+        """The user's entry with up to `window` entries above and below it ([] without a score)."""
+        with self._lock:
+            board = self._existing_board(period, today)
+            rank = board.rank(str(user_id)) if board else None
+            if rank is None:
+                return []
+            return board.window(rank - 1 - window, rank + window)
+
+    def _board(self, period, key):
+        board = self._boards.get(key)
+        if board is None:
+            board = self._boards[key] = Board()
+            # Keys sort by date within a period, so the oldest boards come first
+            old = sorted(k for k in self._boards if k.startswith(period + ":"))
+            for stale in old[:-self.keep[period]]:
+                del self._boards[stale]
+        return board
+
+    def _existing_board(self, period, today):
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        return self._boards.get(board_keys(today or date.today())[period])
+
+    # --- Snapshots ---
+
+    def snapshot(self, path=None):
+        """Writes every board to `path` (default snapshot_path). Returns the entries written."""
+        path = path or self.snapshot_path
+        with self._lock:
+            # Copies only; encoding happens after the lock is released
+            boards = {key: (list(board.keys), board.users.copy()) for key, board in self._boards.items()}
+            seq = self._seq
+            self._dirty = False
+        data = json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "seq": seq,
+            "boards": {name: {"keys": keys, "users": [users[key] for key in keys]}
+                       for name, (keys, users) in boards.items()},
+        }, separators=(',', ':'))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.snapshots += 1
+        return sum(len(keys) for keys, _ in boards.values())
+
+    def load(self, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_VERSION:
+            log.warning("ignoring leaderboard snapshot", path=path, version=data.get('version'))
+            return
+        boards = {name: Board(board["keys"], board["users"]) for name, board in data["boards"].items()}
+        with self._lock:
+            self._boards = boards
+            self._seq = data["seq"]
+        log.info("leaderboard snapshot loaded", path=path, entries=sum(map(len, boards.values())))
+
+    def start(self):
+        """Starts the snapshot thread (once per process; safe to call on every request)."""
+        if self._worker_pid == os.getpid() or not self.snapshot_path:
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._wake.clear()
+            threading.Thread(target=self._run, name='leaderboard-snapshots', daemon=True).start()
+            atexit.register(self._final_snapshot)
+
+    def stop(self):
+        self._wake.set()
+        self._worker_pid = None
+
+    def _run(self):
+        while not self._wake.wait(self.snapshot_seconds):
+            if self._dirty:
+                self._save("periodic")
+
+    def _final_snapshot(self):
+        if self._dirty:
+            self._save("final")
+
+    def _save(self, reason):
+        start = time.perf_counter()
+        try:
+            entries = self.snapshot()
+            log.info("leaderboard snapshot saved", reason=reason, entries=entries,
+                     ms=round((time.perf_counter() - start) * 1000))
+        except OSError as e:
+            log.error("leaderboard snapshot failed", reason=reason, error=str(e))
+
+    def stats(self):
+        with self._lock:
+            return {"boards": {key: len(board) for key, board in self._boards.items()},
+                    "submissions": self._seq, "snapshots": self.snapshots}
+
+
+def board_keys(today):
+    """{period: board key} for the boards `today` falls in."""
+    year, week, _ = today.isocalendar()
+    return {"daily": f"daily:{today.isoformat()}", "weekly": f"weekly:{year}-W{week:02d}", "alltime": "alltime"}
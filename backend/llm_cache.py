@@ -0,0 +1,208 @@
+# llm_cache.py - Content-addressed cache for Gemini responses
+#
+# Identical prompt inputs (same score, breakdown and profile) produce the same
+# cache key, so refreshes and what-if re-submits skip the LLM round trip.
+# Entries live in a bounded in-memory LRU with a TTL; an optional on-disk tier
+# keeps warm entries across restarts.
+#
+# The disk tier is bounded too. Each file's mtime is set to its expiry time,
+# so a sweep only has to stat the directory: it deletes expired files and,
+# past disk_max_entries, the ones that expire soonest (the oldest writes).
+# A sweep runs every sweep_seconds, or at once when writes since the last
+# one push the count over the limit.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from structured_log import get_logger
+
+log = get_logger('llm_cache')
+
+
+class LLMCache:
+    """Thread-safe LRU + TTL cache of raw LLM response text, keyed by input hash."""
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_dir=None, disk_max_entries=10000,
+                 sweep_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.sweep_seconds = sweep_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._disk_entries = 0  # As of the last sweep, plus files written since
+        self._next_sweep = 0.0  # The first write sweeps, which counts what an earlier process left
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_expired = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(kind, *inputs):
+        """Canonical SHA-256 of the prompt inputs (dict key order does not matter)."""
+        canonical = json.dumps([kind, inputs], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Returns the cached text for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+        return entry[1]
+
+    def set(self, key, text):
+        now = time.time()
+        entry = (now + self.ttl_seconds, text)
+        with self._lock:
+            self._store(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+            with self._lock:
+                due = now >= self._next_sweep or self._disk_entries > self.disk_max_entries
+            if due:
+                self.sweep_disk(now)
+
+    def sweep_disk(self, now=None):
+        """
+        Deletes expired disk entries, then the soonest-expiring ones past
+        disk_max_entries. Returns the number of files deleted. Skipped if
+        another thread is already sweeping.
+        """
+        if not self.disk_dir or not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time() if now is None else now
+            live, expired = [], 0
+            try:
+                with os.scandir(self.disk_dir) as it:
+                    for item in it:
+                        try:
+                            expires_at = item.stat().st_mtime
+                        except OSError:
+                            continue  # Deleted by another worker's sweep
+                        if item.name.endswith('.json'):
+                            if expires_at <= now:
+                                expired += _remove(item.path)
+                            else:
+                                live.append((expires_at, item.path))
+                        elif item.name.endswith('.tmp') and expires_at <= now - self.ttl_seconds:
+                            _remove(item.path)  # Left by a write that crashed
+            except OSError as e:
+                log.warning("could not sweep ai cache directory", error=str(e))
+                return 0
+            evicted = 0
+            if len(live) > self.disk_max_entries:
+                live.sort()
+                for _, path in live[:len(live) - self.disk_max_entries]:
+                    evicted += _remove(path)
+            with self._lock:
+                self._disk_entries = len(live) - evicted
+                self._next_sweep = now + self.sweep_seconds
+                self.disk_expired += expired
+                self.disk_evictions += evicted
+            return expired + evicted
+        finally:
+            self._sweep_lock.release()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_entries": self._disk_entries,
+                "disk_max_entries": self.disk_max_entries,
+                "disk_evictions": self.disk_evictions,
+                "disk_expired": self.disk_expired,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_enabled": bool(self.disk_dir),
+            }
+
+    # --- Internals ---
+
+    def _store(self, key, entry):
+        # Caller holds self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored.get('expires_at', 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return stored['expires_at'], stored['text']
+
+    def _write_disk(self, key, entry):
+        path = self._disk_path(key)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"expires_at": entry[0], "text": entry[1]}, f)
+            os.utime(tmp_path, (entry[0], entry[0]))  # The sweep reads expiry from the mtime
+            new = not os.path.exists(path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("could not persist ai cache entry", error=str(e))
+            return
+        if new:
+            with self._lock:
+                self._disk_entries += 1
+
+
+def _remove(path):
+    """1 if `path` was deleted, 0 if it was already gone or could not be."""
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        return 0
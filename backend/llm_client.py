@@ -0,0 +1,65 @@
+# llm_client.py - Lazily configured Gemini client
+#
+# Importing google.generativeai takes most of a cold start, and most routes
+# (/api/health, /api/finance/*, /api/game/*) never touch the LLM. The SDK is
+# imported and the model configured on the first get_model() call instead of
+# at module import time.
+
+import os
+import threading
+
+from structured_log import get_logger
+
+log = get_logger('llm_client')
+
+_lock = threading.Lock()
+_loaded = False
+_model = None
+
+
+def get_model():
+    """Returns the configured GenerativeModel, or None if AI is unavailable."""
+    global _loaded, _model
+    if _loaded:
+        return _model
+    with _lock:
+        if not _loaded:
+            _model = _configure_model()
+            _loaded = True
+    return _model
+
+
+def set_model(model):
+    """Overrides the client (e.g. with fake_model.FakeModel in benchmarks)."""
+    global _loaded, _model
+    with _lock:
+        _model = model
+        _loaded = True
+
+
+def is_ai_available():
+    """Cheap check that never imports the SDK: the loaded model, or whether a key is set."""
+    if _loaded:
+        return _model is not None
+    return bool(os.getenv("GOOGLE_API_KEY"))
+
+
+def _configure_model():
+    try:
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            log.warning("GOOGLE_API_KEY not found; ai features will use dummy data")
+            return None
+
+        import google.generativeai as genai  # Deferred: slow import, only needed here
+
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(
+            model_name=os.getenv('GEMINI_MODEL_NAME', 'gemini-1.5-flash'),
+            generation_config={"response_mime_type": "application/json"}
+        )
+        log.info("gemini client configured")
+        return model
+    except Exception as e:
+        log.error("gemini client initialization failed; ai features will use dummy data", error=str(e))
+        return None
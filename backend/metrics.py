@@ -0,0 +1,296 @@
+# metrics.py - In-process latency histograms and counters, Prometheus text
+#
+# A request is broken into spans (parse, scoring, llm, fallback, serialize):
+#
+#     with span('scoring'):
+#         score_data = calculate_credit_score_fast(data)
+#
+# Each span lands in a fixed-bucket histogram labelled with the route and the
+# stage, and in the current request's Server-Timing header. Recording a span
+# only appends (stage, seconds) to the current request; the request's spans
+# are bucketed once it finishes (a bisect and two increments in a per-thread
+# shard each, no lock). That keeps a span under a microsecond (python
+# benchmarks.py metrics checks), so spans stay on in production. render() writes every histogram and counter, plus
+# whatever the registered collectors report (cache, circuit breaker, ...), in
+# the Prometheus text format served at /api/metrics.
+#
+# NOTE: Every process keeps its own numbers. With several gunicorn workers,
+# each scrape sees one worker; scrape them individually or run one worker.
+
+import threading
+from threading import get_ident
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from structured_log import get_logger
+
+log = get_logger('metrics')
+
+PREFIX = 'arthniti'
+
+# Upper bounds in seconds; 100 µs to 30 s covers a span as well as a Gemini wait
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    Bucket counts plus the sum of observed values. Each thread writes its own
+    shard (keyed by thread id, so a new thread reuses a finished one's), which
+    keeps observe() lock-free; snapshot() adds the shards up.
+    """
+    __slots__ = ("bounds", "_shards")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self._shards = {}  # thread id -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, value):
+        shard = self._shards.get(get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(get_ident(), [0] * (len(self.bounds) + 1) + [0.0])
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self):
+        """(cumulative counts per bound and +Inf, sum)."""
+        totals = [0] * (len(self.bounds) + 1) + [0.0]
+        for shard in list(self._shards.values()):
+            for i, value in enumerate(shard):
+                totals[i] += value
+        cumulative, running = [], 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Registry:
+    """Histograms and counters keyed by (name, labels), plus scrape-time collectors."""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> Counter
+        self._help = {}
+        self._collectors = []
+
+    def histogram(self, name, labels=(), help=None, bounds=LATENCY_BUCKETS):
+        """The histogram for `name` and `labels` ((key, value) pairs), created on first use."""
+        key = (name, tuple(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(bounds)
+                    if help:
+                        self._help.setdefault(name, help)
+        return histogram
+
+    def counter(self, name, labels=(), help=None):
+        key = (name, tuple(labels))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is None:
+                    counter = self._counters[key] = Counter()
+                    if help:
+                        self._help.setdefault(name, help)
+        return counter
+
+    def inc(self, name, labels=(), amount=1, help=None):
+        self.counter(name, labels, help).inc(amount)
+
+    def add_collector(self, collect):
+        """collect() -> [(name, type, help, [(labels, value)])], called on every scrape."""
+        self._collectors.append(collect)
+
+    def register_stats(self, name, stats, counters=(), skip=()):
+        """
+        Exports the numbers in stats() (e.g. LLMCache.stats) as
+        {prefix}_{name}_{key}. Keys in `counters` are counters (suffixed
+        _total), other numbers and booleans gauges. A string value becomes a
+        {key="value"} 1 gauge; nested dicts are flattened with "_".
+        """
+        def collect():
+            families = []
+            for key, value in _flatten(stats()):
+                if key in skip or key.split('_', 1)[0] in skip:
+                    continue
+                metric = f"{name}_{key}"
+                if isinstance(value, str):
+                    families.append((metric, 'gauge', None, [(((key, value),), 1)]))
+                elif isinstance(value, (bool, int, float)):
+                    if key in counters:
+                        families.append((metric + '_total', 'counter', None, [((), value)]))
+                    else:
+                        families.append((metric, 'gauge', None, [((), value)]))
+            return families
+        self.add_collector(collect)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        last_name = None
+        for (name, labels), histogram in histograms:
+            if name != last_name:
+                lines += self._header(name, 'histogram')
+                last_name = name
+            cumulative, total = histogram.snapshot()
+            for bound, count in zip(histogram.bounds, cumulative):
+                lines.append(f"{prefix}_{name}_bucket{_labels(labels + (('le', repr(bound)),))} {count}")
+            lines.append(f"{prefix}_{name}_bucket{_labels(labels + (('le', '+Inf'),))} {cumulative[-1]}")
+            lines.append(f"{prefix}_{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{prefix}_{name}_count{_labels(labels)} {cumulative[-1]}")
+        for (name, labels), counter in counters:
+            if name != last_name:
+                lines += self._header(name, 'counter')
+                last_name = name
+            lines.append(f"{prefix}_{name}{_labels(labels)} {counter.value}")
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                log.error("metrics collector failed", error=str(e))
+                continue
+            for name, kind, help, samples in families:
+                lines += self._header(name, kind, help)
+                for labels, value in samples:
+                    lines.append(f"{prefix}_{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name, kind, help=None):
+        help = help or self._help.get(name)
+        header = [f"# HELP {self.prefix}_{name} {help}"] if help else []
+        return header + [f"# TYPE {self.prefix}_{name} {kind}"]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def _flatten(stats, prefix=""):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        else:
+            yield f"{prefix}{key}", value
+
+
+# ===== SPANS =====
+
+registry = Registry()
+
+SPAN_HELP = "Time spent in each stage of a request (parse, scoring, llm, fallback, serialize)."
+REQUEST_HELP = "Time from the start of a request until its response is ready."
+
+
+class RequestTimings:
+    """The route of the current request and the spans recorded during it."""
+    __slots__ = ("route", "start", "spans")
+
+    def __init__(self, route):
+        self.route = route
+        self.start = perf_counter()
+        self.spans = []
+
+
+_current = ContextVar('request_timings', default=None)
+_span_histograms = {}  # (route, stage) -> Histogram
+
+
+class span:
+    """Times a `with` block as one stage of the current request."""
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.stage, perf_counter() - self.start)
+
+
+def record_span(stage, seconds):
+    """
+    Adds one stage timing to the current request, whose spans reach their
+    histograms in finish_request(); outside a request it is observed at once.
+    """
+    timings = _current.get()
+    if timings is None:
+        _observe_span('background', stage, seconds)
+    else:
+        timings.spans.append((stage, seconds))
+
+
+def _observe_span(route, stage, seconds):
+    histogram = _span_histograms.get((route, stage))
+    if histogram is None:
+        histogram = _span_histograms[(route, stage)] = registry.histogram(
+            'span_seconds', (('route', route), ('stage', stage)), SPAN_HELP)
+    histogram.observe(seconds)
+
+
+def start_request(route):
+    """Begins timing a request; spans recorded on this thread are attributed to `route`."""
+    timings = RequestTimings(route)
+    _current.set(timings)
+    return timings
+
+
+def finish_request(status):
+    """
+    Records the request's total time and status. Returns (seconds, its
+    Server-Timing header value), or (None, None) if no request was started.
+    """
+    timings = _current.get()
+    if timings is None:
+        return None, None
+    _current.set(None)
+    elapsed = perf_counter() - timings.start
+    registry.histogram('request_seconds', (('route', timings.route),), REQUEST_HELP).observe(elapsed)
+    registry.inc('requests_total', (('route', timings.route), ('status', str(status))),
+                 help="Requests by route and HTTP status.")
+    if status >= 500:
+        registry.inc('errors_total', (('route', timings.route),), help="Requests that failed with a 5xx status.")
+    # One Server-Timing entry per stage; a stage that ran several times reports its total
+    totals = {}
+    for stage, seconds in timings.spans:
+        _observe_span(timings.route, stage, seconds)
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in totals.items()]
+    entries.append(f"total;dur={elapsed * 1000:.3f}")
+    return elapsed, ", ".join(entries)
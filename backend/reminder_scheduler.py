@@ -0,0 +1,486 @@
+# reminder_scheduler.py - Time-ordered bill reminders with a background worker
+#
+# Pending reminders live in a binary heap ordered by fire time. Each heap
+# entry is one 64-bit integer (fire time << SLOT_BITS | slot) in an
+# array('q'), and a reminder's fields are columns of typed arrays indexed by
+# its slot, so millions of pending reminders cost tens of bytes each rather
+# than an object apiece. Snooze and cancel update the slot and leave the old
+# heap entry behind; stale entries are skipped when popped and dropped in
+# bulk once they outnumber the live ones.
+#
+# A worker thread pops due reminders in batches, renders each one into its
+# owner's inbox (the list /api/finance/reminders returns as-is) and hands
+# the batch to the notifier.
+#
+# NOTE: Every process keeps its own scheduler. Run the app with a single
+# worker process (or one dedicated process) if notifications must not be
+# sent once per worker.
+
+import bisect
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import date, datetime, time as dtime
+
+from structured_log import get_logger
+
+log = get_logger('reminders')
+
+REMINDER_LEAD_DAYS = int(os.getenv('REMINDER_LEAD_DAYS', 3))
+REMINDER_HOUR = int(os.getenv('REMINDER_HOUR', 9))
+REMINDER_SNOOZE_MINUTES = int(os.getenv('REMINDER_SNOOZE_MINUTES', 24 * 60))
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 1000))
+REMINDER_POLL_SECONDS = float(os.getenv('REMINDER_POLL_SECONDS', 30))
+
+SLOT_BITS = 26
+SLOT_MASK = (1 << SLOT_BITS) - 1
+MAX_FIRE_AT = (1 << (63 - SLOT_BITS)) - 1  # Latest fire time a heap entry can hold (year ~6300)
+
+FREE, PENDING, DELIVERED = 0, 1, 2
+UPCOMING, OVERDUE = 0, 1
+KINDS = ("upcoming", "overdue")
+
+
+class LocalNotifier:
+    """Notifier stub: counts deliveries and keeps the latest few for inspection."""
+
+    def __init__(self, keep=100):
+        self.delivered = 0
+        self.recent = deque(maxlen=keep)
+
+    def notify(self, reminders):
+        self.delivered += len(reminders)
+        self.recent.extend(reminders)
+        log.debug("reminders delivered; no SMS/push notifier configured", count=len(reminders))
+
+
+class ReminderScheduler:
+    """
+    notifier.notify(reminders) receives each delivered batch (a list of the
+    dicts added to the inboxes). loader(scheduler), if given, is run once by
+    the worker before it starts delivering, to schedule existing bills.
+    """
+
+    def __init__(self, notifier=None, loader=None, lead_days=REMINDER_LEAD_DAYS, hour=REMINDER_HOUR,
+                 snooze_minutes=REMINDER_SNOOZE_MINUTES, batch_size=REMINDER_BATCH_SIZE,
+                 poll_seconds=REMINDER_POLL_SECONDS):
+        self.notifier = notifier or LocalNotifier()
+        self.loader = loader
+        self.lead_days = lead_days
+        self.hour = hour
+        self.snooze_minutes = snooze_minutes
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._cond = threading.Condition()
+        self._heap = array('q')
+        # One column per field, indexed by slot
+        self._fire_at = array('q')
+        self._user = array('I')
+        self._kind = array('B')
+        self._state = array('B')
+        self._gen = array('H')   # Bumped when a slot is reused, so old ids stop matching
+        self._due_day = array('I')  # Bill due date (proleptic ordinal)
+        self._amount = array('d')
+        self._bill = []          # Bill id (the same str object for both of a bill's reminders)
+        self._name = []          # Bill name (interned)
+        self._fire_times = {}    # (ordinal, hour) -> epoch seconds
+        self._free = array('I')
+        self._user_index = {}    # user_id -> user index
+        self._user_ids = []
+        self._user_slots = []    # user index -> array('I') of the user's live slots
+        self._inbox = {}         # user index -> delivered reminders, ready to serialize
+        self._inbox_changed = {}  # user index -> (changes, epoch seconds of the last one)
+        self._epoch = time.time_ns()  # Tells this scheduler's inbox versions from an earlier process's
+        self._pending = 0
+        self._stale = 0
+        self._worker = None
+        self._worker_pid = None
+        self._stopping = False
+        self.loaded = False
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.delivered = 0
+        self.snoozed = 0
+        self.cancelled = 0
+
+    # --- Scheduling ---
+
+    def schedule_bill(self, user_id, bill_id, name, amount, due_date, now=None):
+        """
+        Schedules the "due soon" (lead_days before, at `hour`) and "overdue"
+        (the day after) reminders for one bill occurrence. Reminders already
+        past their time fire on the next pop. Returns the reminder ids;
+        raises ValueError for a due date that cannot be scheduled.
+        """
+        due = due_date if isinstance(due_date, date) else date.fromisoformat(str(due_date)[:10])
+        now = time.time() if now is None else now
+        due_day = due.toordinal()
+        bill_id, name, amount = str(bill_id), sys.intern(str(name)), float(amount)
+        overdue_at = self._at(due_day + 1)
+        ids = []
+        if now < overdue_at:
+            ids.append(self.schedule(user_id, UPCOMING, self._at(due_day - self.lead_days),
+                                     bill_id, due_day, name, amount))
+        ids.append(self.schedule(user_id, OVERDUE, overdue_at, bill_id, due_day, name, amount))
+        return ids
+
+    def schedule(self, user_id, kind, fire_at, bill_id, due_day, name, amount):
+        """
+        Adds one reminder (`due_day` is the bill's due date as an ordinal) and
+        returns its id. A live reminder of the same kind for the same bill
+        occurrence is not added twice; its id is returned. Raises ValueError
+        for a fire time the heap cannot hold.
+        """
+        fire_at = int(fire_at)
+        if not 0 <= fire_at <= MAX_FIRE_AT:
+            raise ValueError(f"reminder time {fire_at} is out of range")
+        with self._cond:
+            user = self._user_index.get(user_id)
+            if user is None:
+                user = self._user_index[user_id] = len(self._user_ids)
+                self._user_ids.append(user_id)
+                self._user_slots.append(array('I'))
+            for slot in self._user_slots[user]:
+                if self._kind[slot] == kind and self._due_day[slot] == due_day and self._bill[slot] == bill_id:
+                    self.deduplicated += 1
+                    return self._id(slot)
+
+            slot = self._allocate()
+            self._fire_at[slot] = fire_at
+            self._user[slot] = user
+            self._kind[slot] = kind
+            self._state[slot] = PENDING
+            self._due_day[slot] = due_day
+            self._amount[slot] = amount
+            self._bill[slot] = bill_id
+            self._name[slot] = name
+            self._user_slots[user].append(slot)
+            self._pending += 1
+            self.scheduled += 1
+            if not self._heap or fire_at < self._heap[0] >> SLOT_BITS:
+                self._cond.notify()  # The worker may be sleeping past the new earliest time
+            _heap_push(self._heap, fire_at << SLOT_BITS | slot)
+            return self._id(slot)
+
+    def cancel(self, reminder_id, user_id=None):
+        """Cancels a pending or delivered reminder. Returns False for unknown ids."""
+        with self._cond:
+            slot = self._lookup(reminder_id, user_id)
+            if slot is None:
+                return False
+            self._release(slot)
+            self.cancelled += 1
+            return True
+
+    def cancel_bill(self, user_id, bill_id):
+        """Cancels every live reminder for `bill_id` (e.g. once it is paid). Returns how many."""
+        with self._cond:
+            user = self._user_index.get(user_id)
+            if user is None:
+                return 0
+            bill_id = str(bill_id)
+            slots = [slot for slot in self._user_slots[user] if self._bill[slot] == bill_id]
+            for slot in slots:
+                self._release(slot)
+            self.cancelled += len(slots)
+            return len(slots)
+
+    def snooze(self, reminder_id, user_id=None, minutes=None, now=None):
+        """
+        Takes a reminder out of the inbox (or delays it if still pending) and
+        fires it again `minutes` from now. Returns the new fire time, or None
+        for unknown ids.
+        """
+        minutes = self.snooze_minutes if minutes is None else minutes
+        now = time.time() if now is None else now
+        with self._cond:
+            slot = self._lookup(reminder_id, user_id)
+            if slot is None:
+                return None
+            if self._state[slot] == DELIVERED:
+                self._remove_from_inbox(slot)
+                self._pending += 1
+            else:
+                self._stale += 1  # Its current heap entry no longer matches
+            fire_at = int(now + minutes * 60)
+            self._fire_at[slot] = fire_at
+            self._state[slot] = PENDING
+            _heap_push(self._heap, fire_at << SLOT_BITS | slot)
+            self.snoozed += 1
+            self._maybe_compact()
+            return fire_at
+
+    # --- Delivery ---
+
+    def pop_due(self, now=None, limit=None):
+        """
+        Delivers up to `limit` reminders whose time has come, earliest first:
+        each is rendered into its owner's inbox. Returns the delivered dicts.
+        """
+        now = time.time() if now is None else now
+        limit = self.batch_size if limit is None else limit
+        cutoff = (int(now) + 1) << SLOT_BITS
+        delivered = []
+        with self._cond:
+            # self._heap is re-read on every pass: _release() may compact it
+            while self._heap and self._heap[0] < cutoff and len(delivered) < limit:
+                entry = _heap_pop(self._heap)
+                slot = entry & SLOT_MASK
+                if self._state[slot] != PENDING or self._fire_at[slot] != entry >> SLOT_BITS:
+                    self._stale -= 1
+                    continue
+                self._state[slot] = DELIVERED
+                self._pending -= 1
+                if self._kind[slot] == OVERDUE:
+                    self._retire_upcoming(slot)
+                reminder = self._render(slot)
+                bisect.insort(self._inbox.setdefault(self._user[slot], []), reminder, key=_inbox_order)
+                self._touch_inbox(self._user[slot])
+                delivered.append(reminder)
+            self.delivered += len(delivered)
+        return delivered
+
+    def run_once(self, now=None):
+        """Pops one batch of due reminders and passes it to the notifier."""
+        batch = self.pop_due(now)
+        if batch:
+            try:
+                self.notifier.notify(batch)
+            except Exception as e:
+                log.error("reminder notifier failed", count=len(batch), error=str(e))
+        return len(batch)
+
+    def inbox_version(self, user_id):
+        """((scheduler, changes) of the user's inbox, epoch seconds of the last change or None)."""
+        with self._cond:
+            changes, changed_at = self._inbox_changed.get(self._user_index.get(user_id), (0, None))
+            return (self._epoch, changes), changed_at
+
+    def reminders(self, user_id):
+        """The user's delivered reminders (overdue first), as precomputed by the worker."""
+        with self._cond:
+            user = self._user_index.get(user_id)
+            return list(self._inbox.get(user, ())) if user is not None else []
+
+    # --- Worker ---
+
+    def start(self):
+        """Starts the worker thread (once per process; safe to call on every request)."""
+        if self._worker_pid == os.getpid():
+            return
+        with self._cond:
+            if self._worker_pid == os.getpid():
+                return
+            self._stopping = False
+            self._worker = threading.Thread(target=self._run, name='reminder-worker', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._worker_pid = None
+
+    def _run(self):
+        if self.loader is not None and not self.loaded:
+            start = time.perf_counter()
+            try:
+                self.loader(self)
+                log.info("reminders loaded from bills", pending=self._pending,
+                         seconds=round(time.perf_counter() - start, 2))
+            except Exception as e:
+                log.error("loading bills for reminders failed", error=str(e))
+        self.loaded = True
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    wait = (self._heap[0] >> SLOT_BITS) - time.time() if self._heap else self.poll_seconds
+                    if wait <= 0:
+                        break
+                    self._cond.wait(min(wait, self.poll_seconds))
+                if self._stopping:
+                    return
+            self.run_once()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": self._pending,
+                "delivered_in_inboxes": sum(len(inbox) for inbox in self._inbox.values()),
+                "heap_entries": len(self._heap),
+                "stale_heap_entries": self._stale,
+                "users": len(self._user_ids),
+                "scheduled": self.scheduled,
+                "deduplicated": self.deduplicated,
+                "delivered": self.delivered,
+                "snoozed": self.snoozed,
+                "cancelled": self.cancelled,
+                "loaded": self.loaded,
+            }
+
+    def __len__(self):
+        return self._pending
+
+    # --- Internals (caller holds self._cond) ---
+
+    def _at(self, day):
+        """Epoch seconds of `hour` o'clock local time on the day with ordinal `day`."""
+        key = (day, self.hour)
+        fire_at = self._fire_times.get(key)
+        if fire_at is None:
+            try:
+                fire_at = int(datetime.combine(date.fromordinal(day), dtime(self.hour)).timestamp())
+            except (ValueError, OverflowError, OSError):
+                raise ValueError(f"day {day} cannot be scheduled")
+            self._fire_times[key] = fire_at
+        return fire_at
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        slot = len(self._state)
+        if slot > SLOT_MASK:
+            raise OverflowError("reminder scheduler is full")
+        self._fire_at.append(0)
+        self._user.append(0)
+        self._kind.append(0)
+        self._state.append(FREE)
+        self._gen.append(0)
+        self._due_day.append(0)
+        self._amount.append(0.0)
+        self._bill.append(None)
+        self._name.append(None)
+        return slot
+
+    def _release(self, slot):
+        if self._state[slot] == PENDING:
+            self._pending -= 1
+            self._stale += 1
+        else:
+            self._remove_from_inbox(slot)
+        self._user_slots[self._user[slot]].remove(slot)
+        self._state[slot] = FREE
+        self._gen[slot] = (self._gen[slot] + 1) & 0xFFFF
+        self._bill[slot] = self._name[slot] = None
+        self._free.append(slot)
+        self._maybe_compact()
+
+    def _retire_upcoming(self, overdue_slot):
+        """Drops the "due soon" reminder of a bill whose overdue reminder replaces it."""
+        bill_id, due_day = self._bill[overdue_slot], self._due_day[overdue_slot]
+        for slot in self._user_slots[self._user[overdue_slot]]:
+            if self._kind[slot] == UPCOMING and self._due_day[slot] == due_day and self._bill[slot] == bill_id:
+                self._release(slot)
+                return
+
+    def _remove_from_inbox(self, slot):
+        inbox = self._inbox.get(self._user[slot])
+        if inbox:
+            reminder_id = self._id(slot)
+            inbox[:] = [reminder for reminder in inbox if reminder["id"] != reminder_id]
+            self._touch_inbox(self._user[slot])
+
+    def _touch_inbox(self, user):
+        changes, _ = self._inbox_changed.get(user, (0, None))
+        self._inbox_changed[user] = (changes + 1, time.time())
+
+    def _maybe_compact(self):
+        """Drops stale heap entries once they are the majority (a sorted array is a valid heap)."""
+        if self._stale > 1024 and self._stale > len(self._heap) // 2:
+            state, fire_at = self._state, self._fire_at
+            self._heap = array('q', sorted(
+                entry for entry in self._heap
+                if state[entry & SLOT_MASK] == PENDING and fire_at[entry & SLOT_MASK] == entry >> SLOT_BITS
+            ))
+            self._stale = 0
+
+    def _id(self, slot):
+        return f"rem_{slot:x}_{self._gen[slot]:x}"
+
+    def _lookup(self, reminder_id, user_id=None):
+        """Slot of a live reminder id (owned by `user_id` if given), else None."""
+        try:
+            prefix, slot, gen = str(reminder_id).split('_')
+            slot, gen = int(slot, 16), int(gen, 16)
+        except ValueError:
+            return None
+        if prefix != 'rem' or not 0 <= slot < len(self._state):
+            return None
+        if self._state[slot] == FREE or self._gen[slot] != gen:
+            return None
+        if user_id is not None and self._user_ids[self._user[slot]] != user_id:
+            return None
+        return slot
+
+    def _render(self, slot):
+        bill_id, name, amount = self._bill[slot], self._name[slot], self._amount[slot]
+        due = date.fromordinal(self._due_day[slot])
+        if self._kind[slot] == OVERDUE:
+            return {
+                "id": self._id(slot), "type": "overdue", "priority": "high",
+                "message_en": f"{name} (₹{amount:,.0f}) is overdue! Pay now to maintain your streak.",
+                "message_hi": f"{name} (₹{amount:,.0f}) अतिदेय है! स्ट्रीक बनाए रखने के लिए अभी भुगतान करें।",
+                "icon": "🚨", "action": "pay_now", "bill_id": bill_id, "due_date": due.isoformat(),
+            }
+        return {
+            "id": self._id(slot), "type": "upcoming", "priority": "medium",
+            "message_en": f"{name} (₹{amount:,.0f}) is due on {due.day} {due:%b}.",
+            "message_hi": f"{name} (₹{amount:,.0f}) {due.day}/{due.month} को देय है।",
+            "icon": "💸", "action": "snooze", "bill_id": bill_id, "due_date": due.isoformat(),
+        }
+
+
+def _inbox_order(reminder):
+    return (reminder["type"] != "overdue", reminder["due_date"])
+
+
+# --- Binary heap over array('q') (heapq only works on lists) ---
+
+def _heap_push(heap, item):
+    heap.append(item)
+    position = len(heap) - 1
+    while position:
+        parent = (position - 1) >> 1
+        if heap[parent] <= item:
+            break
+        heap[position] = heap[parent]
+        position = parent
+    heap[position] = item
+
+
+def _heap_pop(heap):
+    last = heap.pop()
+    if not heap:
+        return last
+    top = heap[0]
+    size = len(heap)
+    position = 0
+    child = 1
+    while child < size:
+        right = child + 1
+        if right < size and heap[right] < heap[child]:
+            child = right
+        if heap[child] >= last:
+            break
+        heap[position] = heap[child]
+        position = child
+        child = 2 * position + 1
+    heap[position] = last
+    return top
+
+
+def bill_loader(ledger):
+    """Loader that schedules reminders for every open bill in a bill_ledger.BillLedger."""
+    def load(scheduler):
+        for bill in ledger.iter_open_bills():
+            try:
+                scheduler.schedule_bill(bill["user_id"], bill["id"], bill["name"], bill["amount"], bill["next_due"])
+            except ValueError as e:  # One unschedulable bill must not stop the others
+                log.warning("bill reminder not scheduled", bill_id=bill["id"], error=str(e))
+    return load
@@ -0,0 +1,211 @@
+# score_history.py - Append-only per-user credit score history
+#
+# Every computed score is appended as one fixed-size record to its user's
+# own file (<dir>/<ab>/<user key>.bin). Appends are single O_APPEND writes,
+# so gunicorn workers can share the files without locking. Each process
+# keeps a columnar in-memory index per user (one typed array per field plus
+# prefix sums), built from the user's file the first time they are queried
+# and then extended by reading only the bytes appended since. A user's last
+# N points, month-over-month delta and rolling averages read nothing but
+# that user's file. The index holds at most SCORE_HISTORY_MAX_USERS users
+# per process; the least recently used are dropped and re-read when queried.
+#
+# Points are kept in the order they were written. A point stamped earlier
+# than the one before it (another worker's clock, a backfill) is recorded
+# at the previous point's time, so adding a point is always O(1).
+
+import bisect
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCORE_HISTORY_DIR = os.getenv('SCORE_HISTORY_DIR', os.path.join(BASE_DIR, 'data', 'score_history'))
+SCORE_HISTORY_MAX_USERS = int(os.getenv('SCORE_HISTORY_MAX_USERS', 100_000))
+
+MONTH_SECONDS = 30 * 24 * 3600
+ROLLING_WINDOWS = (3, 6, 12)
+LOCK_STRIPES = 64
+
+# timestamp, total score, four component scores
+RECORD = struct.Struct('<dH4B')
+COMPONENTS = ("payment_history", "financial_stability", "credit_utilization", "data_richness")
+
+
+def user_key(user_id):
+    return blake2b(str(user_id).encode('utf-8'), digest_size=8).digest()
+
+
+class _Series:
+    """One user's points, oldest first, as parallel typed arrays."""
+    __slots__ = ("timestamps", "totals", "components", "prefix", "offset")
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.totals = array('H')
+        self.components = tuple(array('B') for _ in COMPONENTS)
+        self.prefix = array('Q', [0])  # prefix[i] = sum of the first i totals
+        self.offset = 0                # Bytes of the user's file already indexed
+
+    def add(self, timestamp, total, component_scores):
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            timestamp = self.timestamps[-1]
+        self.timestamps.append(timestamp)
+        self.totals.append(total)
+        for column, value in zip(self.components, component_scores):
+            column.append(value)
+        self.prefix.append(self.prefix[-1] + total)
+
+    def refresh(self, path):
+        """Indexes records appended to `path` since the last call (caller holds the user's lock)."""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        size -= (size - self.offset) % RECORD.size  # Ignore a partially written tail
+        if size <= self.offset:
+            return
+        with open(path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        for timestamp, total, *component_scores in RECORD.iter_unpack(data):
+            self.add(timestamp, total, component_scores)
+        self.offset = size
+
+    def __len__(self):
+        return len(self.totals)
+
+
+class ScoreHistory:
+    def __init__(self, directory=SCORE_HISTORY_DIR, max_users=SCORE_HISTORY_MAX_USERS):
+        self.directory = directory
+        self.max_users = max(1, max_users)
+        self._series = OrderedDict()  # user key -> _Series, least recently used first
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.evictions = 0
+
+    def append(self, user_id, score_result, timestamp=None):
+        """
+        Records one calculate_credit_score result and returns the user's
+        summary() including it. O(1): one write plus indexing new records.
+        """
+        breakdown = score_result['breakdown']
+        record = RECORD.pack(
+            time.time() if timestamp is None else float(timestamp),
+            max(0, min(0xFFFF, int(score_result['total_score']))),
+            *(max(0, min(0xFF, int(breakdown[name]['score']))) for name in COMPONENTS),
+        )
+        key = user_key(user_id)
+        path = self._path(key)
+        with self._user_lock(key):
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, record)
+            finally:
+                os.close(fd)
+            return self._summarize(self._load(key, path))
+
+    def last(self, user_id, n=12):
+        """The user's last `n` points, oldest first."""
+        key = user_key(user_id)
+        with self._user_lock(key):
+            series = self._load(key, self._path(key))
+            start = max(0, len(series) - n)
+            return [
+                {
+                    "timestamp": series.timestamps[i],
+                    "total_score": series.totals[i],
+                    "breakdown": {name: column[i] for name, column in zip(COMPONENTS, series.components)},
+                }
+                for i in range(start, len(series))
+            ]
+
+    def summary(self, user_id):
+        key = user_key(user_id)
+        with self._user_lock(key):
+            return self._summarize(self._load(key, self._path(key)))
+
+    def stats(self):
+        with self._lock:
+            return {"users_indexed": len(self._series), "max_users": self.max_users,
+                    "evictions": self.evictions}
+
+    def _path(self, key):
+        name = key.hex()
+        return os.path.join(self.directory, name[:2], name + '.bin')
+
+    def _user_lock(self, key):
+        return self._user_locks[zlib.crc32(key) % LOCK_STRIPES]
+
+    def _load(self, key, path):
+        """The user's series, brought up to date with their file (caller holds the user's lock)."""
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+        if series is not None:
+            series.refresh(path)
+            return series
+        series = _Series()
+        series.refresh(path)
+        if series.offset:  # Users without a file are not worth a place in the index
+            with self._lock:
+                self._series[key] = series
+                while len(self._series) > self.max_users:
+                    self._series.popitem(last=False)
+                    self.evictions += 1
+        return series
+
+    @staticmethod
+    def _summarize(series):
+        """
+        Latest score, delta vs. the previous point and vs. the last point at
+        least a month older, and rolling averages over ROLLING_WINDOWS points.
+        Uses prefix sums and one bisect, so it is O(log n) in the user's points.
+        """
+        if not len(series):
+            return {"points": 0, "latest": None, "previous_delta": None, "mom_delta": None,
+                    "rolling_avg": {}, "trend": format_trend(None, None)}
+        n = len(series)
+        latest = series.totals[-1]
+        previous_delta = latest - series.totals[-2] if n > 1 else None
+        month_index = bisect.bisect_right(series.timestamps, series.timestamps[-1] - MONTH_SECONDS) - 1
+        mom_delta = latest - series.totals[month_index] if month_index >= 0 else None
+        rolling = {
+            str(window): round((series.prefix[n] - series.prefix[n - window]) / window, 1)
+            for window in ROLLING_WINDOWS if n >= window
+        }
+        return {"points": n, "latest": latest, "previous_delta": previous_delta, "mom_delta": mom_delta,
+                "rolling_avg": rolling, "trend": format_trend(mom_delta, previous_delta)}
+
+
+def format_trend(mom_delta, previous_delta):
+    """Trend label in the style the score card shows (e.g. "▲ +5 pts vs. last month")."""
+    if mom_delta is not None:
+        delta, period = mom_delta, "vs. last month"
+    elif previous_delta is not None:
+        delta, period = previous_delta, "since your last check"
+    else:
+        return "● First score on record"
+    if delta > 0:
+        return f"▲ +{delta} pts {period}"
+    if delta < 0:
+        return f"▼ {delta} pts {period}"
+    return f"■ No change {period}"
+
+
+def format_delta(delta):
+    """Short signed delta for the health monitor ("+15", "-3", "0"), or "new"."""
+    if delta is None:
+        return "new"
+    return f"{delta:+d}" if delta else "0"
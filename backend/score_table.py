@@ -0,0 +1,166 @@
+# score_table.py - Lookup-table version of scoring_engine.calculate_credit_score
+#
+# Every input reaches the score either as a categorical value (rent/utility
+# history, employment stability) or through a threshold band (avg balance,
+# savings rate, overdrafts, rent-to-income). That domain is small, so each
+# cell's result is computed once with calculate_credit_score itself and
+# scoring becomes band classification plus one list lookup.
+#
+# Constants are read from the scoring_engine module (not from-imported) when
+# the table is built. scoring_engine.set_constants() bumps CONSTANTS_VERSION,
+# and the table is rebuilt on the next call after that; checking the version
+# is one attribute read, so the table stays cheaper than the scalar engine.
+
+import math
+import threading
+
+import scoring_engine
+from structured_log import get_logger
+
+log = get_logger('score_table')
+_lock = threading.Lock()
+_table = None
+
+
+class ScoreTable:
+    """
+    One entry per cell of the encoded domain. An entry is the argument tuple
+    for build_score_result (final, rating, payment, stability, utilization,
+    richness), or None for cells no input can reach (e.g. unsorted bands).
+
+    Codes, in cell-index order (mixed radix, last axis fastest):
+      rent_history, utility_history  index into history_keys, len() = unknown
+      emp_stability                  index into stability_keys, len() = unknown
+      avg_balance, savings_rate      1 if above the threshold
+      no_overdrafts                  1 if overdrafts == 0
+      utilization_band               0 = no income, 1..len(bands) = band, last = floor
+    """
+
+    def __init__(self, version):
+        se = scoring_engine
+        self.version = version
+        self.history_map = dict(se.HISTORY_MAP)
+        self.stability_map = dict(se.STABILITY_MAP)
+        self.history_keys = tuple(se.HISTORY_MAP)
+        self.stability_keys = tuple(se.STABILITY_MAP)
+        self.history_codes = {key: i for i, key in enumerate(self.history_keys)}
+        self.stability_codes = {key: i for i, key in enumerate(self.stability_keys)}
+        self.band_bounds = tuple(bound for bound, _ in se.RENT_TO_INCOME_BANDS)
+        self.unknown_history = len(self.history_keys)
+        self.unknown_stability = len(self.stability_keys)
+        self.avg_balance_threshold = se.AVG_BALANCE_THRESHOLD
+        self.savings_rate_threshold = se.SAVINGS_RATE_THRESHOLD
+
+        history_size = len(self.history_keys) + 1
+        self.shape = (history_size, history_size, len(self.stability_keys) + 1,
+                      2, 2, 2, len(self.band_bounds) + 2)
+        self.strides = tuple(math.prod(self.shape[axis + 1:]) for axis in range(len(self.shape)))
+        self.entries = [self._compute(cell) for cell in range(math.prod(self.shape))]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def cell_index(self, rent_history, utility_history, emp_stability,
+                   above_balance, above_savings, no_overdrafts, utilization_band):
+        s = self.strides
+        return (rent_history * s[0] + utility_history * s[1] + emp_stability * s[2]
+                + above_balance * s[3] + above_savings * s[4] + no_overdrafts * s[5]
+                + utilization_band)
+
+    def classify(self, data):
+        """
+        Returns the cell index for a profile. Parses exactly like
+        calculate_credit_score, so it raises for the same malformed inputs.
+        Kept flat (no helper calls) because it runs once per request.
+        """
+        get = data.get
+        history_codes = self.history_codes
+        s_rent, s_utility, s_stability, s_balance, s_savings, s_overdrafts, _ = self.strides
+        cell = (history_codes.get(get('rentHistory'), self.unknown_history) * s_rent
+                + history_codes.get(get('utilityHistory'), self.unknown_history) * s_utility)
+        income = float(get('monthlyIncome', 0))
+        if float(get('avgBalance', 0)) > self.avg_balance_threshold:
+            cell += s_balance
+        if float(get('savingsRate', 0)) > self.savings_rate_threshold:
+            cell += s_savings
+        if int(get('overdrafts', 0)) == 0:
+            cell += s_overdrafts
+        cell += self.stability_codes.get(get('employmentStability'), self.unknown_stability) * s_stability
+        rent = float(get('rentAmount', 0))
+        if income > 0:
+            rent_to_income = rent / income
+            band = 1
+            for upper_bound in self.band_bounds:
+                if rent_to_income < upper_bound:
+                    return cell + band
+                band += 1
+            return cell + band
+        return cell
+
+    def decode(self, cell):
+        """Inverse of cell_index: the tuple of per-axis codes."""
+        return tuple((cell // stride) % size for stride, size in zip(self.strides, self.shape))
+
+    def representative(self, cell):
+        """A profile dict that falls in `cell`, built from the band edges."""
+        rent_code, utility_code, stability_code, balance, savings, no_overdrafts, band = self.decode(cell)
+        keys = self.history_keys
+        income, rent = 1.0, 0.0
+        if band == 0:
+            income = 0.0
+        elif band <= len(self.band_bounds):
+            # Lower edge of the band (bands are checked with "<", in order)
+            rent = self.band_bounds[band - 2] if band > 1 else self.band_bounds[0] - 1
+        elif self.band_bounds:
+            rent = max(self.band_bounds)
+        return {
+            "rentHistory": keys[rent_code] if rent_code < len(keys) else None,
+            "utilityHistory": keys[utility_code] if utility_code < len(keys) else None,
+            "employmentStability": (self.stability_keys[stability_code]
+                                    if stability_code < len(self.stability_keys) else None),
+            "monthlyIncome": income,
+            "rentAmount": rent,
+            "avgBalance": math.nextafter(self.avg_balance_threshold, math.inf) if balance
+                          else self.avg_balance_threshold,
+            "savingsRate": math.nextafter(self.savings_rate_threshold, math.inf) if savings
+                           else self.savings_rate_threshold,
+            "overdrafts": 0 if no_overdrafts else 1,
+        }
+
+    def _compute(self, cell):
+        data = self.representative(cell)
+        if self.classify(data) != cell:
+            return None  # Unreachable cell
+        result = scoring_engine.calculate_credit_score(data)
+        breakdown = result["breakdown"]
+        return (
+            result["total_score"], result["rating"],
+            breakdown["payment_history"]["score"], breakdown["financial_stability"]["score"],
+            breakdown["credit_utilization"]["score"], breakdown["data_richness"]["score"],
+        )
+
+
+def get_score_table():
+    """Returns the table for the current scoring constants, rebuilding it if they changed."""
+    global _table
+    table = _table
+    if table is not None and table.version == scoring_engine.CONSTANTS_VERSION:
+        return table
+    with _lock:
+        version = scoring_engine.CONSTANTS_VERSION
+        if _table is None or _table.version != version:
+            _table = ScoreTable(version)
+        return _table
+
+
+def calculate_credit_score_fast(data):
+    """Drop-in replacement for calculate_credit_score backed by the lookup table."""
+    table = _table
+    if table is None or table.version != scoring_engine.CONSTANTS_VERSION:
+        table = get_score_table()
+    try:
+        entry = table.entries[table.classify(data)]
+    except Exception as e:
+        log.warning("malformed profile; returning the error score", error=str(e))
+        return scoring_engine.get_error_score()
+    return scoring_engine.build_score_result(*entry)
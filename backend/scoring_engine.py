@@ -1,3 +1,60 @@
+from structured_log import get_logger
+
+log = get_logger('scoring_engine')
+
+# --- Scoring constants ---
+# Shared by the scalar engine below and the array engine in batch_scoring.py,
+# so both paths always agree on maps, thresholds and weights.
+HISTORY_MAP = {"excellent": 100, "good": 75, "fair": 40, "poor": 10}
+STABILITY_MAP = {"high": 100, "medium": 70, "low": 30}
+
+AVG_BALANCE_THRESHOLD = 1000
+SAVINGS_RATE_THRESHOLD = 0.1
+EMP_STABILITY_THRESHOLD = 50
+STABILITY_POINTS = 25
+
+# (rent_to_income upper bound, utilization score), checked in order
+RENT_TO_INCOME_BANDS = ((0.3, 100), (0.4, 70), (0.5, 40))
+RENT_TO_INCOME_FLOOR = 10
+
+DATA_RICHNESS_SCORE = 70  # Fixed score for filling the form
+
+# Max score is 850. 850 - 300 = 550 points to distribute:
+# Pay History (35% of 550): 192.5 pts -> 1.925 * score
+# Stability (30% of 550): 165 pts -> 1.65 * score
+# Utilization (15% of 550): 82.5 pts -> 0.825 * score
+# Richness (20% of 550): 110 pts -> 1.1 * score
+PAYMENT_HISTORY_WEIGHT = 1.925
+FINANCIAL_STABILITY_WEIGHT = 1.65
+CREDIT_UTILIZATION_WEIGHT = 0.825
+DATA_RICHNESS_WEIGHT = 1.1
+
+MIN_SCORE = 300
+MAX_SCORE = 850
+
+# (minimum score, rating), checked in order; anything lower is "Poor"
+RATING_BANDS = ((800, "Excellent"), (740, "Very Good"), (670, "Good"), (580, "Fair"))
+
+# Bumped by set_constants(); score_table.py rebuilds its lookup table when it changes
+CONSTANTS_VERSION = 0
+
+
+def set_constants(**values):
+    """
+    Changes scoring constants, e.g. set_constants(PAYMENT_HISTORY_WEIGHT=2.0).
+    Change them through here rather than by assigning (or mutating) the
+    module attributes, so the lookup table in score_table.py is rebuilt.
+    """
+    global CONSTANTS_VERSION
+    module = globals()
+    for name in values:
+        if not name.isupper() or name == 'CONSTANTS_VERSION' or name not in module:
+            raise KeyError(f"{name} is not a scoring constant")
+    for name, value in values.items():
+        module[name] = dict(value) if isinstance(value, dict) else value
+    CONSTANTS_VERSION += 1
+
+
 def calculate_credit_score(data):
     """
     Calculates an alternative credit score based on form data.
@@ -5,7 +62,7 @@ def calculate_credit_score(data):
     Score range: 300 - 850
     """
     # Base score
-    score = 300
+    score = MIN_SCORE
     
     # Component scores (out of 100)
     payment_history_score = 0
@@ -16,11 +73,9 @@ def calculate_credit_score(data):
     try:
         # --- 1. Payment History (Rent & Utilities) ---
         # Weight: 35%
-        history_map = {"excellent": 100, "good": 75, "fair": 40, "poor": 10}
-        rent_history = history_map.get(data.get('rentHistory'), 0)
-        utility_history = history_map.get(data.get('utilityHistory'), 0)
+        rent_history = HISTORY_MAP.get(data.get('rentHistory'), 0)
+        utility_history = HISTORY_MAP.get(data.get('utilityHistory'), 0)
         payment_history_score = int((rent_history * 0.6) + (utility_history * 0.4))
-        score += payment_history_score * 1.5 # 1.5 * 100 = 150 points
 
         # --- 2. Financial Stability (Income, Savings, Employment) ---
         # Weight: 30%
@@ -28,16 +83,14 @@ def calculate_credit_score(data):
         avg_balance = float(data.get('avgBalance', 0))
         savings_rate = float(data.get('savingsRate', 0))
         overdrafts = int(data.get('overdrafts', 0))
-        stability_map = {"high": 100, "medium": 70, "low": 30}
-        emp_stability = stability_map.get(data.get('employmentStability'), 0)
+        emp_stability = STABILITY_MAP.get(data.get('employmentStability'), 0)
         
         stability_score = 0
-        if avg_balance > 1000: stability_score += 25
-        if savings_rate > 0.1: stability_score += 25
-        if overdrafts == 0: stability_score += 25
-        if emp_stability > 50: stability_score += 25
+        if avg_balance > AVG_BALANCE_THRESHOLD: stability_score += STABILITY_POINTS
+        if savings_rate > SAVINGS_RATE_THRESHOLD: stability_score += STABILITY_POINTS
+        if overdrafts == 0: stability_score += STABILITY_POINTS
+        if emp_stability > EMP_STABILITY_THRESHOLD: stability_score += STABILITY_POINTS
         financial_stability_score = stability_score
-        score += financial_stability_score * 1.65 # 1.65 * 100 = 165 points
 
         # --- 3. Credit Utilization (Income vs. Rent) ---
         # Weight: 15%
@@ -45,66 +98,82 @@ def calculate_credit_score(data):
         utilization_score = 0
         if income > 0:
             rent_to_income = rent / income
-            if rent_to_income < 0.3: utilization_score = 100
-            elif rent_to_income < 0.4: utilization_score = 70
-            elif rent_to_income < 0.5: utilization_score = 40
-            else: utilization_score = 10
+            for upper_bound, band_score in RENT_TO_INCOME_BANDS:
+                if rent_to_income < upper_bound:
+                    utilization_score = band_score
+                    break
+            else:
+                utilization_score = RENT_TO_INCOME_FLOOR
         credit_utilization_score = utilization_score
-        score += utilization_score * 0.8 # 0.8 * 100 = 80 points
         
         # --- 4. Data Richness ---
-        # Weight: ~5% (plus base score)
-        data_richness_score = 70 # Give a fixed score for filling the form
-        score += data_richness_score * 0.55 # 0.55 * 100 = 55 points
-        
-        # Total points available: 150 + 165 + 80 + 55 = 450
-        # Base score 300 + 450 = 750. Oh, let's adjust.
-        # Max score is 850. 850 - 300 = 550 points to distribute.
-        # Let's re-weight:
-        # Pay History (35% of 550): 192.5 pts -> 1.925 * score
-        # Stability (30% of 550): 165 pts -> 1.65 * score
-        # Utilization (15% of 550): 82.5 pts -> 0.825 * score
-        # Richness (20% of 550): 110 pts -> 1.1 * score
-        # Let's redo the score math...
+        # Weight: 20%
+        data_richness_score = DATA_RICHNESS_SCORE
         
-        score = 300
-        score += payment_history_score * 1.925
-        score += financial_stability_score * 1.65
-        score += credit_utilization_score * 0.825
-        score += data_richness_score * 1.1 # Give 1.1 * 70 = 77 points
+        score = MIN_SCORE
+        score += payment_history_score * PAYMENT_HISTORY_WEIGHT
+        score += financial_stability_score * FINANCIAL_STABILITY_WEIGHT
+        score += credit_utilization_score * CREDIT_UTILIZATION_WEIGHT
+        score += data_richness_score * DATA_RICHNESS_WEIGHT # Give 1.1 * 70 = 77 points
 
         # Final score clamping (300-850)
-        final_score = max(300, min(850, int(score)))
-
-        # Determine rating
-        if final_score >= 800: rating = "Excellent"
-        elif final_score >= 740: rating = "Very Good"
-        elif final_score >= 670: rating = "Good"
-        elif final_score >= 580: rating = "Fair"
-        else: rating = "Poor"
-
-        return {
-            "total_score": final_score,
-            "rating": rating,
-            "trend": "▲ +5 pts vs. last month", # Dummy trend data
-            "breakdown": {
-                "payment_history": {"score": payment_history_score, "label": "Payment History"},
-                "financial_stability": {"score": financial_stability_score, "label": "Financial Stability"},
-                "credit_utilization": {"score": credit_utilization_score, "label": "Income-to-Rent"},
-                "data_richness": {"score": data_richness_score, "label": "Data Richness"},
-            }
-        }
+        final_score = max(MIN_SCORE, min(MAX_SCORE, int(score)))
+
+        return build_score_result(
+            final_score,
+            get_rating(final_score),
+            payment_history_score,
+            financial_stability_score,
+            credit_utilization_score,
+            data_richness_score,
+        )
     except Exception as e:
-        print(f"Error in scoring engine: {e}")
-        # Return a default "error" score
-        return {
-            "total_score": 400,
-            "rating": "Error",
-            "trend": "...",
-            "breakdown": {
-                "payment_history": {"score": 0, "label": "Payment History"},
-                "financial_stability": {"score": 0, "label": "Financial Stability"},
-                "credit_utilization": {"score": 0, "label": "Income-to-Rent"},
-                "data_richness": {"score": 0, "label": "Data Richness"},
-            }
-        }
\ No newline at end of file
+        log.warning("malformed profile; returning the error score", error=str(e))
+        return get_error_score()
+
+
+def get_rating(final_score):
+    """Maps a clamped score to its rating label."""
+    for min_score, rating in RATING_BANDS:
+        if final_score >= min_score:
+            return rating
+    return "Poor"
+
+
+def band_trend(final_score):
+    """Trend label for a score with no history to compare against: the distance to the next rating."""
+    for min_score, rating in reversed(RATING_BANDS):
+        if final_score < min_score:
+            return f"▲ {min_score - final_score} pts to {rating}"
+    return "★ Top rating band"
+
+
+def build_score_result(final_score, rating, payment_history_score, financial_stability_score,
+                       credit_utilization_score, data_richness_score):
+    """Assembles the response dict returned by every scoring path."""
+    return {
+        "total_score": final_score,
+        "rating": rating,
+        "trend": band_trend(final_score),  # Replaced by the score_history trend when the user has one
+        "breakdown": {
+            "payment_history": {"score": payment_history_score, "label": "Payment History"},
+            "financial_stability": {"score": financial_stability_score, "label": "Financial Stability"},
+            "credit_utilization": {"score": credit_utilization_score, "label": "Income-to-Rent"},
+            "data_richness": {"score": data_richness_score, "label": "Data Richness"},
+        }
+    }
+
+
+def get_error_score():
+    """Default score returned when a profile cannot be parsed."""
+    return {
+        "total_score": 400,
+        "rating": "Error",
+        "trend": "...",
+        "breakdown": {
+            "payment_history": {"score": 0, "label": "Payment History"},
+            "financial_stability": {"score": 0, "label": "Financial Stability"},
+            "credit_utilization": {"score": 0, "label": "Income-to-Rent"},
+            "data_richness": {"score": 0, "label": "Data Richness"},
+        }
+    }
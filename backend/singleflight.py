@@ -0,0 +1,174 @@
+# singleflight.py - Coalesce identical in-flight LLM calls
+#
+# When many users submit the same form values at once, every request builds
+# the same prompt. Only the first caller (the leader) hits the model; callers
+# that arrive while it is in flight wait for the same answer. Each caller
+# keeps its own timeout, so a short budget never cuts a longer one short.
+#
+# Calls with a timeout run on a BoundedExecutor: once its workers are busy
+# and its queue is full, new calls are refused (ExecutorFull) instead of
+# piling up behind calls that will outlive their callers' budgets. A queued
+# call whose callers have all timed out is dropped before it starts.
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+
+class ExecutorFull(RuntimeError):
+    """Raised instead of queueing when every worker is busy and the queue is full."""
+
+
+class BoundedExecutor:
+    """A ThreadPoolExecutor that holds at most `max_queue` calls waiting for a worker."""
+
+    def __init__(self, max_workers, max_queue, thread_name_prefix=''):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self.rejected = 0
+
+    def submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorFull(f"{self.max_workers} workers busy and {self.max_queue} calls queued")
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._admitted += 1
+        future.add_done_callback(self._release)
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.max_workers, "max_queue": self.max_queue,
+                    "admitted": self._admitted, "rejected": self.rejected}
+
+    def _release(self, _):
+        self._slots.release()
+
+
+class SingleFlight:
+    """Thread-based coalescing for the blocking (gunicorn/Flask) path."""
+
+    def __init__(self, executor):
+        # Leaders with a timeout run their call here so they can stop waiting
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> [Future, waiting callers, executor future or None]
+        self.leader_calls = 0
+        self.shared_calls = 0
+        self.dropped_calls = 0
+
+    def do(self, key, func, timeout=None):
+        """
+        Returns func()'s result, sharing one call among concurrent callers with
+        the same key. Raises concurrent.futures.TimeoutError if this caller's
+        `timeout` passes first; the shared call keeps running for the others,
+        or is dropped if it has not started and no caller is left. Raises
+        ExecutorFull if the call cannot be queued.
+        """
+        with self._lock:
+            entry = self._inflight.get(key)
+            leader = entry is None
+            if leader:
+                entry = self._inflight[key] = [Future(), 0, None]
+                self.leader_calls += 1
+            else:
+                self.shared_calls += 1
+            entry[1] += 1
+        future = entry[0]
+
+        try:
+            if leader:
+                if timeout is None:
+                    self._run(key, entry, func)
+                else:
+                    try:
+                        entry[2] = self._executor.submit(self._run, key, entry, func)
+                    except BaseException as e:
+                        self._finish(key, entry)
+                        future.set_exception(e)  # Callers that joined meanwhile fail the same way
+                        raise
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                drop = entry[1] == 0 and entry[2] is not None and entry[2].cancel()
+                if drop:
+                    self.dropped_calls += 1
+                    if self._inflight.get(key) is entry:
+                        del self._inflight[key]
+            if drop:
+                future.set_exception(CancelledError())
+
+    def stats(self):
+        with self._lock:
+            return {"leader_calls": self.leader_calls, "shared_calls": self.shared_calls,
+                    "dropped_calls": self.dropped_calls, "in_flight": len(self._inflight)}
+
+    def _run(self, key, entry, func):
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, entry)
+            entry[0].set_exception(e)
+            return
+        self._finish(key, entry)
+        entry[0].set_result(result)
+
+    def _finish(self, key, entry):
+        with self._lock:
+            if self._inflight.get(key) is entry:
+                del self._inflight[key]
+
+
+class AsyncSingleFlight:
+    """asyncio coalescing: one task per key and event loop, shared by awaiters."""
+
+    def __init__(self):
+        self._inflight = {}  # (loop, key) -> [task, waiter count]
+        self.leader_calls = 0
+        self.shared_calls = 0
+
+    async def do(self, key, coro_func, timeout=None):
+        """
+        Awaits coro_func()'s result, sharing one task among concurrent awaiters
+        with the same key. Raises asyncio.TimeoutError if this awaiter's
+        `timeout` passes first. The shared task is cancelled only once every
+        awaiter has timed out or been cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        entry = self._inflight.get(flight_key)
+        if entry is None:
+            task = loop.create_task(coro_func())
+            entry = self._inflight[flight_key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(flight_key, entry))
+            self.leader_calls += 1
+        else:
+            self.shared_calls += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    def stats(self):
+        return {"leader_calls": self.leader_calls, "shared_calls": self.shared_calls,
+                "in_flight": len(self._inflight)}
+
+    def _forget(self, flight_key, entry):
+        if self._inflight.get(flight_key) is entry:
+            del self._inflight[flight_key]
@@ -0,0 +1,116 @@
+# sqlite_store.py - Connection handling shared by the SQLite-backed stores
+#
+# Each store keeps one connection per thread (and per process, so
+# connections are never shared across a gunicorn fork) in WAL mode, so
+# readers in every worker run alongside the single writer.
+#
+# Default database files live next to the code. Where that directory is
+# read-only (a Vercel function), default_path() puts them in the temp
+# directory instead, which lasts only as long as the instance: set
+# BILL_DB_PATH / USER_DB_PATH to a persistent volume for durable data.
+
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_path(filename):
+    """backend/<filename>, or <temp dir>/arthniti/<filename> if backend/ is not writable."""
+    if os.access(BASE_DIR, os.W_OK):
+        return os.path.join(BASE_DIR, filename)
+    directory = os.path.join(tempfile.gettempdir(), 'arthniti')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+# Per thread (and process): database path -> [connection, batch depth]. Stores on the
+# same file share the connection, so their batches nest into one transaction.
+_local = threading.local()
+
+
+class SQLiteStore:
+    """
+    Base class for the stores; subclasses set SCHEMA. Connections are opened
+    on first use and reused, one per thread for each database file, shared
+    by every store on that file. Writes inside `with store.batch():` share
+    one transaction, including writes to other stores on the same file:
+
+        with ledger.batch():
+            ledger.mark_paid(...)
+            streaks.record_payment(...)  # Committed or rolled back with the payment
+    """
+    SCHEMA = ""
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        return self._state()[0]
+
+    def _state(self):
+        if getattr(_local, 'pid', None) != os.getpid():
+            _local.states = {}
+            _local.pid = os.getpid()
+        state = _local.states.get(self.path)
+        if state is None:
+            state = _local.states[self.path] = [self._connect(), 0]
+        if not self._schema_ready:
+            self._create_schema(state[0])
+        return state
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; fsync at checkpoints only
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _create_schema(self, conn):
+        # Statement by statement: executescript() would commit another store's open transaction
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            for statement in self.SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            # Inside a transaction the tables could still be rolled back; create them again next time
+            self._schema_ready = not conn.in_transaction
+
+    def close(self):
+        """Closes this thread's connection to the store's file (the next call reopens it)."""
+        if getattr(_local, 'pid', None) == os.getpid():
+            state = _local.states.pop(self.path, None)
+            if state is not None:
+                state[0].close()
+
+    @contextmanager
+    def batch(self):
+        """Groups every write inside the block into one transaction (nestable)."""
+        state = self._state()
+        conn = state[0]
+        if state[1]:
+            state[1] += 1
+            try:
+                yield conn
+            finally:
+                state[1] -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        state[1] = 1
+        try:
+            yield conn
+        except BaseException:
+            state[1] = 0
+            conn.execute("ROLLBACK")
+            raise
+        state[1] = 0
+        conn.execute("COMMIT")
@@ -0,0 +1,310 @@
+# streaks.py - Payment streaks and achievements, updated per payment
+#
+# A streak is a run of on-time payments with no late payment in between.
+# Its length is the number of days from the first to the latest on-time
+# payment of the run (the "days on time" the finance manager shows). Each
+# payment updates the user's StreakState in O(1); nothing is recomputed from
+# the payment history. States live in the payment_streaks table next to the
+# bill ledger, so every gunicorn worker sees the same streak.
+#
+# replay() rebuilds every user's state from the ledger's payment log in one
+# vectorized pass (numpy, imported on first use), e.g. after the thresholds
+# below change or if the table is lost. It applies each user's payments in
+# the order they were recorded (the ledger's rowid), as mark-paid did in the
+# same transaction, so a backdated payment replays exactly as it went live.
+#
+# Usage:
+#     python streaks.py replay
+
+import sys
+import time
+from array import array
+from datetime import date
+
+import data_versions
+from sqlite_store import SQLiteStore
+from bill_ledger import BILL_DB_PATH, BILL_DB_BUSY_TIMEOUT_MS
+
+# Unlocked in this order as the current streak reaches `days`
+ACHIEVEMENTS = (
+    {"id": "ach_1", "days": 7, "name": "7 Day Hero", "name_hi": "7 दिन का हीरो", "icon": "🏆"},
+    {"id": "ach_2", "days": 30, "name": "30 Day Master", "name_hi": "30 दिन का मास्टर", "icon": "⭐"},
+    {"id": "ach_3", "days": 100, "name": "100 Day Legend", "name_hi": "100 दिन का लीजेंड", "icon": "💎"},
+    {"id": "ach_4", "days": 365, "name": "365 Day King", "name_hi": "365 दिन का राजा", "icon": "👑"},
+)
+THRESHOLDS = tuple(achievement["days"] for achievement in ACHIEVEMENTS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment_streaks (
+    user_id TEXT PRIMARY KEY,
+    streak_start INTEGER,
+    last_on_time INTEGER,
+    best INTEGER NOT NULL,
+    on_time INTEGER NOT NULL,
+    late INTEGER NOT NULL,
+    unlock_days BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+_UPSERT_SQL = (
+    "INSERT OR REPLACE INTO payment_streaks "
+    "(user_id, streak_start, last_on_time, best, on_time, late, unlock_days) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Date ordinal (date.toordinal()) of an ISO date column, computed by SQLite
+_SQL_ORDINAL = "CAST(julianday({}) - 1721424.5 AS INTEGER)"
+
+
+class StreakState:
+    """One user's streak. Days are date ordinals; unlock_days[i] is when ACHIEVEMENTS[i] unlocked."""
+    __slots__ = ("streak_start", "last_on_time", "best", "on_time", "late", "unlock_days")
+
+    def __init__(self, streak_start=None, last_on_time=None, best=0, on_time=0, late=0, unlock_days=()):
+        self.streak_start = streak_start
+        self.last_on_time = last_on_time
+        self.best = best
+        self.on_time = on_time
+        self.late = late
+        self.unlock_days = list(unlock_days)
+
+    @property
+    def current(self):
+        if self.streak_start is None:
+            return 0
+        return self.last_on_time - self.streak_start + 1
+
+    def apply(self, day, on_time):
+        """
+        Applies one payment made on `day`. Returns the indexes of the
+        achievements it unlocked (usually none). Constant time.
+        """
+        if not on_time:
+            self.late += 1
+            self.streak_start = self.last_on_time = None
+            return []
+        self.on_time += 1
+        if self.streak_start is None:
+            self.streak_start = self.last_on_time = day
+        elif day > self.last_on_time:
+            self.last_on_time = day
+        current = self.last_on_time - self.streak_start + 1
+        if current > self.best:
+            self.best = current
+        unlocked = []
+        while len(self.unlock_days) < len(THRESHOLDS) and current >= THRESHOLDS[len(self.unlock_days)]:
+            unlocked.append(len(self.unlock_days))
+            self.unlock_days.append(day)
+        return unlocked
+
+    def as_row(self, user_id):
+        return (user_id, self.streak_start, self.last_on_time, self.best, self.on_time, self.late,
+                array('i', self.unlock_days).tobytes())
+
+    @classmethod
+    def from_row(cls, row):
+        if row is None:
+            return cls()
+        unlock_days = array('i', row["unlock_days"]).tolist()
+        return cls(row["streak_start"], row["last_on_time"], row["best"], row["on_time"], row["late"], unlock_days)
+
+    def to_dict(self):
+        """The /api/finance/streak payload."""
+        current = self.current
+        achievements = []
+        for i, achievement in enumerate(ACHIEVEMENTS):
+            entry = {key: achievement[key] for key in ("id", "name", "name_hi", "icon")}
+            if i < len(self.unlock_days):
+                entry.update(unlocked=True, unlocked_date=date.fromordinal(self.unlock_days[i]).isoformat())
+            else:
+                entry.update(unlocked=False, progress=current)
+            achievements.append(entry)
+        return {
+            "current_streak": current,
+            "best_streak": self.best,
+            "total_on_time_payments": self.on_time,
+            "late_payments": self.late,
+            "achievements": achievements,
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, StreakState) and self.as_row(None) == other.as_row(None)
+
+
+class StreakStore(SQLiteStore):
+    """Streak states, stored in the bill ledger's database by default."""
+    SCHEMA = SCHEMA + data_versions.SCHEMA
+
+    def __init__(self, path=BILL_DB_PATH, busy_timeout_ms=BILL_DB_BUSY_TIMEOUT_MS):
+        super().__init__(path, busy_timeout_ms)
+
+    def get(self, user_id):
+        row = self.connection().execute(
+            "SELECT * FROM payment_streaks WHERE user_id = ?", (str(user_id),)).fetchone()
+        return StreakState.from_row(row)
+
+    def version(self, user_id):
+        """(version, last change) of the user's streak; see data_versions.read()."""
+        return data_versions.read(self.connection(), 'streak', user_id)
+
+    def record_payment(self, user_id, paid_on, on_time):
+        """
+        Applies one payment (paid_on: date or ISO string) to the user's
+        streak. Returns (state, achievements unlocked by this payment).
+        """
+        day = (paid_on if isinstance(paid_on, date) else date.fromisoformat(str(paid_on)[:10])).toordinal()
+        with self.batch() as conn:
+            row = conn.execute("SELECT * FROM payment_streaks WHERE user_id = ?", (str(user_id),)).fetchone()
+            state = StreakState.from_row(row)
+            unlocked = state.apply(day, on_time)
+            conn.execute(_UPSERT_SQL, state.as_row(str(user_id)))
+            data_versions.bump(conn, 'streak', user_id)
+        return state, [ACHIEVEMENTS[i] for i in unlocked]
+
+    def replay(self, ledger_path=None, chunk_size=100_000):
+        """
+        Rebuilds every user's streak from the bill_payments log (in
+        `ledger_path`, default this store's database). Returns (users, events).
+        """
+        conn = self.connection()
+        if ledger_path is not None and ledger_path != self.path:
+            conn.execute("ATTACH DATABASE ? AS ledger", (ledger_path,))
+            table = "ledger.bill_payments"
+        else:
+            table = "bill_payments"
+        try:
+            user_ids, codes, days, on_time = [], array('q'), array('q'), array('b')
+            last_user = None
+            cursor = conn.execute(
+                f"SELECT user_id, {_SQL_ORDINAL.format('paid_on')}, on_time FROM {table} "
+                f"ORDER BY user_id, rowid"
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for user_id, day, paid_on_time in rows:
+                    if user_id != last_user:
+                        user_ids.append(user_id)
+                        last_user = user_id
+                    codes.append(len(user_ids) - 1)
+                    days.append(day)
+                    on_time.append(paid_on_time)
+        finally:
+            if table != "bill_payments":
+                conn.execute("DETACH DATABASE ledger")
+        states = replay_columns(codes, days, on_time, len(user_ids))
+        with self.batch() as conn:
+            conn.execute("DELETE FROM payment_streaks")
+            conn.executemany(_UPSERT_SQL, (
+                (user_id, *row) for user_id, row in zip(user_ids, states)
+            ))
+            data_versions.bump(conn, 'streak')
+        return len(user_ids), len(codes)
+
+
+def replay_events(events):
+    """
+    Scalar reference for replay_columns(): applies (user_id, day, on_time)
+    events in order and returns {user_id: StreakState}.
+    """
+    states = {}
+    for user_id, day, on_time in events:
+        state = states.get(user_id)
+        if state is None:
+            state = states[user_id] = StreakState()
+        state.apply(day, on_time)
+    return states
+
+
+def replay_columns(codes, days, on_time, user_count):
+    """
+    Vectorized replay. `codes` (user index), `days` (ordinals) and `on_time`
+    are parallel columns sorted by user, each user's events in the order
+    they were applied (usually, but not necessarily, by day). Returns one
+    row per user, equal to StreakState.as_row() without the user id after
+    applying that user's events one by one.
+    """
+    import numpy as np
+
+    codes = np.asarray(codes, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    ok = np.asarray(on_time, dtype=bool)
+    n = len(codes)
+    if n == 0:
+        return []
+
+    # A run starts at each user's first event and after each late payment;
+    # its start is the day of its first on-time payment
+    first_of_user = np.ones(n, dtype=bool)
+    first_of_user[1:] = codes[1:] != codes[:-1]
+    run = np.cumsum(first_of_user | np.r_[False, ~ok[:-1]]) - 1
+    on_idx = np.flatnonzero(ok)
+    on_run, on_user, on_day = run[on_idx], codes[on_idx], days[on_idx]
+    run_start = np.zeros(run[-1] + 1, dtype=np.int64)
+    first_in_run = np.ones(len(on_idx), dtype=bool)
+    first_in_run[1:] = on_run[1:] != on_run[:-1]
+    run_start[on_run[first_in_run]] = on_day[first_in_run]
+    # Latest on-time day so far in the run: a running max that restarts with each
+    # run, done in one pass by lifting every run above all the runs before it
+    low = int(days.min())
+    lift = on_run * (int(days.max()) - low + 1)
+    latest = np.maximum.accumulate(on_day - low + lift) - lift + low
+    current = latest - run_start[on_run] + 1
+
+    on_count = np.bincount(on_user, minlength=user_count)
+    late_count = np.bincount(codes[~ok], minlength=user_count)
+    best = np.zeros(user_count, dtype=np.int64)
+    if len(on_idx):
+        user_starts = np.flatnonzero(np.r_[True, on_user[1:] != on_user[:-1]])
+        best[on_user[user_starts]] = np.maximum.reduceat(current, user_starts)
+
+    # Final state: the run of each user's last event, unless that event was late
+    last_event = np.r_[np.flatnonzero(first_of_user)[1:], n] - 1
+    active = ok[last_event]
+    streak_start = np.where(active, run_start[run[last_event]], -1)
+    if len(on_idx):
+        last_latest = latest[np.minimum(np.searchsorted(on_idx, last_event), len(on_idx) - 1)]
+    else:
+        last_latest = np.zeros(user_count, dtype=np.int64)
+    last_on_time = np.where(active, last_latest, -1)
+
+    # Achievement i unlocks on the first on-time payment whose current streak reaches it
+    unlock = np.full((user_count, len(THRESHOLDS)), -1, dtype=np.int64)
+    for i, threshold in enumerate(THRESHOLDS):
+        reached = current >= threshold
+        reached_users, first = np.unique(on_user[reached], return_index=True)
+        unlock[reached_users, i] = on_day[reached][first]
+
+    # Achievements unlock in order, so each row's unlock days are a prefix of its row
+    width = 4 * len(THRESHOLDS)
+    packed = unlock.astype(np.intc).tobytes()
+    unlocked = (unlock >= 0).sum(axis=1).tolist()
+    unlock_blobs = [packed[user * width:user * width + 4 * k] for user, k in enumerate(unlocked)]
+    rows = list(zip(_none_if_negative(streak_start), _none_if_negative(last_on_time), best.tolist(),
+                    on_count.tolist(), late_count.tolist(), unlock_blobs))
+    return rows
+
+
+def _none_if_negative(values):
+    return [None if value < 0 else value for value in values.tolist()]
+
+
+_default_store = None
+
+
+def get_streak_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = StreakStore()
+    return _default_store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] != 'replay':
+        print("Usage: python streaks.py replay")
+        sys.exit(2)
+    store = get_streak_store()
+    start = time.perf_counter()
+    users, events = store.replay()
+    print(f"--- Replayed {events} payments for {users} users into {store.path} "
+          f"({time.perf_counter() - start:.2f} s)")
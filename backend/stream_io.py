@@ -0,0 +1,105 @@
+# stream_io.py - Helpers for reading large request bodies without buffering them
+#
+# Used by the bulk endpoints: the body is read in fixed-size blocks and parsed
+# one record at a time, so memory stays flat no matter how many rows arrive.
+# A line longer than MAX_LINE_BYTES ends the stream with an error row instead
+# of being buffered, so a body without newlines cannot exhaust memory.
+
+import csv
+import json
+import os
+
+READ_BLOCK_SIZE = 64 * 1024
+MAX_LINE_BYTES = int(os.getenv('BULK_MAX_LINE_BYTES', 1024 * 1024))
+
+
+class LineTooLong(ValueError):
+    """Raised by iter_lines() when a line passes its max_line limit."""
+
+
+def iter_lines(stream, block_size=READ_BLOCK_SIZE, encoding='utf-8', max_line=MAX_LINE_BYTES):
+    """
+    Yields decoded lines (newline included) from a binary file-like stream.
+    Raises LineTooLong as soon as a line passes `max_line` bytes.
+    """
+    parts, size = [], 0  # The unfinished line, possibly spread over several blocks
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        end = block.rfind(b"\n")
+        if end < 0:
+            size += len(block)
+            if size > max_line:
+                raise LineTooLong(f"Line longer than {max_line} bytes")
+            parts.append(block)
+            continue
+        parts.append(block[:end])
+        lines = b"".join(parts).split(b"\n")
+        for line in lines:
+            if len(line) > max_line:
+                raise LineTooLong(f"Line longer than {max_line} bytes")
+            yield (line + b"\n").decode(encoding, errors='replace')
+        rest = block[end + 1:]
+        parts, size = ([rest], len(rest)) if rest else ([], 0)
+    if parts:
+        if size > max_line:
+            raise LineTooLong(f"Line longer than {max_line} bytes")
+        yield b"".join(parts).decode(encoding, errors='replace')
+
+
+def iter_records(stream, fmt='ndjson', max_line=MAX_LINE_BYTES):
+    """
+    Yields (record, error) pairs from an NDJSON or CSV stream. Exactly one of
+    the two is set: a row that cannot be parsed yields (None, "message") so the
+    caller can report it in place and keep going. Blank lines are skipped.
+    CSV needs a header row; empty cells are dropped so field defaults apply.
+    A line over `max_line` bytes yields an error and ends the stream.
+    """
+    try:
+        yield from _iter_records(iter_lines(stream, max_line=max_line), fmt)
+    except LineTooLong as e:
+        yield None, f"{e}; stopped reading"
+
+
+def _iter_records(lines, fmt):
+    if fmt == 'csv':
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        for row in reader:
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if len(row) > len(header):
+                yield None, f"Expected {len(header)} columns, got {len(row)}"
+                continue
+            yield {name: cell for name, cell in zip(header, row) if cell != ''}, None
+        return
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield None, "Each line must be a JSON object"
+            continue
+        yield record, None
+
+
+def iter_chunks(items, size):
+    """Groups an iterator into lists of at most `size` items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
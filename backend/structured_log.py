@@ -0,0 +1,273 @@
+# structured_log.py - Buffered JSON-lines logging with sampling and PII redaction
+#
+# print() writes to stdout synchronously under its lock, so routes that print
+# whole payloads serialize on it under load. Here a log call copies (and
+# redacts) its fields and puts a small tuple on a queue; one writer thread
+# drains the queue in batches, formats the entries and writes each batch with
+# a single write and flush. Past LOG_QUEUE_SIZE queued entries, new ones are
+# dropped and counted (log_records_dropped_total on /api/metrics) rather
+# than growing memory or blocking the request.
+#
+#     log = get_logger('app')
+#     log.info("score calculated", score=712, rating="Good")
+#     log.payload("score request", data=data)  # Only LOG_PAYLOAD_SAMPLE_RATE of calls
+#
+# Fields named like personal data (monthlyIncome, email, phone, ...) are
+# replaced by "[REDACTED]" at any depth, and e-mail addresses and phone
+# numbers inside strings, messages and tracebacks are masked.
+# LOG_FORMAT=text prints the "--- message key=value" lines used in
+# development; LOG_ASYNC=0 writes from the calling thread (for hosts that
+# freeze background threads between requests).
+
+import atexit
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'info').lower()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_ASYNC = os.getenv('LOG_ASYNC', '1') != '0'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+
+# Compared without case or underscores, so monthlyIncome and monthly_income both match
+REDACT_FIELDS = frozenset(
+    field.strip().lower().replace('_', '')
+    for field in os.getenv('LOG_REDACT_FIELDS', (
+        'monthlyIncome,income,avgBalance,balance,currentBalance,rentAmount,savings,'
+        'email,phone,phoneNumber,mobile,fullName,address,pan,aadhaar,accountNumber,'
+        'password,token,accessToken,refreshToken,apiKey,secret'
+    )).split(',')
+    if field.strip()
+)
+REDACTED = "[REDACTED]"
+
+_EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+_PHONE_RE = re.compile(r'(?<!\d)(?:\+?91[\s-]?)?[6-9]\d{4}\s?\d{5}(?!\d)')
+
+ROOT_LOGGER = 'arthniti'
+WRITE_BATCH = 512
+
+
+# ===== REDACTION =====
+
+def redact(value, depth=0):
+    """A copy of `value` with personal fields replaced and e-mails/phones masked in strings."""
+    if isinstance(value, dict):
+        if depth > 8:
+            return REDACTED
+        return {key: REDACTED if str(key).lower().replace('_', '') in REDACT_FIELDS else redact(item, depth + 1)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if depth > 8:
+            return REDACTED
+        return [redact(item, depth + 1) for item in value]
+    if isinstance(value, str):
+        return mask_text(value)
+    return value
+
+
+def redact_fields(fields):
+    """redact() for a log call's keyword fields, with a fast path for plain numbers."""
+    redacted = {}
+    for key, value in fields.items():
+        if key.lower().replace('_', '') in REDACT_FIELDS:
+            redacted[key] = REDACTED
+        elif value is None or type(value) in (int, float, bool):
+            redacted[key] = value
+        else:
+            redacted[key] = redact(value, 1)
+    return redacted
+
+
+def mask_text(text):
+    if '@' in text:
+        text = _EMAIL_RE.sub('[EMAIL]', text)
+    return _PHONE_RE.sub('[PHONE]', text)
+
+
+# ===== FORMATS =====
+# An entry is (created, level, logger name, event, fields or None, traceback or None)
+
+def format_json(entry):
+    created, level, name, event, fields, trace = entry
+    line = {
+        "ts": datetime.fromtimestamp(created, timezone.utc).isoformat(timespec='milliseconds'),
+        "level": level,
+        "logger": name,
+        "event": mask_text(event),
+    }
+    if fields:
+        line.update(fields)
+    if trace:
+        line["traceback"] = mask_text(trace)
+    return json.dumps(line, ensure_ascii=False, default=str)
+
+
+def format_text(entry):
+    """The "--- message key=value" lines the backend printed before."""
+    _, level, _, event, fields, trace = entry
+    line = f"--- {level.upper() + ': ' if level in ('warning', 'error') else ''}{mask_text(event)}"
+    if fields:
+        line += " " + " ".join(f"{key}={json.dumps(value, ensure_ascii=False, default=str)}"
+                               for key, value in fields.items())
+    if trace:
+        line += "\n" + mask_text(trace.rstrip())
+    return line
+
+
+FORMATS = {"json": format_json, "text": format_text}
+
+
+# ===== WRITER =====
+
+class LogWriter:
+    """Formats and writes entries; with use_queue, from a background thread in batches."""
+
+    def __init__(self, stream=None, fmt=LOG_FORMAT, use_queue=LOG_ASYNC, queue_size=LOG_QUEUE_SIZE):
+        self.stream = stream or sys.stdout
+        self.format = FORMATS.get(fmt, format_json)
+        self.use_queue = use_queue
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.SimpleQueue()  # put() is one C call; queue.Queue takes two Python locks
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def put(self, entry):
+        if not self.use_queue:
+            self._write([entry])
+            return
+        if self._pid != os.getpid():
+            self.start()
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self._queue.put(entry)
+
+    def start(self):
+        """Starts the writer thread (once per process, so again in a forked worker)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._queue = queue.SimpleQueue()  # Entries queued before the fork belong to the parent
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout=5):
+        """Writes everything queued so far and stops the thread."""
+        with self._lock:
+            thread, running = self._thread, self._pid == os.getpid()
+            self._thread = self._pid = None
+        if thread is not None and running:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _run(self):
+        get, get_nowait = self._queue.get, self._queue.get_nowait
+        while True:
+            batch = [get()]
+            try:
+                while len(batch) < WRITE_BATCH and batch[-1] is not None:
+                    batch.append(get_nowait())
+            except queue.Empty:
+                pass
+            done = batch[-1] is None
+            self._write([entry for entry in batch if entry is not None])
+            if done:
+                return
+
+    def _write(self, entries):
+        if not entries:
+            return
+        lines = []
+        for entry in entries:
+            try:
+                lines.append(self.format(entry))
+            except Exception as e:  # An unserializable field must not take the writer down
+                lines.append(self.format(entry[:4] + ({"log_error": repr(e)}, None)))
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self.written += len(lines)
+        except (OSError, ValueError):
+            self.dropped += len(lines)
+
+
+# ===== LOGGERS =====
+
+class StructuredLogger:
+    """Logs an event name plus keyword fields; see the module comment."""
+    __slots__ = ("name", "writer", "level", "sample_rate")
+
+    def __init__(self, name, writer, level=LOG_LEVEL, sample_rate=LOG_PAYLOAD_SAMPLE_RATE):
+        self.name = name
+        self.writer = writer
+        self.level = LEVELS.get(level, 20)
+        self.sample_rate = sample_rate
+
+    def debug(self, event, **fields):
+        if self.level <= 10:
+            self._log('debug', event, fields)
+
+    def info(self, event, **fields):
+        if self.level <= 20:
+            self._log('info', event, fields)
+
+    def warning(self, event, **fields):
+        if self.level <= 30:
+            self._log('warning', event, fields)
+
+    def error(self, event, **fields):
+        self._log('error', event, fields)
+
+    def exception(self, event, **fields):
+        """An error with the traceback of the exception being handled."""
+        self._log('error', event, fields, traceback.format_exc())
+
+    def payload(self, event, **fields):
+        """A verbose info log (request or response bodies), kept for a sample of calls only."""
+        if self.level <= 20 and self.sample_rate > 0 and random.random() < self.sample_rate:
+            fields["sample_rate"] = self.sample_rate
+            self._log('info', event, fields)
+
+    def _log(self, level, event, fields, trace=None):
+        # Redacting copies the fields, so later changes by the caller do not reach the writer thread
+        self.writer.put((time.time(), level, self.name, event, redact_fields(fields) if fields else None, trace))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def configure(stream=None, fmt=LOG_FORMAT, use_queue=LOG_ASYNC, queue_size=LOG_QUEUE_SIZE):
+    """Creates the process's LogWriter (first call wins) and returns it."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter(stream, fmt, use_queue, queue_size)
+            atexit.register(_writer.stop)
+        return _writer
+
+
+def get_logger(name, level=LOG_LEVEL, sample_rate=LOG_PAYLOAD_SAMPLE_RATE):
+    """A StructuredLogger named arthniti.<name>, writing through the shared LogWriter."""
+    return StructuredLogger(f"{ROOT_LOGGER}.{name}", configure(), level, sample_rate)
+
+
+def dropped_records():
+    """Entries dropped because the queue was full or the stream failed."""
+    return _writer.dropped if _writer is not None else 0
@@ -0,0 +1,36 @@
+# test_batch_scoring.py - The batch engine must score exactly like the scalar one
+#
+# calculate_credit_scores_batch() backs /api/score/bulk and the nightly
+# re-scoring job; calculate_credit_score() is the reference. The profiles
+# come from benchmarks.make_profiles(), which covers band thresholds,
+# string-typed form values, missing fields and malformed rows. Run with
+# `python -m pytest` from backend/.
+
+import pytest
+
+from batch_scoring import calculate_credit_scores_batch, profiles_to_columns
+from benchmarks import make_profiles
+from scoring_engine import calculate_credit_score, get_error_score
+
+
+@pytest.mark.parametrize("seed", [7, 11, 42])
+def test_batch_matches_scalar(seed):
+    profiles = make_profiles(5000, seed=seed)
+    batch_results = calculate_credit_scores_batch(profiles)
+    assert len(batch_results) == len(profiles)
+    for i, (profile, batch_result) in enumerate(zip(profiles, batch_results)):
+        assert batch_result == calculate_credit_score(profile), f"profile #{i} {profile!r}"
+
+
+def test_empty_batch():
+    assert calculate_credit_scores_batch([]) == []
+
+
+def test_parse_errors_match_scalar_error_scores():
+    profiles = make_profiles(5000, seed=3)
+    _, errors = profiles_to_columns(profiles)
+    error_score = get_error_score()
+    flagged = [i for i, error in enumerate(errors) if error is not None]
+    assert flagged, "make_profiles() should include malformed rows"
+    for i, profile in enumerate(profiles):
+        assert (errors[i] is not None) == (calculate_credit_score(profile) == error_score), f"profile #{i} {profile!r}"
@@ -0,0 +1,47 @@
+# test_llm_cache.py - The on-disk tier of LLMCache stays bounded
+#
+# Expired files are swept and, past disk_max_entries, the entries that
+# expire soonest are evicted. Run with `python -m pytest` from backend/.
+
+import os
+import time
+
+from llm_cache import LLMCache
+
+
+def disk_files(cache):
+    return sorted(name for name in os.listdir(cache.disk_dir) if name.endswith('.json'))
+
+
+def test_disk_tier_evicts_past_capacity(tmp_path):
+    cache = LLMCache(max_entries=4, ttl_seconds=3600, disk_dir=str(tmp_path), disk_max_entries=10,
+                     sweep_seconds=3600)
+    keys = [LLMCache.make_key('test', i) for i in range(25)]
+    for key in keys:
+        cache.set(key, key)
+        time.sleep(0.002)  # Distinct expiry times, so "soonest to expire" is the write order
+    assert len(disk_files(cache)) <= 11  # The limit plus the write that triggers the next sweep
+    cache.sweep_disk()
+    assert disk_files(cache) == sorted(f"{key}.json" for key in keys[-10:])
+    assert cache.stats()["disk_entries"] == 10 and cache.stats()["disk_evictions"] == 15
+
+    restarted = LLMCache(max_entries=4, ttl_seconds=3600, disk_dir=str(tmp_path), disk_max_entries=10)
+    assert restarted.get(keys[-1]) == keys[-1]
+    assert restarted.get(keys[0]) is None
+
+
+def test_sweep_deletes_expired_entries(tmp_path):
+    cache = LLMCache(ttl_seconds=60, disk_dir=str(tmp_path), sweep_seconds=3600)
+    for i in range(5):
+        cache.set(LLMCache.make_key('test', i), 'answer')
+    assert cache.sweep_disk(now=time.time() + 30) == 0
+    assert cache.sweep_disk(now=time.time() + 61) == 5
+    assert disk_files(cache) == [] and cache.stats()["disk_expired"] == 5
+
+
+def test_periodic_sweep_runs_on_write(tmp_path):
+    cache = LLMCache(ttl_seconds=0.05, disk_dir=str(tmp_path), sweep_seconds=0.1)
+    cache.set(LLMCache.make_key('test', 'old'), 'answer')
+    time.sleep(0.15)
+    cache.set(LLMCache.make_key('test', 'new'), 'answer')
+    assert disk_files(cache) == [f"{LLMCache.make_key('test', 'new')}.json"]
@@ -0,0 +1,14 @@
+# test_startup.py - Fails when importing the app gets slow or heavy again
+#
+# Runs the `startup` benchmark with its default budget: the median cold
+# import of app must stay under --max-ms and must not load numpy or the
+# Gemini SDK. Run with `python -m pytest` from backend/.
+
+import benchmarks
+
+
+def test_app_import_within_budget(capsys):
+    status = benchmarks.main(["startup", "--runs", "3", "--top", "0"])
+    output = capsys.readouterr().out
+    assert status == 0, output
+    assert "startup: OK" in output
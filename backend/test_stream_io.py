@@ -0,0 +1,51 @@
+# test_stream_io.py - Line splitting and record parsing for the bulk endpoints
+#
+# Run with `python -m pytest` from backend/.
+
+import io
+
+import pytest
+
+from stream_io import LineTooLong, iter_lines, iter_records
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 7, 64 * 1024])
+def test_lines_match_splitlines(block_size):
+    body = b'{"a": 1}\n\nsecond line\n' + "₹ third".encode() + b"\nno newline at the end"
+    lines = list(iter_lines(io.BytesIO(body), block_size=block_size))
+    assert lines == body.decode().splitlines(keepends=True)
+
+
+def test_line_over_limit_raises_before_buffering_it():
+    class Endless:
+        reads = 0
+
+        def read(self, size):
+            self.reads += 1
+            return b"x" * size
+
+    stream = Endless()
+    with pytest.raises(LineTooLong):
+        list(iter_lines(stream, block_size=1024, max_line=10 * 1024))
+    assert stream.reads == 11
+
+
+@pytest.mark.parametrize("block_size", [4, 1024])
+def test_limit_applies_to_every_line(block_size):
+    body = b"short\n" + b"y" * 100 + b"\nshort"
+    assert len(list(iter_lines(io.BytesIO(body), block_size=block_size, max_line=100))) == 3
+    with pytest.raises(LineTooLong):
+        list(iter_lines(io.BytesIO(body), block_size=block_size, max_line=99))
+    with pytest.raises(LineTooLong):
+        list(iter_lines(io.BytesIO(b"short\n" + b"z" * 100), block_size=block_size, max_line=99))
+
+
+@pytest.mark.parametrize("fmt, body, first", [
+    ("ndjson", b'{"monthlyIncome": 1}\n{"monthlyIncome": 2}\n', [{"monthlyIncome": 1}, {"monthlyIncome": 2}]),
+    ("csv", b"monthlyIncome\n1\n2\n", [{"monthlyIncome": "1"}, {"monthlyIncome": "2"}]),
+])
+def test_records_end_with_an_error_at_an_over_long_line(fmt, body, first):
+    results = list(iter_records(io.BytesIO(body + b"9" * 100 + b"\n" + body), fmt, max_line=64))
+    assert results[:2] == [(record, None) for record in first]
+    assert len(results) == 3
+    assert results[2][0] is None and "Line longer than 64 bytes" in results[2][1]
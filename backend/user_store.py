@@ -0,0 +1,189 @@
+# user_store.py - SQLite (WAL) storage for user accounts
+#
+# Replaces user.json / oauth_user.json, where every read or write loaded and
+# re-serialized the whole document and concurrent gunicorn workers could
+# overwrite each other. Rows are keyed by user id with B-tree indexes on
+# email and google_id, so point lookups stay O(log n). WAL mode lets readers
+# in every worker run alongside the single writer.
+#
+# USER_DB_PATH defaults to backend/users.db, or to the temp directory where
+# backend/ is read-only (see sqlite_store.default_path).
+#
+# Usage:
+#     python user_store.py import [user.json oauth_user.json]
+
+import json
+import os
+import sys
+import threading
+
+from sqlite_store import SQLiteStore, default_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+USER_DB_PATH = os.getenv('USER_DB_PATH') or default_path('users.db')
+USER_DB_BUSY_TIMEOUT_MS = int(os.getenv('USER_DB_BUSY_TIMEOUT_MS', 5000))
+LEGACY_USER_FILES = (
+    (os.path.join(BASE_DIR, 'user.json'), 'password'),
+    (os.path.join(BASE_DIR, 'oauth_user.json'), 'google'),
+)
+
+# Columns besides id; anything else in a record is kept in `extra`
+USER_COLUMNS = ("provider", "email", "google_id", "name", "password", "phone", "picture",
+                "created_at", "last_login", "financial_data")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    provider TEXT NOT NULL DEFAULT 'password',
+    email TEXT,
+    google_id TEXT,
+    name TEXT,
+    password TEXT,
+    phone TEXT,
+    picture TEXT,
+    created_at TEXT,
+    last_login TEXT,
+    financial_data TEXT NOT NULL DEFAULT '{}',
+    extra TEXT NOT NULL DEFAULT '{}'
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_google_id ON users(google_id) WHERE google_id IS NOT NULL;
+"""
+
+_UPSERT_SQL = (
+    f"INSERT INTO users (id, {', '.join(USER_COLUMNS)}, extra) "
+    f"VALUES ({', '.join('?' * (len(USER_COLUMNS) + 2))}) "
+    f"ON CONFLICT(id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in USER_COLUMNS + ("extra",))
+)
+
+
+class UserStore(SQLiteStore):
+    SCHEMA = SCHEMA
+
+    def __init__(self, path=USER_DB_PATH, busy_timeout_ms=USER_DB_BUSY_TIMEOUT_MS):
+        super().__init__(path, busy_timeout_ms)
+
+    # --- Reads ---
+
+    def get_user(self, user_id):
+        row = self.connection().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        return row_to_user(row)
+
+    def get_user_by_google_id(self, google_id):
+        row = self.connection().execute("SELECT * FROM users WHERE google_id = ?", (google_id,)).fetchone()
+        return row_to_user(row)
+
+    def get_users_by_email(self, email):
+        """Every account with this email (a password and a Google account may share one)."""
+        rows = self.connection().execute(
+            "SELECT * FROM users WHERE email = ? ORDER BY created_at", (email,)
+        ).fetchall()
+        return [row_to_user(row) for row in rows]
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    # --- Writes ---
+
+    def upsert_user(self, user_id, record, provider='password'):
+        """Inserts or replaces one user. `record` has the same shape as the legacy JSON values."""
+        self.upsert_users([(user_id, record)], provider)
+
+    def upsert_users(self, items, provider='password'):
+        """Inserts or replaces many (user_id, record) pairs in one transaction."""
+        with self.batch() as conn:
+            conn.executemany(_UPSERT_SQL, (user_to_row(user_id, record, provider) for user_id, record in items))
+
+    def update_fields(self, user_id, **fields):
+        """Updates known columns of one user (e.g. last_login=..., financial_data={...})."""
+        unknown = set(fields) - set(USER_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown user fields: {', '.join(sorted(unknown))}")
+        if 'financial_data' in fields:
+            fields['financial_data'] = json.dumps(fields['financial_data'] or {})
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self.batch() as conn:
+            cursor = conn.execute(f"UPDATE users SET {assignments} WHERE id = ?", (*fields.values(), user_id))
+        return cursor.rowcount == 1
+
+    def delete_user(self, user_id):
+        with self.batch() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        return cursor.rowcount == 1
+
+    # --- Legacy JSON import ---
+
+    def import_json_file(self, path, provider, chunk_size=5000):
+        """Imports a legacy {user_id: record} JSON document. Returns the number of users."""
+        with open(path, encoding='utf-8') as f:
+            users = json.load(f)
+        items = list(users.items())
+        for start in range(0, len(items), chunk_size):
+            self.upsert_users(items[start:start + chunk_size], provider)
+        return len(items)
+
+    def import_legacy_files(self, files=LEGACY_USER_FILES):
+        """Imports user.json and oauth_user.json (missing files are skipped)."""
+        imported = {}
+        for path, provider in files:
+            if os.path.exists(path):
+                imported[os.path.basename(path)] = self.import_json_file(path, provider)
+        return imported
+
+
+def user_to_row(user_id, record, provider='password'):
+    """Legacy JSON record -> upsert parameters."""
+    record = dict(record)
+    if provider == 'google' and not record.get('google_id'):
+        record['google_id'] = user_id  # oauth_user.json is keyed by Google id
+    values = [record.pop('provider', provider)]
+    for column in USER_COLUMNS[1:]:
+        value = record.pop(column, None)
+        if column == 'financial_data':
+            value = json.dumps(value or {})
+        values.append(value)
+    return (user_id, *values, json.dumps(record))
+
+
+def row_to_user(row):
+    """Database row -> record in the legacy JSON shape (plus id and provider), or None."""
+    if row is None:
+        return None
+    user = {"id": row["id"]}
+    for column in USER_COLUMNS:
+        value = row[column]
+        if column == 'financial_data':
+            value = json.loads(value)
+        user[column] = value
+    user.update(json.loads(row["extra"]))
+    return user
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_user_store():
+    """Process-wide store for USER_DB_PATH, created on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = UserStore()
+    return _default_store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'import':
+        print("Usage: python user_store.py import [user.json oauth_user.json]")
+        sys.exit(2)
+    store = get_user_store()
+    if len(sys.argv) > 2:
+        files = [(path, 'google' if 'oauth' in os.path.basename(path) else 'password') for path in sys.argv[2:]]
+        imported = store.import_legacy_files(files)
+    else:
+        imported = store.import_legacy_files()
+    for name, count in imported.items():
+        print(f"--- Imported {count} users from {name} into {store.path}")
+    print(f"--- {store.count()} users in store")
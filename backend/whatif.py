@@ -0,0 +1,186 @@
+# whatif.py - Score surfaces for the health-monitor what-if sliders
+#
+# Instead of one /api/predict-score call per slider move, the client asks for
+# a whole grid: a base profile plus value ranges for one or two inputs. Every
+# grid point is classified into a score_table cell with array operations and
+# the results are gathered from the table, so they are identical to calling
+# calculate_credit_score on each point.
+
+import os
+
+import numpy as np
+
+from score_table import get_score_table
+
+WHATIF_MAX_CELLS = int(os.getenv('WHATIF_MAX_CELLS', 250_000))
+WHATIF_MAX_AXES = 2
+
+FLOAT_FIELDS = ("monthlyIncome", "avgBalance", "savingsRate", "rentAmount")
+INT_FIELDS = ("overdrafts",)
+HISTORY_FIELDS = ("rentHistory", "utilityHistory")
+STABILITY_FIELDS = ("employmentStability",)
+GRID_FIELDS = FLOAT_FIELDS + INT_FIELDS + HISTORY_FIELDS + STABILITY_FIELDS
+
+COMPONENT_NAMES = ("payment_history", "financial_stability", "credit_utilization", "data_richness")
+
+_table_arrays = (None, None)  # (table, arrays) for the last table seen
+
+
+class GridError(ValueError):
+    """Raised for a grid request that cannot be scored (bad axis or base value)."""
+
+
+def parse_axis(spec):
+    """
+    Turns one axis spec into (field, values). A spec is either
+    {"field", "values": [...]} or {"field", "start", "stop", "steps"}.
+    Values are parsed the way calculate_credit_score parses that field.
+    """
+    if not isinstance(spec, dict):
+        raise GridError("each axis must be an object")
+    field = spec.get("field")
+    if field not in GRID_FIELDS:
+        raise GridError(f"unsupported axis field {field!r}; expected one of {', '.join(GRID_FIELDS)}")
+
+    if "values" in spec:
+        raw_values = spec["values"]
+        if not isinstance(raw_values, list) or not raw_values:
+            raise GridError(f"axis {field}: 'values' must be a non-empty list")
+    else:
+        if field in HISTORY_FIELDS or field in STABILITY_FIELDS:
+            raise GridError(f"axis {field}: categorical axes need a 'values' list")
+        try:
+            start, stop, steps = float(spec["start"]), float(spec["stop"]), int(spec["steps"])
+        except (KeyError, TypeError, ValueError):
+            raise GridError(f"axis {field}: give 'values' or numeric 'start', 'stop' and 'steps'")
+        if steps < 1:
+            raise GridError(f"axis {field}: 'steps' must be at least 1")
+        if steps > WHATIF_MAX_CELLS:
+            raise GridError(f"axis {field}: too many steps (limit {WHATIF_MAX_CELLS})")
+        raw_values = np.linspace(start, stop, steps).tolist()
+
+    try:
+        if field in FLOAT_FIELDS:
+            values = [float(value) for value in raw_values]
+        elif field in INT_FIELDS:
+            values = [int(value) for value in raw_values]
+        else:
+            values = list(raw_values)
+            for value in values:
+                hash(value)
+    except (TypeError, ValueError) as e:
+        raise GridError(f"axis {field}: {e}")
+    return field, values
+
+
+def score_grid(base, axes):
+    """
+    Scores every combination of the axis values applied on top of `base`.
+    `axes` is a list of one or two axis specs (see parse_axis). Returns a dict
+    with the parsed axes and arrays shaped (len(axis0)[, len(axis1)]):
+    total_score, rating_code (index into rating_labels) and one array per
+    breakdown component.
+    """
+    if not isinstance(base, dict):
+        raise GridError("'base' must be an object")
+    if not isinstance(axes, list) or not 1 <= len(axes) <= WHATIF_MAX_AXES:
+        raise GridError(f"'axes' must be a list of 1 to {WHATIF_MAX_AXES} axis specs")
+    parsed_axes = [parse_axis(spec) for spec in axes]
+    fields = [field for field, _ in parsed_axes]
+    if len(set(fields)) != len(fields):
+        raise GridError("each field can only be used on one axis")
+    shape = tuple(len(values) for _, values in parsed_axes)
+    if int(np.prod(shape)) > WHATIF_MAX_CELLS:
+        raise GridError(f"grid has {int(np.prod(shape))} points (limit {WHATIF_MAX_CELLS})")
+
+    table = get_score_table()
+    axis_values = dict(parsed_axes)
+    axis_index = {field: i for i, field in enumerate(fields)}
+
+    def column(field, parse):
+        """The field as an array broadcastable to `shape`, or a scalar from base."""
+        if field not in axis_values:
+            default = None if field in HISTORY_FIELDS + STABILITY_FIELDS else 0
+            try:
+                return parse(base.get(field, default))
+            except (TypeError, ValueError) as e:
+                raise GridError(f"base {field}: {e}")
+        array = np.asarray([parse(value) for value in axis_values[field]])
+        view = [1] * len(shape)
+        view[axis_index[field]] = len(array)
+        return array.reshape(view)
+
+    unknown_history = table.unknown_history
+    history_code = lambda value: table.history_codes.get(value, unknown_history)
+    stability_code = lambda value: table.stability_codes.get(value, table.unknown_stability)
+    s_rent, s_utility, s_stability, s_balance, s_savings, s_overdrafts, _ = table.strides
+
+    cell = np.zeros(shape, dtype=np.int64)
+    cell += column("rentHistory", history_code) * s_rent
+    cell += column("utilityHistory", history_code) * s_utility
+    cell += column("employmentStability", stability_code) * s_stability
+    cell += column("avgBalance", lambda v: float(v) > table.avg_balance_threshold) * s_balance
+    cell += column("savingsRate", lambda v: float(v) > table.savings_rate_threshold) * s_savings
+    cell += column("overdrafts", lambda v: int(v) == 0) * s_overdrafts
+
+    income = np.asarray(column("monthlyIncome", float), dtype=np.float64)
+    rent = np.asarray(column("rentAmount", float), dtype=np.float64)
+    income, rent = np.broadcast_arrays(income, rent)
+    has_income = income > 0
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        rent_to_income = np.divide(rent, income, out=np.zeros(income.shape), where=has_income)
+    # First band whose "<" check passes, as in the scalar engine's loop; NaN hits the floor
+    band = np.full(income.shape, len(table.band_bounds) + 1, dtype=np.int64)
+    for code in range(len(table.band_bounds), 0, -1):
+        band[rent_to_income < table.band_bounds[code - 1]] = code
+    band[~has_income] = 0
+    cell += band
+
+    arrays = _arrays_for(table)
+    result = {name: arrays[name][cell] for name in ("total_score", "rating_code") + COMPONENT_NAMES}
+    result["rating_labels"] = arrays["rating_labels"]
+    result["axes"] = [{"field": field, "values": values} for field, values in parsed_axes]
+    return result
+
+
+def recommendation_surface(total_score, recommend):
+    """
+    Applies `recommend(score_dict)` once per distinct score. Returns
+    (recommendations, index) where index has total_score's shape and points
+    into the de-duplicated recommendations list.
+    """
+    unique_scores, inverse = np.unique(total_score, return_inverse=True)
+    recommendations = []
+    positions = {}
+    mapping = []
+    for score in unique_scores.tolist():
+        recommendation = recommend({"total_score": score})
+        key = repr(sorted(recommendation.items()))
+        if key not in positions:
+            positions[key] = len(recommendations)
+            recommendations.append(recommendation)
+        mapping.append(positions[key])
+    return recommendations, np.asarray(mapping, dtype=np.int64)[inverse].reshape(total_score.shape)
+
+
+def _arrays_for(table):
+    """The table's entries as NumPy columns, cached per table instance."""
+    global _table_arrays
+    cached_table, arrays = _table_arrays
+    if cached_table is table:
+        return arrays
+    rating_labels = []
+    columns = {name: [] for name in ("total_score", "rating_code") + COMPONENT_NAMES}
+    for entry in table.entries:
+        # Unreachable cells are never indexed; give them placeholder values
+        total, rating, payment, stability, utilization, richness = entry or (0, None, 0, 0, 0, 0)
+        if rating is not None and rating not in rating_labels:
+            rating_labels.append(rating)
+        columns["total_score"].append(total)
+        columns["rating_code"].append(rating_labels.index(rating) if rating is not None else -1)
+        for name, value in zip(COMPONENT_NAMES, (payment, stability, utilization, richness)):
+            columns[name].append(value)
+    arrays = {name: np.asarray(values, dtype=np.int64) for name, values in columns.items()}
+    arrays["rating_labels"] = rating_labels
+    _table_arrays = (table, arrays)
+    return arrays